@@ -16,7 +16,10 @@
  *
  */
 
+#define _POSIX_C_SOURCE 200112L
+
 #include <limits.h>
+#include <pthread.h>
 #include <stddef.h>
 #include <stdint.h>
 #include <stdio.h>
@@ -27,8 +30,10 @@
 #include "common/file_io.h"
 #include "common/convolution.h"
 #include "common/convolution_internal.h"
+#include "common/frame_output.h"
 #include "motion_tools.h"
 #include "all_options.h"
+#include "all.h"
 
 #ifdef ALL_OPT_SINGLE_PRECISION
 	typedef float number_t;
@@ -58,319 +63,798 @@
 
 #endif
 
-int all(const char *ref_path, const char *dis_path, int w, int h, const char *fmt)
+static const char *all_feature_names[ALL_NUM_FEATURES] =
 {
-	double score = 0;
-	double scores[4*2];
-	double score_num = 0;
-	double score_den = 0;
-	double score_psnr = 0;
-	number_t *ref_buf = 0;
-	number_t *dis_buf = 0;
+	"adm", "adm_num", "adm_den",
+	"ansnr", "anpsnr",
+	"motion",
+	"vif", "vif_num", "vif_den",
+	"vif_num_scale0", "vif_den_scale0",
+	"vif_num_scale1", "vif_den_scale1",
+	"vif_num_scale2", "vif_den_scale2",
+	"vif_num_scale3", "vif_den_scale3",
+};
+
+struct all_context
+{
+	int w;
+	int h;
+	int stride;
+	size_t data_sz;
+	int is_10bit;
+	size_t offset;
+	int frm_idx;
 
-	number_t *prev_blur_buf = 0;
-	number_t *blur_buf = 0;
-	number_t *temp_buf = 0;
+	// skip motion, the only feature that depends on ref only
+	int skip_motion;
 
-	FILE *ref_rfile = 0;
-	FILE *dis_rfile = 0;
-	size_t data_sz;
-	int stride;
+	number_t *ref_buf;
+	number_t *dis_buf;
+
+	// prev_blur_buf, blur_buf for motion only
+	number_t *prev_blur_buf;
+	number_t *blur_buf;
+
+	// whether prev_blur_buf holds the frame preceding the next one computed
+	int has_prev_blur;
+
+	// use temp_buf for convolution_f32_c
+	number_t *temp_buf;
+};
+
+static void all_context_free(struct all_context *ctx)
+{
+	aligned_free(ctx->ref_buf);
+	aligned_free(ctx->dis_buf);
+
+	aligned_free(ctx->prev_blur_buf);
+	aligned_free(ctx->blur_buf);
+	aligned_free(ctx->temp_buf);
+}
+
+static int all_context_init(struct all_context *ctx, int w, int h, const char *fmt)
+{
 	int ret = 1;
 
+	memset(ctx, 0, sizeof(*ctx));
+
 	if (w <= 0 || h <= 0 || (size_t)w > ALIGN_FLOOR(INT_MAX) / sizeof(number_t))
 	{
 		goto fail_or_end;
 	}
 
-	stride = ALIGN_CEIL(w * sizeof(number_t));
+	ctx->w = w;
+	ctx->h = h;
+	ctx->stride = ALIGN_CEIL(w * sizeof(number_t));
 
-	if ((size_t)h > SIZE_MAX / stride)
+	if ((size_t)h > SIZE_MAX / ctx->stride)
 	{
 		goto fail_or_end;
 	}
 
-	data_sz = (size_t)stride * h;
+	ctx->data_sz = (size_t)ctx->stride * h;
 
-	if (!(ref_buf = aligned_malloc(data_sz, MAX_ALIGN)))
+	if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv420p10le"))
+	{
+		if ((w * h) % 2 != 0)
+		{
+			printf("error: (w * h) %% 2 != 0, w = %d, h = %d.\n", w, h);
+			fflush(stdout);
+			goto fail_or_end;
+		}
+		ctx->offset = w * h / 2;
+	}
+	else if (!strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv422p10le"))
+	{
+		ctx->offset = w * h;
+	}
+	else if (!strcmp(fmt, "yuv444p") || !strcmp(fmt, "yuv444p10le"))
+	{
+		ctx->offset = w * h * 2;
+	}
+	else
+	{
+		printf("error: unknown format %s.\n", fmt);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+	ctx->is_10bit = !strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le");
+
+	if (!(ctx->ref_buf = aligned_malloc(ctx->data_sz, MAX_ALIGN)))
 	{
 		printf("error: aligned_malloc failed for ref_buf.\n");
 		fflush(stdout);
 		goto fail_or_end;
 	}
-	if (!(dis_buf = aligned_malloc(data_sz, MAX_ALIGN)))
+	if (!(ctx->dis_buf = aligned_malloc(ctx->data_sz, MAX_ALIGN)))
 	{
 		printf("error: aligned_malloc failed for dis_buf.\n");
 		fflush(stdout);
 		goto fail_or_end;
 	}
-
-	// prev_blur_buf, blur_buf for motion only
-	if (!(prev_blur_buf = aligned_malloc(data_sz, MAX_ALIGN)))
+	if (!(ctx->prev_blur_buf = aligned_malloc(ctx->data_sz, MAX_ALIGN)))
 	{
 		printf("error: aligned_malloc failed for prev_blur_buf.\n");
 		fflush(stdout);
 		goto fail_or_end;
 	}
-	if (!(blur_buf = aligned_malloc(data_sz, MAX_ALIGN)))
+	if (!(ctx->blur_buf = aligned_malloc(ctx->data_sz, MAX_ALIGN)))
 	{
 		printf("error: aligned_malloc failed for blur_buf.\n");
 		fflush(stdout);
 		goto fail_or_end;
 	}
-
-	// use temp_buf for convolution_f32_c, and fread u and v
-	if (!(temp_buf = aligned_malloc(data_sz * 2, MAX_ALIGN)))
+	if (!(ctx->temp_buf = aligned_malloc(ctx->data_sz * 2, MAX_ALIGN)))
 	{
 		printf("error: aligned_malloc failed for temp_buf.\n");
 		fflush(stdout);
 		goto fail_or_end;
 	}
 
-	if (!(ref_rfile = fopen(ref_path, "rb")))
+	ret = 0;
+
+fail_or_end:
+	if (ret)
 	{
-		printf("error: fopen ref_path %s failed.\n", ref_path);
+		all_context_free(ctx);
+	}
+	return ret;
+}
+
+/**
+ * Compute all features on ref and dis, which must hold the Y planes of the
+ * current frame with stride ctx->stride, and write them to row (indexed by
+ * ALL_ADM, ALL_ADM_NUM, etc.). Note that ref and dis get modified.
+ */
+static int all_compute_frame(struct all_context *ctx, number_t *ref, number_t *dis, double *row)
+{
+	double score = 0;
+	double scores[4*2];
+	double score_num = 0;
+	double score_den = 0;
+	double score_psnr = 0;
+	int w = ctx->w;
+	int h = ctx->h;
+	int stride = ctx->stride;
+	int ret;
+
+	/* =========== adm ============== */
+	if ((ret = compute_adm(ref, dis, w, h, stride, stride, &score, &score_num, &score_den)))
+	{
+		printf("error: compute_adm failed.\n");
 		fflush(stdout);
-		goto fail_or_end;
+		return ret;
 	}
-	if (!(dis_rfile = fopen(dis_path, "rb")))
+	row[ALL_ADM] = score;
+	row[ALL_ADM_NUM] = score_num;
+	row[ALL_ADM_DEN] = score_den;
+
+	/* =========== ansnr ============== */
+	if (!ctx->is_10bit)
 	{
-		printf("error: fopen dis_path %s failed.\n", dis_path);
+		// max psnr 60.0 for 8-bit per Ioannis
+		ret = compute_ansnr(ref, dis, w, h, stride, stride, &score, &score_psnr, 255.0, 60.0);
+	}
+	else
+	{
+		// 10 bit gets normalized to 8 bit, peak is 1023 / 4.0 = 255.75
+		// max psnr 72.0 for 10-bit per Ioannis
+		ret = compute_ansnr(ref, dis, w, h, stride, stride, &score, &score_psnr, 255.75, 72.0);
+	}
+	if (ret)
+	{
+		printf("error: compute_ansnr failed.\n");
 		fflush(stdout);
-		goto fail_or_end;
+		return ret;
 	}
+	row[ALL_ANSNR] = score;
+	row[ALL_ANPSNR] = score_psnr;
 
-	size_t offset;
-	if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv420p10le"))
+	/* =========== motion ============== */
+	if (ctx->skip_motion)
 	{
-		if ((w * h) % 2 != 0)
+		row[ALL_MOTION] = 0.0;
+	}
+	else
+	{
+		// filter
+		// apply filtering (to eliminate effects film grain)
+		// stride input to convolution_f32_c is in terms of (sizeof(number_t) bytes)
+		// since stride = ALIGN_CEIL(w * sizeof(number_t)), stride divides sizeof(number_t)
+		convolution_f32_c(FILTER_5, 5, ref, ctx->blur_buf, ctx->temp_buf, w, h, stride / sizeof(number_t), stride / sizeof(number_t));
+
+		// compute
+		if (!ctx->has_prev_blur)
 		{
-			printf("error: (w * h) %% 2 != 0, w = %d, h = %d.\n", w, h);
-			fflush(stdout);
-			goto fail_or_end;
+			score = 0.0;
 		}
-		offset = w * h / 2;
+		else
+		{
+			if ((ret = compute_motion(ctx->prev_blur_buf, ctx->blur_buf, w, h, stride, stride, &score)))
+			{
+				printf("error: compute_motion failed.\n");
+				fflush(stdout);
+				return ret;
+			}
+		}
+
+		// copy to prev_buf
+		memcpy(ctx->prev_blur_buf, ctx->blur_buf, ctx->data_sz);
+		ctx->has_prev_blur = 1;
+
+		row[ALL_MOTION] = score;
 	}
-	else if (!strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv422p10le"))
+
+	/* =========== vif ============== */
+	// compute vif last, because its input ref/dis must be offset by -128
+	offset_image(ref, -128, w, h, stride);
+	offset_image(dis, -128, w, h, stride);
+
+	if ((ret = compute_vif(ref, dis, w, h, stride, stride, &score, &score_num, &score_den, scores)))
 	{
-		offset = w * h;
+		printf("error: compute_vif failed.\n");
+		fflush(stdout);
+		return ret;
 	}
-	else if (!strcmp(fmt, "yuv444p") || !strcmp(fmt, "yuv444p10le"))
+	row[ALL_VIF] = score;
+	row[ALL_VIF_NUM] = score_num;
+	row[ALL_VIF_DEN] = score_den;
+	for(int scale=0;scale<4;scale++){
+		row[ALL_VIF_NUM_SCALE0 + 2*scale] = scores[2*scale];
+		row[ALL_VIF_DEN_SCALE0 + 2*scale] = scores[2*scale+1];
+	}
+
+	ctx->frm_idx++;
+
+	return 0;
+}
+
+/**
+ * Take ref, the Y plane of a frame with stride ctx->stride, as the frame
+ * preceding the next one computed, for motion: needed when the frames in
+ * between are skipped (the first frame computed has motion 0 otherwise).
+ */
+static void all_set_prev_frame(struct all_context *ctx, const number_t *ref)
+{
+	int stride = ctx->stride;
+
+	convolution_f32_c(FILTER_5, 5, ref, ctx->prev_blur_buf, ctx->temp_buf, ctx->w, ctx->h, stride / sizeof(number_t), stride / sizeof(number_t));
+	ctx->has_prev_blur = 1;
+}
+
+/**
+ * Read the Y plane of the next frame of rfile into buf, with stride
+ * ctx->stride (u and v are left to be skipped).
+ */
+static int all_read_y(struct all_context *ctx, FILE *rfile, number_t *buf)
+{
+	if (!ctx->is_10bit)
 	{
-		offset = w * h * 2;
+		return read_image_b(rfile, buf, 0, ctx->w, ctx->h, ctx->stride);
 	}
 	else
 	{
-		printf("error: unknown format %s.\n", fmt);
-		fflush(stdout);
-		goto fail_or_end;
+		return read_image_w(rfile, buf, 0, ctx->w, ctx->h, ctx->stride);
 	}
+}
+
+/* =========== threaded frame pipeline, see --threads ============== */
+
+enum
+{
+	ALL_WORKER_IDLE,  // no frame, or its row is written
+	ALL_WORKER_READY, // ctx.ref_buf and ctx.dis_buf hold a frame to compute
+	ALL_WORKER_DONE,  // row holds the scores of the frame
+};
+
+struct all_pipeline;
 
-	int frm_idx = 0;
+/**
+ * A thread computing the frames handed over to it by the thread reading
+ * them, in a context of its own.
+ */
+struct all_worker
+{
+	struct all_context ctx;
+
+	// ref y of the frame preceding the one computed, for motion
+	number_t *prev_ref_buf;
+	int has_prev_ref;
+
+	int state;
+	double row[ALL_NUM_FEATURES];
+	int ret;
+
+	struct all_pipeline *pl;
+	pthread_t thread;
+	int has_thread;
+};
+
+/**
+ * Frames read are handed over to the workers round-robin, and the rows of
+ * the frames computed are written in order, so the output is the same as
+ * with all frames computed on the reading thread, whatever the number of
+ * workers. state of the workers, and quit, are guarded by mutex.
+ */
+struct all_pipeline
+{
+	struct all_worker *workers;
+	int num_workers;
+
+	// ref y of the last frame handed over, for the motion of the next one
+	number_t *last_ref_buf;
+	int has_last_ref;
+
+	frame_writer *fw;
+	const int *feature_idxs; // column in row of each output feature
+	int num_features;
+
+	int num_frms; // frames handed over
+	int num_frms_written;
+	int ret; // failure computing or writing a frame, which stops the writing
+
+	int quit;
+	pthread_mutex_t mutex;
+	pthread_cond_t ready_cond; // a worker got a frame, or quit is set
+	pthread_cond_t done_cond; // a worker computed its frame
+	int has_sync;
+};
+
+static void *all_worker_main(void *arg)
+{
+	struct all_worker *worker = arg;
+	struct all_pipeline *pl = worker->pl;
+	struct all_context *ctx = &worker->ctx;
+	int ret;
+
+	pthread_mutex_lock(&pl->mutex);
 	while (1)
 	{
-		// read ref y
-		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
+		while (worker->state != ALL_WORKER_READY && !pl->quit)
 		{
-			ret = read_image_b(ref_rfile, ref_buf, 0, w, h, stride);
+			pthread_cond_wait(&pl->ready_cond, &pl->mutex);
 		}
-		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
+		if (worker->state != ALL_WORKER_READY)
 		{
-			ret = read_image_w(ref_rfile, ref_buf, 0, w, h, stride);
+			break;
 		}
-		else
-		{
-			printf("error: unknown format %s.\n", fmt);
-			fflush(stdout);
-			goto fail_or_end;
-		}
-		if (ret)
+		pthread_mutex_unlock(&pl->mutex);
+
+		if (!ctx->skip_motion)
 		{
-			if (feof(ref_rfile))
+			if (worker->has_prev_ref)
 			{
-				ret = 0; // OK if end of file
+				all_set_prev_frame(ctx, worker->prev_ref_buf);
+			}
+			else
+			{
+				ctx->has_prev_blur = 0;
 			}
-			goto fail_or_end;
 		}
+		ret = all_compute_frame(ctx, ctx->ref_buf, ctx->dis_buf, worker->row);
 
-		// read dis y
-		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
+		pthread_mutex_lock(&pl->mutex);
+		worker->ret = ret;
+		worker->state = ALL_WORKER_DONE;
+		pthread_cond_signal(&pl->done_cond);
+	}
+	pthread_mutex_unlock(&pl->mutex);
+
+	return 0;
+}
+
+static void all_pipeline_close(struct all_pipeline *pl)
+{
+	if (pl->has_sync)
+	{
+		pthread_mutex_lock(&pl->mutex);
+		pl->quit = 1;
+		pthread_cond_broadcast(&pl->ready_cond);
+		pthread_mutex_unlock(&pl->mutex);
+
+		for (int i = 0; i < pl->num_workers; i++)
 		{
-			ret = read_image_b(dis_rfile, dis_buf, 0, w, h, stride);
+			if (pl->workers[i].has_thread)
+			{
+				pthread_join(pl->workers[i].thread, 0);
+			}
 		}
-		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
+
+		pthread_mutex_destroy(&pl->mutex);
+		pthread_cond_destroy(&pl->ready_cond);
+		pthread_cond_destroy(&pl->done_cond);
+	}
+
+	if (pl->workers)
+	{
+		for (int i = 0; i < pl->num_workers; i++)
 		{
-			ret = read_image_w(dis_rfile, dis_buf, 0, w, h, stride);
+			all_context_free(&pl->workers[i].ctx);
+			aligned_free(pl->workers[i].prev_ref_buf);
 		}
-		else
+		free(pl->workers);
+	}
+	aligned_free(pl->last_ref_buf);
+
+	memset(pl, 0, sizeof(*pl));
+}
+
+static int all_pipeline_init(struct all_pipeline *pl, int num_workers, int w, int h, const char *fmt, int skip_motion, frame_writer *fw, const int *feature_idxs, int num_features)
+{
+	int ret = 1;
+
+	memset(pl, 0, sizeof(*pl));
+	pl->fw = fw;
+	pl->feature_idxs = feature_idxs;
+	pl->num_features = num_features;
+
+	if (!(pl->workers = calloc(num_workers, sizeof(*pl->workers))))
+	{
+		printf("error: calloc failed for workers.\n");
+		fflush(stdout);
+		goto fail_or_end;
+	}
+	pl->num_workers = num_workers;
+
+	for (int i = 0; i < num_workers; i++)
+	{
+		struct all_worker *worker = &pl->workers[i];
+
+		if (all_context_init(&worker->ctx, w, h, fmt))
 		{
-			printf("error: unknown format %s.\n", fmt);
-			fflush(stdout);
 			goto fail_or_end;
 		}
-		if (ret)
+		worker->ctx.skip_motion = skip_motion;
+		if (!(worker->prev_ref_buf = aligned_malloc(worker->ctx.data_sz, MAX_ALIGN)))
 		{
-			if (feof(dis_rfile))
-			{
-				ret = 0; // OK if end of file
-			}
+			printf("error: aligned_malloc failed for prev_ref_buf.\n");
+			fflush(stdout);
 			goto fail_or_end;
 		}
+		worker->pl = pl;
+	}
+	if (!(pl->last_ref_buf = aligned_malloc(pl->workers[0].ctx.data_sz, MAX_ALIGN)))
+	{
+		printf("error: aligned_malloc failed for last_ref_buf.\n");
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
+	pthread_mutex_init(&pl->mutex, 0);
+	pthread_cond_init(&pl->ready_cond, 0);
+	pthread_cond_init(&pl->done_cond, 0);
+	pl->has_sync = 1;
 
-		/* =========== adm ============== */
-		if ((ret = compute_adm(ref_buf, dis_buf, w, h, stride, stride, &score, &score_num, &score_den)))
+	for (int i = 0; i < num_workers; i++)
+	{
+		struct all_worker *worker = &pl->workers[i];
+
+		if (pthread_create(&worker->thread, 0, all_worker_main, worker))
 		{
-			printf("error: compute_adm failed.\n");
+			printf("error: pthread_create failed.\n");
 			fflush(stdout);
 			goto fail_or_end;
 		}
-		printf("adm: %d %f\n", frm_idx, score);
-		fflush(stdout);
-		printf("adm_num: %d %f\n", frm_idx, score_num);
-		fflush(stdout);
-		printf("adm_den: %d %f\n", frm_idx, score_den);
-		fflush(stdout);
+		worker->has_thread = 1;
+	}
 
-		/* =========== ansnr ============== */
-		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
+	ret = 0;
+
+fail_or_end:
+	if (ret)
+	{
+		all_pipeline_close(pl);
+	}
+	return ret;
+}
+
+/**
+ * Write the rows of the frames handed over before frame num_frms, in order,
+ * waiting for the workers to compute them. Return non-zero once a frame
+ * failed to compute or write.
+ */
+static int all_pipeline_write(struct all_pipeline *pl, int num_frms)
+{
+	while (!pl->ret && pl->num_frms_written < num_frms)
+	{
+		int frm_idx = pl->num_frms_written;
+		struct all_worker *worker = &pl->workers[frm_idx % pl->num_workers];
+
+		pthread_mutex_lock(&pl->mutex);
+		while (worker->state == ALL_WORKER_READY)
 		{
-			// max psnr 60.0 for 8-bit per Ioannis
-			ret = compute_ansnr(ref_buf, dis_buf, w, h, stride, stride, &score, &score_psnr, 255.0, 60.0);
+			pthread_cond_wait(&pl->done_cond, &pl->mutex);
 		}
-		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
+		worker->state = ALL_WORKER_IDLE;
+		pthread_mutex_unlock(&pl->mutex);
+
+		if ((pl->ret = worker->ret))
 		{
-			// 10 bit gets normalized to 8 bit, peak is 1023 / 4.0 = 255.75
-			// max psnr 72.0 for 10-bit per Ioannis
-			ret = compute_ansnr(ref_buf, dis_buf, w, h, stride, stride, &score, &score_psnr, 255.75, 72.0);
+			break;
 		}
-		else
+		for (int i = 0; i < pl->num_features; i++)
 		{
-			printf("error: unknown format %s.\n", fmt);
-			fflush(stdout);
-			goto fail_or_end;
+			frame_writer_put(pl->fw, frm_idx, i, worker->row[pl->feature_idxs[i]]);
 		}
-		if (ret)
+		if ((pl->ret = frame_writer_end_frame(pl->fw)))
 		{
-			printf("error: compute_ansnr failed.\n");
-			fflush(stdout);
-			goto fail_or_end;
+			break;
 		}
+		pl->num_frms_written++;
+	}
+	return pl->ret;
+}
 
-		printf("ansnr: %d %f\n", frm_idx, score);
-		fflush(stdout);
-		printf("anpsnr: %d %f\n", frm_idx, score_psnr);
-		fflush(stdout);
+/**
+ * Get the worker to read the next frame into, once it is done with its
+ * previous frame (written first, with the ones before). Return 0 once a
+ * frame failed to compute or write.
+ */
+static struct all_worker *all_pipeline_next_worker(struct all_pipeline *pl)
+{
+	if (all_pipeline_write(pl, pl->num_frms - pl->num_workers + 1))
+	{
+		return 0;
+	}
+	return &pl->workers[pl->num_frms % pl->num_workers];
+}
 
-		/* =========== motion ============== */
+/**
+ * Hand over the frame read into the buffers of all_pipeline_next_worker to
+ * the worker, to compute.
+ */
+static void all_pipeline_push(struct all_pipeline *pl)
+{
+	struct all_worker *worker = &pl->workers[pl->num_frms % pl->num_workers];
 
-		// filter
-		// apply filtering (to eliminate effects film grain)
-		// stride input to convolution_f32_c is in terms of (sizeof(number_t) bytes)
-		// since stride = ALIGN_CEIL(w * sizeof(number_t)), stride divides sizeof(number_t)
-		convolution_f32_c(FILTER_5, 5, ref_buf, blur_buf, temp_buf, w, h, stride / sizeof(number_t), stride / sizeof(number_t));
+	if (!worker->ctx.skip_motion)
+	{
+		// the worker takes over last_ref_buf, and its ref y becomes the
+		// last one
+		number_t *buf = worker->prev_ref_buf;
+		worker->prev_ref_buf = pl->last_ref_buf;
+		worker->has_prev_ref = pl->has_last_ref;
+		pl->last_ref_buf = buf;
+		memcpy(pl->last_ref_buf, worker->ctx.ref_buf, worker->ctx.data_sz);
+		pl->has_last_ref = 1;
+	}
 
-		// compute
-		if (frm_idx == 0)
-		{
-			score = 0.0;
-		}
-		else
-		{
-			if ((ret = compute_motion(prev_blur_buf, blur_buf, w, h, stride, stride, &score)))
-			{
-				printf("error: compute_motion failed.\n");
-				fflush(stdout);
-				goto fail_or_end;
-			}
-		}
+	pthread_mutex_lock(&pl->mutex);
+	worker->state = ALL_WORKER_READY;
+	pthread_cond_broadcast(&pl->ready_cond);
+	pthread_mutex_unlock(&pl->mutex);
 
-		// copy to prev_buf
-		memcpy(prev_blur_buf, blur_buf, data_sz);
+	pl->num_frms++;
+}
 
-		// print
-		printf("motion: %d %f\n", frm_idx, score);
-		fflush(stdout);
+int all(const char *ref_path, const char *dis_path, int w, int h, const char *fmt, const cli_options *opts)
+{
+	struct all_context ctx = {0};
+	double row[ALL_NUM_FEATURES];
+	const char *feature_names[ALL_NUM_FEATURES];
+	int feature_idxs[ALL_NUM_FEATURES]; // column in row of each output feature
+	int num_features = 0;
+	int *frm_idxs = 0; // frames to compute, with --frames
+	int num_frm_idxs = 0;
+	int ref_pos = 0; // next frame of ref_rfile, relative to its start frame
+	int dis_pos = 0; // next frame of dis_rfile, relative to its start frame
+	int pos;
+	FILE *ref_rfile = 0;
+	FILE *dis_rfile = 0;
+	frame_writer fw = {0};
+	struct all_pipeline pl = {0}; // with --threads
+	int ret = 1;
 
-		/* =========== vif ============== */
-		// compute vif last, because its input ref/dis must be offset by -128
-		offset_image(ref_buf, -128, w, h, stride);
-		offset_image(dis_buf, -128, w, h, stride);
+	if (all_context_init(&ctx, w, h, fmt))
+	{
+		goto fail_or_end;
+	}
+	ctx.skip_motion = opts->skip_ref_features;
 
-		if ((ret = compute_vif(ref_buf, dis_buf, w, h, stride, stride, &score, &score_num, &score_den, scores)))
+	for (int i = 0; i < ALL_NUM_FEATURES; i++)
+	{
+		if (i == ALL_MOTION && ctx.skip_motion)
 		{
-			printf("error: compute_vif failed.\n");
-			fflush(stdout);
-			goto fail_or_end;
+			continue;
 		}
-		printf("vif: %d %f\n", frm_idx, score);
+		feature_names[num_features] = all_feature_names[i];
+		feature_idxs[num_features] = i;
+		num_features++;
+	}
+
+	if (opts->frames_path && read_frame_idxs(opts->frames_path, &frm_idxs, &num_frm_idxs))
+	{
+		goto fail_or_end;
+	}
+
+	if (!(ref_rfile = fopen(ref_path, "rb")))
+	{
+		printf("error: fopen ref_path %s failed.\n", ref_path);
 		fflush(stdout);
-		printf("vif_num: %d %f\n", frm_idx, score_num);
+		goto fail_or_end;
+	}
+	if (!(dis_rfile = fopen(dis_path, "rb")))
+	{
+		printf("error: fopen dis_path %s failed.\n", dis_path);
 		fflush(stdout);
-		printf("vif_den: %d %f\n", frm_idx, score_den);
+		goto fail_or_end;
+	}
+
+	if (frame_writer_open(&fw, opts->out_path, opts->binary, feature_names, num_features))
+	{
+		goto fail_or_end;
+	}
+
+	// with --threads, frames are read and written on this thread, and
+	// computed on the workers of pl
+	if (opts->num_threads && all_pipeline_init(&pl, opts->num_threads, w, h, fmt, ctx.skip_motion, &fw, feature_idxs, num_features))
+	{
+		goto fail_or_end;
+	}
+
+	size_t frame_sz = ((size_t)w * h + ctx.offset) * (ctx.is_10bit ? 2 : 1);
+	if (seek_frame(ref_rfile, opts->ref_start_frame, frame_sz))
+	{
+		printf("error: seek ref to frame %d failed.\n", opts->ref_start_frame);
 		fflush(stdout);
-		for(int scale=0;scale<4;scale++){
-			printf("vif_num_scale%d: %d %f\n", scale, frm_idx, scores[2*scale]);
-			printf("vif_den_scale%d: %d %f\n", scale, frm_idx, scores[2*scale+1]);
+		goto fail_or_end;
+	}
+	if (seek_frame(dis_rfile, opts->dis_start_frame, frame_sz))
+	{
+		printf("error: seek dis to frame %d failed.\n", opts->dis_start_frame);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
+	while (1)
+	{
+		// frame to compute next, relative to the start frames
+		if (opts->frames_path)
+		{
+			if (ctx.frm_idx >= num_frm_idxs)
+			{
+				break;
+			}
+			pos = frm_idxs[ctx.frm_idx];
+		}
+		else
+		{
+			pos = ctx.frm_idx;
+		}
+		if (opts->num_frames >= 0 && pos >= opts->num_frames)
+		{
+			break;
 		}
 
-		// ref skip u and v
-		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
+		// the frame preceding pos is skipped: read its ref y for motion
+		if (!ctx.skip_motion && pos > ref_pos)
 		{
-			if (fread(temp_buf, 1, offset, ref_rfile) != (size_t)offset)
+			number_t *prev_ref_buf = pl.num_workers ? pl.last_ref_buf : ctx.ref_buf;
+
+			if ((ret = skip_frames(ref_rfile, pos - 1 - ref_pos, frame_sz) || all_read_y(&ctx, ref_rfile, prev_ref_buf)))
 			{
-				printf("error: ref fread u and v failed.\n");
+				if (feof(ref_rfile))
+				{
+					ret = 0; // OK if end of file
+				}
+				goto fail_or_end;
+			}
+			if (skip_bytes(ref_rfile, ctx.offset * (ctx.is_10bit ? 2 : 1)))
+			{
+				all_pipeline_write(&pl, pl.num_frms); // the frames before, as without --threads
+				printf("error: ref skip u and v failed.\n");
 				fflush(stdout);
+				ret = 1;
 				goto fail_or_end;
 			}
+			if (pl.num_workers)
+			{
+				pl.has_last_ref = 1;
+			}
+			else
+			{
+				all_set_prev_frame(&ctx, ctx.ref_buf);
+			}
+			ref_pos = pos;
 		}
-		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
+
+		// with --threads, read into the buffers of the worker to compute
+		// the frame
+		number_t *ref_buf = ctx.ref_buf;
+		number_t *dis_buf = ctx.dis_buf;
+		if (pl.num_workers)
 		{
-			if (fread(temp_buf, 2, offset, ref_rfile) != (size_t)offset)
+			struct all_worker *worker = all_pipeline_next_worker(&pl);
+
+			if (!worker)
 			{
-				printf("error: ref fread u and v failed.\n");
-				fflush(stdout);
+				ret = pl.ret;
 				goto fail_or_end;
 			}
+			ref_buf = worker->ctx.ref_buf;
+			dis_buf = worker->ctx.dis_buf;
 		}
-		else
+
+		// read ref y
+		if ((ret = skip_frames(ref_rfile, pos - ref_pos, frame_sz) || all_read_y(&ctx, ref_rfile, ref_buf)))
 		{
-			printf("error: unknown format %s.\n", fmt);
-			fflush(stdout);
+			if (feof(ref_rfile))
+			{
+				ret = 0; // OK if end of file
+			}
 			goto fail_or_end;
 		}
 
-		// dis skip u and v
-		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
+		// read dis y
+		if ((ret = skip_frames(dis_rfile, pos - dis_pos, frame_sz) || all_read_y(&ctx, dis_rfile, dis_buf)))
 		{
-			if (fread(temp_buf, 1, offset, dis_rfile) != (size_t)offset)
+			if (feof(dis_rfile))
 			{
-				printf("error: dis fread u and v failed.\n");
-				fflush(stdout);
-				goto fail_or_end;
+				ret = 0; // OK if end of file
 			}
+			goto fail_or_end;
 		}
-		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
+
+		if (pl.num_workers)
 		{
-			if (fread(temp_buf, 2, offset, dis_rfile) != (size_t)offset)
+			// written once computed, see all_pipeline_write
+			all_pipeline_push(&pl);
+			ctx.frm_idx++;
+		}
+		else
+		{
+			int frm_idx = ctx.frm_idx;
+			if ((ret = all_compute_frame(&ctx, ctx.ref_buf, ctx.dis_buf, row)))
+			{
+				goto fail_or_end;
+			}
+
+			for (int i = 0; i < num_features; i++)
+			{
+				frame_writer_put(&fw, frm_idx, i, row[feature_idxs[i]]);
+			}
+			if ((ret = frame_writer_end_frame(&fw)))
 			{
-				printf("error: dis fread u and v failed.\n");
-				fflush(stdout);
 				goto fail_or_end;
 			}
 		}
-		else
+
+		// ref skip u and v
+		if (skip_bytes(ref_rfile, ctx.offset * (ctx.is_10bit ? 2 : 1)))
+		{
+			all_pipeline_write(&pl, pl.num_frms); // the frames before, as without --threads
+			printf("error: ref skip u and v failed.\n");
+			fflush(stdout);
+			goto fail_or_end;
+		}
+
+		// dis skip u and v
+		if (skip_bytes(dis_rfile, ctx.offset * (ctx.is_10bit ? 2 : 1)))
 		{
-			printf("error: unknown format %s.\n", fmt);
+			all_pipeline_write(&pl, pl.num_frms); // the frames before, as without --threads
+			printf("error: dis skip u and v failed.\n");
 			fflush(stdout);
 			goto fail_or_end;
 		}
 
-		frm_idx++;
+		ref_pos = pos + 1;
+		dis_pos = pos + 1;
 	}
 
 	ret = 0;
 
 fail_or_end:
+	if (pl.num_workers)
+	{
+		// write the frames handed over, as if computed on this thread
+		int write_ret = all_pipeline_write(&pl, pl.num_frms);
+		if (!ret)
+		{
+			ret = write_ret;
+		}
+		all_pipeline_close(&pl);
+	}
+	frame_writer_close(&fw);
 	if (ref_rfile)
 	{
 		fclose(ref_rfile);
@@ -379,12 +863,113 @@ fail_or_end:
 	{
 		fclose(dis_rfile);
 	}
-	aligned_free(ref_buf);
-	aligned_free(dis_buf);
-
-	aligned_free(prev_blur_buf);
-	aligned_free(blur_buf);
-	aligned_free(temp_buf);
+	free(frm_idxs);
+	all_context_free(&ctx);
 
 	return ret;
 }
+
+/* =========== per-frame library API, see all.h ============== */
+
+int vmaf_all_num_features(void)
+{
+	return ALL_NUM_FEATURES;
+}
+
+const char *vmaf_all_feature_name(int feature_idx)
+{
+	if (feature_idx < 0 || feature_idx >= ALL_NUM_FEATURES)
+	{
+		return 0;
+	}
+	return all_feature_names[feature_idx];
+}
+
+void *vmaf_all_open(int w, int h, const char *fmt)
+{
+	struct all_context *ctx = 0;
+
+	if (!(ctx = malloc(sizeof(*ctx))))
+	{
+		return 0;
+	}
+	if (all_context_init(ctx, w, h, fmt))
+	{
+		free(ctx);
+		return 0;
+	}
+	return ctx;
+}
+
+static void copy_frame(const struct all_context *ctx, number_t *dst, const double *src, int src_stride)
+{
+	int src_stride_ = src_stride / sizeof(double);
+	int dst_stride_ = ctx->stride / sizeof(number_t);
+
+	for (int i = 0; i < ctx->h; ++i)
+	{
+		for (int j = 0; j < ctx->w; ++j)
+		{
+			dst[i * dst_stride_ + j] = (number_t)src[i * src_stride_ + j];
+		}
+	}
+}
+
+int vmaf_all_push_frame(void *context, const double *ref, const double *dis, int stride, double *row)
+{
+	struct all_context *ctx = context;
+
+	if (!ctx || !ref || !dis || !row || stride < ctx->w * (int)sizeof(double))
+	{
+		return 1;
+	}
+
+	copy_frame(ctx, ctx->ref_buf, ref, stride);
+	copy_frame(ctx, ctx->dis_buf, dis, stride);
+
+	return all_compute_frame(ctx, ctx->ref_buf, ctx->dis_buf, row);
+}
+
+int vmaf_all_push_prev_frame(void *context, const double *ref, int stride)
+{
+	struct all_context *ctx = context;
+
+	if (!ctx || !ref || stride < ctx->w * (int)sizeof(double))
+	{
+		return 1;
+	}
+
+	copy_frame(ctx, ctx->ref_buf, ref, stride);
+	all_set_prev_frame(ctx, ctx->ref_buf);
+
+	return 0;
+}
+
+/**
+ * Same as vmaf_all_push_frame, but on frames already read into number_t
+ * buffers with stride ALIGN_CEIL(w * sizeof(number_t)), which are used in
+ * place (and get modified) instead of copied. Used by fused.c, which shares
+ * its read buffers among features.
+ */
+int all_push_frame_inplace(void *context, number_t *ref, number_t *dis, double *row)
+{
+	struct all_context *ctx = context;
+
+	if (!ctx || !ref || !dis || !row)
+	{
+		return 1;
+	}
+
+	return all_compute_frame(ctx, ref, dis, row);
+}
+
+void vmaf_all_close(void *context)
+{
+	struct all_context *ctx = context;
+
+	if (ctx)
+	{
+		all_context_free(ctx);
+		free(ctx);
+	}
+}
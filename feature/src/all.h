@@ -0,0 +1,65 @@
+/**
+ *
+ *  Copyright 2016 Netflix, Inc.
+ *
+ *     Licensed under the Apache License, Version 2.0 (the "License");
+ *     you may not use this file except in compliance with the License.
+ *     You may obtain a copy of the License at
+ *
+ *         http://www.apache.org/licenses/LICENSE-2.0
+ *
+ *     Unless required by applicable law or agreed to in writing, software
+ *     distributed under the License is distributed on an "AS IS" BASIS,
+ *     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ *     See the License for the specific language governing permissions and
+ *     limitations under the License.
+ *
+ */
+
+
+#pragma once
+
+#ifndef ALL_H_
+#define ALL_H_
+
+#include "common/cli_options.h"
+
+/* Columns of a feature row, in the same order as vmaf_all_feature_name() */
+enum
+{
+	ALL_ADM, ALL_ADM_NUM, ALL_ADM_DEN,
+	ALL_ANSNR, ALL_ANPSNR,
+	ALL_MOTION,
+	ALL_VIF, ALL_VIF_NUM, ALL_VIF_DEN,
+	ALL_VIF_NUM_SCALE0, ALL_VIF_DEN_SCALE0,
+	ALL_VIF_NUM_SCALE1, ALL_VIF_DEN_SCALE1,
+	ALL_VIF_NUM_SCALE2, ALL_VIF_DEN_SCALE2,
+	ALL_VIF_NUM_SCALE3, ALL_VIF_DEN_SCALE3,
+	ALL_NUM_FEATURES
+};
+
+int all(const char *ref_path, const char *dis_path, int w, int h, const char *fmt, const cli_options *opts);
+
+/**
+ * Per-frame API of "vmaf all", exported by libvmaf.so:
+ *   ctx = vmaf_all_open(w, h, fmt);
+ *   for each frame:
+ *       vmaf_all_push_frame(ctx, ref_y, dis_y, stride, row);
+ *   vmaf_all_close(ctx);
+ * ref_y and dis_y are the Y planes of a frame as doubles (10-bit values
+ * normalized to 8-bit, i.e. divided by 4), with stride in bytes. row receives
+ * vmaf_all_num_features() scores. Frames must be pushed in display order,
+ * since motion depends on the previous frame. To skip frames, push the Y
+ * plane of ref preceding the next frame computed with
+ * vmaf_all_push_prev_frame(ctx, ref_y, stride), for its motion. vmaf_all_open
+ * returns NULL and vmaf_all_push_frame and vmaf_all_push_prev_frame return
+ * non-zero on failure.
+ */
+int vmaf_all_num_features(void);
+const char *vmaf_all_feature_name(int feature_idx);
+void *vmaf_all_open(int w, int h, const char *fmt);
+int vmaf_all_push_frame(void *context, const double *ref, const double *dis, int stride, double *row);
+int vmaf_all_push_prev_frame(void *context, const double *ref, int stride);
+void vmaf_all_close(void *context);
+
+#endif /* ALL_H_ */
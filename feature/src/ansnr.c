@@ -134,7 +134,6 @@ int ansnr(const char *ref_path, const char *dis_path, int w, int h, const char *
 	double score_psnr = 0;
 	number_t *ref_buf = 0;
 	number_t *dis_buf = 0;
-	number_t *temp_buf = 0;
 	FILE *ref_rfile = 0;
 	FILE *dis_rfile = 0;
 	size_t data_sz;
@@ -167,12 +166,6 @@ int ansnr(const char *ref_path, const char *dis_path, int w, int h, const char *
 		fflush(stdout);
 		goto fail_or_end;
 	}
-	if (!(temp_buf = aligned_malloc(data_sz * 2, MAX_ALIGN)))
-	{
-		printf("error: aligned_malloc failed for temp_buf.\n");
-		fflush(stdout);
-		goto fail_or_end;
-	}
 
 	if (!(ref_rfile = fopen(ref_path, "rb")))
 	{
@@ -297,18 +290,18 @@ int ansnr(const char *ref_path, const char *dis_path, int w, int h, const char *
 		// ref skip u and v
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
 		{
-			if (fread(temp_buf, 1, offset, ref_rfile) != (size_t)offset)
+			if (skip_bytes(ref_rfile, offset))
 			{
-				printf("error: ref fread u and v failed.\n");
+				printf("error: ref skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
 		}
 		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
 		{
-			if (fread(temp_buf, 2, offset, ref_rfile) != (size_t)offset)
+			if (skip_bytes(ref_rfile, offset * 2))
 			{
-				printf("error: ref fread u and v failed.\n");
+				printf("error: ref skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
@@ -323,18 +316,18 @@ int ansnr(const char *ref_path, const char *dis_path, int w, int h, const char *
 		// dis skip u and v
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
 		{
-			if (fread(temp_buf, 1, offset, dis_rfile) != (size_t)offset)
+			if (skip_bytes(dis_rfile, offset))
 			{
-				printf("error: dis fread u and v failed.\n");
+				printf("error: dis skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
 		}
 		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
 		{
-			if (fread(temp_buf, 2, offset, dis_rfile) != (size_t)offset)
+			if (skip_bytes(dis_rfile, offset * 2))
 			{
-				printf("error: dis fread u and v failed.\n");
+				printf("error: dis skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
@@ -362,7 +355,6 @@ fail_or_end:
 	}
 	aligned_free(ref_buf);
 	aligned_free(dis_buf);
-	aligned_free(temp_buf);
 
 	return ret;
 }
@@ -0,0 +1,122 @@
+/**
+ *
+ *  Copyright 2016 Netflix, Inc.
+ *
+ *     Licensed under the Apache License, Version 2.0 (the "License");
+ *     you may not use this file except in compliance with the License.
+ *     You may obtain a copy of the License at
+ *
+ *         http://www.apache.org/licenses/LICENSE-2.0
+ *
+ *     Unless required by applicable law or agreed to in writing, software
+ *     distributed under the License is distributed on an "AS IS" BASIS,
+ *     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ *     See the License for the specific language governing permissions and
+ *     limitations under the License.
+ *
+ */
+
+
+#include <stdlib.h>
+#include <string.h>
+
+#include "cli_options.h"
+
+static int parse_non_negative_int(const char *s, int *value)
+{
+	char *end;
+	long v = strtol(s, &end, 10);
+
+	if (*s == '\0' || *end != '\0' || v < 0 || v > 0x7fffffffL)
+	{
+		return 1;
+	}
+	*value = (int)v;
+	return 0;
+}
+
+/**
+ * Parse the optional trailing arguments described in cli_options.h.
+ * Return 0 on success, 1 on unknown or malformed arguments.
+ */
+int parse_cli_options(int argc, const char **argv, cli_options *opts)
+{
+	int start_frame;
+	int i;
+
+	opts->out_path = 0;
+	opts->binary = 0;
+	opts->ref_start_frame = 0;
+	opts->dis_start_frame = 0;
+	opts->num_frames = -1;
+	opts->skip_ref_features = 0;
+	opts->frames_path = 0;
+	opts->num_threads = 0;
+
+	for (i = 0; i < argc; ++i)
+	{
+		if (!strcmp(argv[i], "--binary"))
+		{
+			opts->binary = 1;
+		}
+		else if (!strcmp(argv[i], "--skip-ref-features"))
+		{
+			opts->skip_ref_features = 1;
+		}
+		else if (i + 1 >= argc)
+		{
+			return 1;
+		}
+		else if (!strcmp(argv[i], "--output"))
+		{
+			opts->out_path = argv[++i];
+		}
+		else if (!strcmp(argv[i], "--frames"))
+		{
+			opts->frames_path = argv[++i];
+		}
+		else if (!strcmp(argv[i], "--start-frame"))
+		{
+			if (parse_non_negative_int(argv[++i], &start_frame))
+			{
+				return 1;
+			}
+			opts->ref_start_frame = start_frame;
+			opts->dis_start_frame = start_frame;
+		}
+		else if (!strcmp(argv[i], "--ref-start-frame"))
+		{
+			if (parse_non_negative_int(argv[++i], &opts->ref_start_frame))
+			{
+				return 1;
+			}
+		}
+		else if (!strcmp(argv[i], "--dis-start-frame"))
+		{
+			if (parse_non_negative_int(argv[++i], &opts->dis_start_frame))
+			{
+				return 1;
+			}
+		}
+		else if (!strcmp(argv[i], "--num-frames"))
+		{
+			if (parse_non_negative_int(argv[++i], &opts->num_frames))
+			{
+				return 1;
+			}
+		}
+		else if (!strcmp(argv[i], "--threads"))
+		{
+			if (parse_non_negative_int(argv[++i], &opts->num_threads))
+			{
+				return 1;
+			}
+		}
+		else
+		{
+			return 1;
+		}
+	}
+
+	return 0;
+}
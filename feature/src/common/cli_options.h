@@ -0,0 +1,59 @@
+/**
+ *
+ *  Copyright 2016 Netflix, Inc.
+ *
+ *     Licensed under the Apache License, Version 2.0 (the "License");
+ *     you may not use this file except in compliance with the License.
+ *     You may obtain a copy of the License at
+ *
+ *         http://www.apache.org/licenses/LICENSE-2.0
+ *
+ *     Unless required by applicable law or agreed to in writing, software
+ *     distributed under the License is distributed on an "AS IS" BASIS,
+ *     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ *     See the License for the specific language governing permissions and
+ *     limitations under the License.
+ *
+ */
+
+
+#pragma once
+
+#ifndef CLI_OPTIONS_H_
+#define CLI_OPTIONS_H_
+
+/**
+ * Optional trailing arguments shared by the feature executables:
+ *   --binary                  write scores as a binary record stream
+ *   --output out_path         append scores to out_path instead of stdout
+ *   --start-frame n           start at frame n of both ref and dis
+ *   --ref-start-frame n       start at frame n of ref
+ *   --dis-start-frame n       start at frame n of dis
+ *   --num-frames n            stop after n frames
+ *   --skip-ref-features       skip the features that depend on ref only (e.g.
+ *                             motion of "vmaf all"), and leave them out of
+ *                             the output
+ *   --frames frames_path      only compute the frames listed in frames_path
+ *                             (indexes relative to the start frames, in
+ *                             ascending order, one per line), skipping the
+ *                             others (supported by "vmaf all" only)
+ *   --threads n               compute n frames at the same time, on as many
+ *                             threads besides the one reading and writing
+ *                             frames, with the same output as without
+ *                             (supported by "vmaf all" only)
+ */
+typedef struct
+{
+	const char *out_path;
+	int binary;
+	int ref_start_frame;
+	int dis_start_frame;
+	int num_frames; // -1 for all frames
+	int skip_ref_features;
+	const char *frames_path; // 0 for all frames
+	int num_threads; // 0 to compute frames on the calling thread
+} cli_options;
+
+int parse_cli_options(int argc, const char **argv, cli_options *opts);
+
+#endif /* CLI_OPTIONS_H_ */
@@ -16,7 +16,12 @@
  *
  */
 
+#define _POSIX_C_SOURCE 200112L
+#define _FILE_OFFSET_BITS 64
+
 #include <stdio.h>
+#include <errno.h>
+#include <sys/types.h>
 #include <stdlib.h>
 #include <assert.h>
 
@@ -50,6 +55,174 @@ fail_or_end:
 	return ret;
 }
 
+/**
+ * Read and discard num_bytes of rfile, e.g. a pipe, which cannot be seeked.
+ */
+static int discard_bytes(FILE *rfile, off_t num_bytes)
+{
+	char buf[4096];
+	size_t chunk_sz;
+
+	while (num_bytes > 0)
+	{
+		chunk_sz = num_bytes < (off_t)sizeof(buf) ? (size_t)num_bytes : sizeof(buf);
+		if (fread(buf, 1, chunk_sz, rfile) != chunk_sz)
+		{
+			return 1;
+		}
+		num_bytes -= chunk_sz;
+	}
+	return 0;
+}
+
+/**
+ * Position rfile at the start of frame frm_idx, frame_sz being the size of
+ * one frame (all planes) in bytes. rfile may be a pipe (e.g. a FIFO
+ * workfile), which cannot be seeked: frame 0 needs no positioning, and the
+ * frames before frm_idx are read and discarded.
+ */
+int seek_frame(FILE *rfile, int frm_idx, size_t frame_sz)
+{
+	off_t offset;
+
+	if (frm_idx < 0)
+	{
+		return 1;
+	}
+	if (frm_idx == 0)
+	{
+		return 0;
+	}
+
+	offset = (off_t)frm_idx * (off_t)frame_sz;
+	if (!fseeko(rfile, offset, SEEK_SET))
+	{
+		return 0;
+	}
+	if (errno != ESPIPE)
+	{
+		return 1;
+	}
+	return discard_bytes(rfile, offset);
+}
+
+/**
+ * Skip the next num_bytes of rfile, by seeking forward or, on a pipe, by
+ * reading and discarding them. Past the end of a regular file, it is the
+ * next read that fails (with feof set).
+ */
+static int seek_or_discard(FILE *rfile, off_t num_bytes)
+{
+	if (num_bytes == 0)
+	{
+		return 0;
+	}
+	if (!fseeko(rfile, num_bytes, SEEK_CUR))
+	{
+		return 0;
+	}
+	if (errno != ESPIPE)
+	{
+		return 1;
+	}
+	return discard_bytes(rfile, num_bytes);
+}
+
+/**
+ * Skip the next num_bytes of rfile, e.g. the u and v planes of a frame whose
+ * y only is used. Unlike fread, it does not copy the skipped bytes, but, like
+ * fread, it fails if rfile ends before them: the last skipped byte is read.
+ */
+int skip_bytes(FILE *rfile, size_t num_bytes)
+{
+	if (num_bytes == 0)
+	{
+		return 0;
+	}
+	if (seek_or_discard(rfile, (off_t)num_bytes - 1))
+	{
+		return 1;
+	}
+	return fgetc(rfile) == EOF;
+}
+
+/**
+ * Skip the next num_frms frames of rfile, frame_sz being the size of one
+ * frame (all planes) in bytes, see seek_or_discard.
+ */
+int skip_frames(FILE *rfile, int num_frms, size_t frame_sz)
+{
+	if (num_frms < 0)
+	{
+		return 1;
+	}
+	return seek_or_discard(rfile, (off_t)num_frms * (off_t)frame_sz);
+}
+
+/**
+ * Read the frame indexes listed in the text file path, one per line, in
+ * ascending order. On success, *frm_idxs holds the *num_frms indexes, to be
+ * freed by the caller.
+ */
+int read_frame_idxs(const char *path, int **frm_idxs, int *num_frms)
+{
+	FILE *rfile = 0;
+	int *idxs = 0;
+	int *new_idxs;
+	int capacity = 0;
+	int num = 0;
+	int idx;
+	int ret = 1;
+
+	if (!(rfile = fopen(path, "r")))
+	{
+		printf("error: fopen frames path %s failed.\n", path);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
+	while (fscanf(rfile, "%d", &idx) == 1)
+	{
+		if (idx < 0 || (num > 0 && idx <= idxs[num - 1]))
+		{
+			printf("error: frame indexes of %s must be non-negative and ascending.\n", path);
+			fflush(stdout);
+			goto fail_or_end;
+		}
+		if (num == capacity)
+		{
+			capacity = capacity ? capacity * 2 : 1024;
+			if (!(new_idxs = realloc(idxs, capacity * sizeof(int))))
+			{
+				printf("error: realloc failed for frame indexes.\n");
+				fflush(stdout);
+				goto fail_or_end;
+			}
+			idxs = new_idxs;
+		}
+		idxs[num++] = idx;
+	}
+	if (!feof(rfile))
+	{
+		printf("error: malformed frame index in %s.\n", path);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
+	*frm_idxs = idxs;
+	*num_frms = num;
+	idxs = 0;
+	ret = 0;
+
+fail_or_end:
+	free(idxs);
+	if (rfile)
+	{
+		fclose(rfile);
+	}
+	return ret;
+}
+
 /**
  * Note: stride is in terms of bytes
  */
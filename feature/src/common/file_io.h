@@ -22,6 +22,10 @@
 #define FILE_IO_H_
 
 int read_image(FILE *rfile, void *buf, int width, int height, int stride, int elem_size);
+int seek_frame(FILE *rfile, int frm_idx, size_t frame_sz);
+int skip_bytes(FILE *rfile, size_t num_bytes);
+int skip_frames(FILE *rfile, int num_frms, size_t frame_sz);
+int read_frame_idxs(const char *path, int **frm_idxs, int *num_frms);
 int write_image(FILE *wfile, const void *buf, int width, int height, int stride, int elem_size);
 
 int read_image_b2s(FILE *rfile, float *buf, float off, int width, int height, int stride);
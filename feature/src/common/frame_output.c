@@ -0,0 +1,167 @@
+/**
+ *
+ *  Copyright 2016 Netflix, Inc.
+ *
+ *     Licensed under the Apache License, Version 2.0 (the "License");
+ *     you may not use this file except in compliance with the License.
+ *     You may obtain a copy of the License at
+ *
+ *         http://www.apache.org/licenses/LICENSE-2.0
+ *
+ *     Unless required by applicable law or agreed to in writing, software
+ *     distributed under the License is distributed on an "AS IS" BASIS,
+ *     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ *     See the License for the specific language governing permissions and
+ *     limitations under the License.
+ *
+ */
+
+
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "frame_output.h"
+
+static int write_header(frame_writer *fw)
+{
+	uint32_t header_len = 0;
+	char *header = 0;
+	size_t pos = 0;
+	int i;
+	int ret = 1;
+
+	for (i = 0; i < fw->num_features; ++i)
+	{
+		header_len += strlen(fw->feature_names[i]) + 1;
+	}
+	header_len = (header_len + 7) / 8 * 8;
+
+	if (!(header = calloc(header_len, 1)))
+	{
+		goto fail_or_end;
+	}
+	for (i = 0; i < fw->num_features; ++i)
+	{
+		size_t len = strlen(fw->feature_names[i]);
+		memcpy(header + pos, fw->feature_names[i], len);
+		pos += len;
+		header[pos++] = (i == fw->num_features - 1) ? '\0' : '\n';
+	}
+
+	if (fwrite(FRAME_OUTPUT_MAGIC, 1, FRAME_OUTPUT_MAGIC_LEN, fw->wfile) != FRAME_OUTPUT_MAGIC_LEN ||
+	    fwrite(&header_len, sizeof(header_len), 1, fw->wfile) != 1 ||
+	    fwrite(header, 1, header_len, fw->wfile) != header_len)
+	{
+		goto fail_or_end;
+	}
+
+	fw->header_written = 1;
+	ret = 0;
+
+fail_or_end:
+	free(header);
+	return ret;
+}
+
+/**
+ * Open a writer for per-frame feature scores. If out_path is NULL, write to
+ * stdout; otherwise append to out_path. In text mode, each score is printed
+ * as "<feature_name>: <frm_idx> <score>"; in binary mode, see
+ * frame_output.h for the layout.
+ */
+int frame_writer_open(frame_writer *fw, const char *out_path, int binary, const char **feature_names, int num_features)
+{
+	int ret = 1;
+
+	memset(fw, 0, sizeof(*fw));
+	fw->binary = binary;
+	fw->num_features = num_features;
+	fw->feature_names = feature_names;
+
+	if (!out_path)
+	{
+		fw->wfile = stdout;
+	}
+	else if (!(fw->wfile = fopen(out_path, binary ? "ab" : "a")))
+	{
+		printf("error: fopen out_path %s failed.\n", out_path);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
+	if (binary && !(fw->row = calloc(num_features, sizeof(double))))
+	{
+		printf("error: calloc failed for row.\n");
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
+	ret = 0;
+
+fail_or_end:
+	return ret;
+}
+
+void frame_writer_put(frame_writer *fw, int frm_idx, int feature_idx, double score)
+{
+	if (fw->binary)
+	{
+		fw->row[feature_idx] = score;
+	}
+	else
+	{
+		fprintf(fw->wfile, "%s: %d %f\n", fw->feature_names[feature_idx], frm_idx, score);
+		fflush(fw->wfile);
+	}
+}
+
+int frame_writer_end_frame(frame_writer *fw)
+{
+	int ret = 1;
+
+	if (fw->binary)
+	{
+		if (!fw->header_written && write_header(fw))
+		{
+			printf("error: write frame output header failed.\n");
+			fflush(stdout);
+			goto fail_or_end;
+		}
+		// flush every frame, so that a reader (e.g. through a pipe) gets it
+		// right away, and stop if the reader is gone
+		if (fwrite(fw->row, sizeof(double), fw->num_features, fw->wfile) != (size_t)fw->num_features ||
+		    fflush(fw->wfile))
+		{
+			printf("error: write frame output row failed.\n");
+			fflush(stdout);
+			goto fail_or_end;
+		}
+	}
+
+	ret = 0;
+
+fail_or_end:
+	return ret;
+}
+
+void frame_writer_close(frame_writer *fw)
+{
+	// write header even if there is no frame, so that the output is valid
+	if (fw->binary && fw->wfile && !fw->header_written)
+	{
+		write_header(fw);
+	}
+	if (fw->wfile && fw->wfile != stdout)
+	{
+		fclose(fw->wfile);
+	}
+	else if (fw->wfile)
+	{
+		fflush(fw->wfile);
+	}
+	free(fw->row);
+	fw->wfile = 0;
+	fw->row = 0;
+}
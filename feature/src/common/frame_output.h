@@ -0,0 +1,52 @@
+/**
+ *
+ *  Copyright 2016 Netflix, Inc.
+ *
+ *     Licensed under the Apache License, Version 2.0 (the "License");
+ *     you may not use this file except in compliance with the License.
+ *     You may obtain a copy of the License at
+ *
+ *         http://www.apache.org/licenses/LICENSE-2.0
+ *
+ *     Unless required by applicable law or agreed to in writing, software
+ *     distributed under the License is distributed on an "AS IS" BASIS,
+ *     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ *     See the License for the specific language governing permissions and
+ *     limitations under the License.
+ *
+ */
+
+
+#pragma once
+
+#ifndef FRAME_OUTPUT_H_
+#define FRAME_OUTPUT_H_
+
+#include <stdio.h>
+
+/**
+ * Binary output stream layout (integers and floats in native byte order):
+ *   FRAME_OUTPUT_MAGIC (8 bytes)
+ *   uint32 header length L (multiple of 8)
+ *   L bytes of feature names separated by '\n', padded with '\0'
+ *   one row of num_features float64 per frame, in the order of the names
+ */
+#define FRAME_OUTPUT_MAGIC "VMAFBIN1"
+#define FRAME_OUTPUT_MAGIC_LEN 8
+
+typedef struct
+{
+	FILE *wfile;
+	int binary;
+	int num_features;
+	const char **feature_names;
+	double *row;
+	int header_written;
+} frame_writer;
+
+int frame_writer_open(frame_writer *fw, const char *out_path, int binary, const char **feature_names, int num_features);
+void frame_writer_put(frame_writer *fw, int frm_idx, int feature_idx, double score);
+int frame_writer_end_frame(frame_writer *fw);
+void frame_writer_close(frame_writer *fw);
+
+#endif /* FRAME_OUTPUT_H_ */
@@ -0,0 +1,436 @@
+/**
+ *
+ *  Copyright 2016 Netflix, Inc.
+ *
+ *     Licensed under the Apache License, Version 2.0 (the "License");
+ *     you may not use this file except in compliance with the License.
+ *     You may obtain a copy of the License at
+ *
+ *         http://www.apache.org/licenses/LICENSE-2.0
+ *
+ *     Unless required by applicable law or agreed to in writing, software
+ *     distributed under the License is distributed on an "AS IS" BASIS,
+ *     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ *     See the License for the specific language governing permissions and
+ *     limitations under the License.
+ *
+ */
+
+#include <limits.h>
+#include <stddef.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "common/alloc.h"
+#include "common/file_io.h"
+#include "common/frame_output.h"
+#include "common/cli_options.h"
+#include "iqa/ssim_tools.h"
+#include "all_options.h"
+#include "psnr_options.h"
+#include "all.h"
+
+/*
+ * The frames are read once into buffers shared by all features, so every
+ * feature must work on the same precision (ssim and ms_ssim are single
+ * precision only).
+ */
+#if !defined(ALL_OPT_SINGLE_PRECISION) || !defined(PSNR_OPT_SINGLE_PRECISION)
+	#error "fused requires ALL_OPT_SINGLE_PRECISION and PSNR_OPT_SINGLE_PRECISION"
+#endif
+
+typedef float number_t;
+
+#define read_image_b  read_image_b2s
+#define read_image_w  read_image_w2s
+
+int compute_psnr(const float *ref, const float *dis, int w, int h, int ref_stride, int dis_stride, double *score, double peak, double psnr_max);
+int compute_ssim(const float *ref, const float *cmp, int w, int h, int ref_stride, int cmp_stride, double *score, double *l_score, double *c_score, double *s_score);
+int compute_ms_ssim(const float *ref, const float *cmp, int w, int h, int ref_stride, int cmp_stride, double *score, double *l_scores, double *c_scores, double *s_scores);
+int all_push_frame_inplace(void *context, float *ref, float *dis, double *row);
+
+extern const char *psnr_feature_names[1];
+extern const char *ssim_feature_names[4];
+extern const char *ms_ssim_feature_names[1 + 3 * SCALES];
+
+/* feature groups, named after the executables computing them separately */
+enum
+{
+	FUSED_ALL,
+	FUSED_PSNR,
+	FUSED_SSIM,
+	FUSED_MS_SSIM,
+	FUSED_NUM_GROUPS
+};
+
+static const char *fused_group_names[FUSED_NUM_GROUPS] = {"all", "psnr", "ssim", "ms_ssim"};
+
+#define FUSED_MAX_NUM_FEATURES (ALL_NUM_FEATURES + 1 + 4 + 1 + 3 * SCALES)
+
+/**
+ * Parse a comma-separated list of feature groups, e.g. "all,psnr", into
+ * enabled (indexed by FUSED_ALL, FUSED_PSNR, etc.).
+ */
+static int parse_groups(const char *groups, int *enabled)
+{
+	const char *begin = groups;
+	int num_enabled = 0;
+
+	for (int i = 0; i < FUSED_NUM_GROUPS; i++)
+	{
+		enabled[i] = 0;
+	}
+
+	while (*begin)
+	{
+		const char *end = strchr(begin, ',');
+		size_t len = end ? (size_t)(end - begin) : strlen(begin);
+		int i;
+
+		for (i = 0; i < FUSED_NUM_GROUPS; i++)
+		{
+			if (strlen(fused_group_names[i]) == len && !strncmp(begin, fused_group_names[i], len))
+			{
+				break;
+			}
+		}
+		if (i == FUSED_NUM_GROUPS)
+		{
+			printf("error: unknown feature group %.*s.\n", (int)len, begin);
+			fflush(stdout);
+			return 1;
+		}
+		if (!enabled[i])
+		{
+			enabled[i] = 1;
+			num_enabled++;
+		}
+
+		begin += len;
+		if (*begin == ',')
+		{
+			begin++;
+		}
+	}
+
+	if (!num_enabled)
+	{
+		printf("error: no feature group in %s.\n", groups);
+		fflush(stdout);
+		return 1;
+	}
+	return 0;
+}
+
+/**
+ * Compute the features of the groups listed in groups (see parse_groups) in a
+ * single pass over ref and dis: each frame is read once, and every group is
+ * computed on the same buffers. The output has the features of the groups in
+ * the order of fused_group_names, with the same names and scores as the
+ * executables computing them separately.
+ */
+int fused(const char *groups, const char *ref_path, const char *dis_path, int w, int h, const char *fmt, const cli_options *opts)
+{
+	int enabled[FUSED_NUM_GROUPS];
+	int group_cols[FUSED_NUM_GROUPS] = {0};
+	const char *feature_names[FUSED_MAX_NUM_FEATURES];
+	int num_features = 0;
+
+	double score = 0;
+	double l_score = 0, c_score = 0, s_score = 0;
+	double l_scores[SCALES], c_scores[SCALES], s_scores[SCALES];
+	double all_row[ALL_NUM_FEATURES];
+	number_t *ref_buf = 0;
+	number_t *dis_buf = 0;
+	void *all_ctx = 0;
+
+	FILE *ref_rfile = 0;
+	FILE *dis_rfile = 0;
+	frame_writer fw = {0};
+	size_t data_sz;
+	int stride;
+	int is_10bit;
+	int ret = 1;
+
+	if (parse_groups(groups, enabled))
+	{
+		goto fail_or_end;
+	}
+
+	// columns of the output: features of each enabled group, in group order
+	if (enabled[FUSED_ALL])
+	{
+		group_cols[FUSED_ALL] = num_features;
+		for (int i = 0; i < ALL_NUM_FEATURES; i++)
+		{
+			feature_names[num_features++] = vmaf_all_feature_name(i);
+		}
+	}
+	if (enabled[FUSED_PSNR])
+	{
+		group_cols[FUSED_PSNR] = num_features;
+		feature_names[num_features++] = psnr_feature_names[0];
+	}
+	if (enabled[FUSED_SSIM])
+	{
+		group_cols[FUSED_SSIM] = num_features;
+		for (int i = 0; i < 4; i++)
+		{
+			feature_names[num_features++] = ssim_feature_names[i];
+		}
+	}
+	if (enabled[FUSED_MS_SSIM])
+	{
+		group_cols[FUSED_MS_SSIM] = num_features;
+		for (int i = 0; i < 1 + 3 * SCALES; i++)
+		{
+			feature_names[num_features++] = ms_ssim_feature_names[i];
+		}
+	}
+
+	if (w <= 0 || h <= 0 || (size_t)w > ALIGN_FLOOR(INT_MAX) / sizeof(number_t))
+	{
+		goto fail_or_end;
+	}
+
+	stride = ALIGN_CEIL(w * sizeof(number_t));
+
+	if ((size_t)h > SIZE_MAX / stride)
+	{
+		goto fail_or_end;
+	}
+
+	data_sz = (size_t)stride * h;
+
+	size_t offset;
+	if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv420p10le"))
+	{
+		if ((w * h) % 2 != 0)
+		{
+			printf("error: (w * h) %% 2 != 0, w = %d, h = %d.\n", w, h);
+			fflush(stdout);
+			goto fail_or_end;
+		}
+		offset = w * h / 2;
+	}
+	else if (!strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv422p10le"))
+	{
+		offset = w * h;
+	}
+	else if (!strcmp(fmt, "yuv444p") || !strcmp(fmt, "yuv444p10le"))
+	{
+		offset = w * h * 2;
+	}
+	else
+	{
+		printf("error: unknown format %s.\n", fmt);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+	is_10bit = !strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le");
+
+	if (!(ref_buf = aligned_malloc(data_sz, MAX_ALIGN)))
+	{
+		printf("error: aligned_malloc failed for ref_buf.\n");
+		fflush(stdout);
+		goto fail_or_end;
+	}
+	if (!(dis_buf = aligned_malloc(data_sz, MAX_ALIGN)))
+	{
+		printf("error: aligned_malloc failed for dis_buf.\n");
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
+	if (enabled[FUSED_ALL] && !(all_ctx = vmaf_all_open(w, h, fmt)))
+	{
+		printf("error: vmaf_all_open failed.\n");
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
+	if (!(ref_rfile = fopen(ref_path, "rb")))
+	{
+		printf("error: fopen ref_path %s failed\n", ref_path);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+	if (!(dis_rfile = fopen(dis_path, "rb")))
+	{
+		printf("error: fopen dis_path %s failed.\n", dis_path);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
+	if (frame_writer_open(&fw, opts->out_path, opts->binary, feature_names, num_features))
+	{
+		goto fail_or_end;
+	}
+
+	size_t frame_sz = (w * h + offset) * (is_10bit ? 2 : 1);
+	if (seek_frame(ref_rfile, opts->ref_start_frame, frame_sz))
+	{
+		printf("error: seek ref to frame %d failed.\n", opts->ref_start_frame);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+	if (seek_frame(dis_rfile, opts->dis_start_frame, frame_sz))
+	{
+		printf("error: seek dis to frame %d failed.\n", opts->dis_start_frame);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
+	int frm_idx = 0;
+	while (opts->num_frames < 0 || frm_idx < opts->num_frames)
+	{
+		// read ref y
+		if (!is_10bit)
+		{
+			ret = read_image_b(ref_rfile, ref_buf, 0, w, h, stride);
+		}
+		else
+		{
+			ret = read_image_w(ref_rfile, ref_buf, 0, w, h, stride);
+		}
+		if (ret)
+		{
+			if (feof(ref_rfile))
+			{
+				ret = 0; // OK if end of file
+			}
+			goto fail_or_end;
+		}
+
+		// read dis y
+		if (!is_10bit)
+		{
+			ret = read_image_b(dis_rfile, dis_buf, 0, w, h, stride);
+		}
+		else
+		{
+			ret = read_image_w(dis_rfile, dis_buf, 0, w, h, stride);
+		}
+		if (ret)
+		{
+			if (feof(dis_rfile))
+			{
+				ret = 0; // OK if end of file
+			}
+			goto fail_or_end;
+		}
+
+		/* =========== psnr ============== */
+		if (enabled[FUSED_PSNR])
+		{
+			if (!is_10bit)
+			{
+				// max psnr 60.0 for 8-bit per Ioannis
+				ret = compute_psnr(ref_buf, dis_buf, w, h, stride, stride, &score, 255.0, 60.0);
+			}
+			else
+			{
+				// 10 bit gets normalized to 8 bit, peak is 1023 / 4.0 = 255.75
+				// max psnr 72.0 for 10-bit per Ioannis
+				ret = compute_psnr(ref_buf, dis_buf, w, h, stride, stride, &score, 255.75, 72.0);
+			}
+			if (ret)
+			{
+				printf("error: compute_psnr failed.\n");
+				fflush(stdout);
+				goto fail_or_end;
+			}
+			frame_writer_put(&fw, frm_idx, group_cols[FUSED_PSNR], score);
+		}
+
+		/* =========== ssim ============== */
+		if (enabled[FUSED_SSIM])
+		{
+			if ((ret = compute_ssim(ref_buf, dis_buf, w, h, stride, stride, &score, &l_score, &c_score, &s_score)))
+			{
+				printf("error: compute_ssim failed.\n");
+				fflush(stdout);
+				goto fail_or_end;
+			}
+			frame_writer_put(&fw, frm_idx, group_cols[FUSED_SSIM], score);
+			frame_writer_put(&fw, frm_idx, group_cols[FUSED_SSIM] + 1, l_score);
+			frame_writer_put(&fw, frm_idx, group_cols[FUSED_SSIM] + 2, c_score);
+			frame_writer_put(&fw, frm_idx, group_cols[FUSED_SSIM] + 3, s_score);
+		}
+
+		/* =========== ms_ssim ============== */
+		if (enabled[FUSED_MS_SSIM])
+		{
+			if ((ret = compute_ms_ssim(ref_buf, dis_buf, w, h, stride, stride, &score, l_scores, c_scores, s_scores)))
+			{
+				printf("error: compute_ms_ssim failed.\n");
+				fflush(stdout);
+				goto fail_or_end;
+			}
+			frame_writer_put(&fw, frm_idx, group_cols[FUSED_MS_SSIM], score);
+			for (int scale = 0; scale < SCALES; scale++)
+			{
+				frame_writer_put(&fw, frm_idx, group_cols[FUSED_MS_SSIM] + 1 + 3*scale, l_scores[scale]);
+				frame_writer_put(&fw, frm_idx, group_cols[FUSED_MS_SSIM] + 2 + 3*scale, c_scores[scale]);
+				frame_writer_put(&fw, frm_idx, group_cols[FUSED_MS_SSIM] + 3 + 3*scale, s_scores[scale]);
+			}
+		}
+
+		/* =========== all ============== */
+		// compute all last, because it modifies ref_buf and dis_buf
+		if (enabled[FUSED_ALL])
+		{
+			if ((ret = all_push_frame_inplace(all_ctx, ref_buf, dis_buf, all_row)))
+			{
+				goto fail_or_end;
+			}
+			for (int i = 0; i < ALL_NUM_FEATURES; i++)
+			{
+				frame_writer_put(&fw, frm_idx, group_cols[FUSED_ALL] + i, all_row[i]);
+			}
+		}
+
+		if ((ret = frame_writer_end_frame(&fw)))
+		{
+			goto fail_or_end;
+		}
+
+		// ref skip u and v
+		if (skip_bytes(ref_rfile, offset * (is_10bit ? 2 : 1)))
+		{
+			printf("error: ref skip u and v failed.\n");
+			fflush(stdout);
+			goto fail_or_end;
+		}
+
+		// dis skip u and v
+		if (skip_bytes(dis_rfile, offset * (is_10bit ? 2 : 1)))
+		{
+			printf("error: dis skip u and v failed.\n");
+			fflush(stdout);
+			goto fail_or_end;
+		}
+
+		frm_idx++;
+	}
+
+	ret = 0;
+
+fail_or_end:
+	frame_writer_close(&fw);
+	if (ref_rfile)
+	{
+		fclose(ref_rfile);
+	}
+	if (dis_rfile)
+	{
+		fclose(dis_rfile);
+	}
+	vmaf_all_close(all_ctx);
+	aligned_free(ref_buf);
+	aligned_free(dis_buf);
+
+	return ret;
+}
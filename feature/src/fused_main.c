@@ -0,0 +1,90 @@
+/**
+ *
+ *  Copyright 2016 Netflix, Inc.
+ *
+ *     Licensed under the Apache License, Version 2.0 (the "License");
+ *     you may not use this file except in compliance with the License.
+ *     You may obtain a copy of the License at
+ *
+ *         http://www.apache.org/licenses/LICENSE-2.0
+ *
+ *     Unless required by applicable law or agreed to in writing, software
+ *     distributed under the License is distributed on an "AS IS" BASIS,
+ *     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ *     See the License for the specific language governing permissions and
+ *     limitations under the License.
+ *
+ */
+
+#include <stdlib.h>
+#include <stdio.h>
+
+#include "common/cli_options.h"
+
+int fused(const char *groups, const char *ref_path, const char *dis_path, int w, int h, const char *fmt, const cli_options *opts);
+
+static void usage(void)
+{
+	puts("usage: fused groups fmt ref dis w h [options]\n"
+		 "groups (comma-separated, e.g. all,psnr):\n"
+		 "\tall\n"
+		 "\tpsnr\n"
+		 "\tssim\n"
+		 "\tms_ssim\n"
+		 "fmts:\n"
+		 "\tyuv420p\n"
+		 "\tyuv422p\n"
+		 "\tyuv444p\n"
+		 "\tyuv420p10le\n"
+		 "\tyuv422p10le\n"
+		 "\tyuv444p10le\n"
+		 "options:\n"
+		 "\t--binary: write scores as a binary record stream\n"
+		 "\t--output: append scores to out_path instead of stdout\n"
+		 "\t--start-frame: start at frame n of both ref and dis\n"
+		 "\t--ref-start-frame: start at frame n of ref\n"
+		 "\t--dis-start-frame: start at frame n of dis\n"
+		 "\t--num-frames: stop after n frames"
+	);
+}
+
+int main(int argc, const char **argv)
+{
+	const char *groups;
+	const char *ref_path;
+	const char *dis_path;
+	const char *fmt;
+	cli_options opts;
+	int w;
+	int h;
+	int ret;
+
+	if (argc < 7) {
+		usage();
+		return 2;
+	}
+
+	groups   = argv[1];
+	fmt		 = argv[2];
+	ref_path = argv[3];
+	dis_path = argv[4];
+	w        = atoi(argv[5]);
+	h        = atoi(argv[6]);
+
+	if (w <= 0 || h <= 0) {
+		usage();
+		return 2;
+	}
+
+	if (parse_cli_options(argc - 7, argv + 7, &opts)) {
+		usage();
+		return 2;
+	}
+
+	ret = fused(groups, ref_path, dis_path, w, h, fmt, &opts);
+
+	if (ret)
+		return ret;
+
+	return 0;
+}
@@ -27,6 +27,8 @@
 
 #include "common/alloc.h"
 #include "common/file_io.h"
+#include "common/frame_output.h"
+#include "common/cli_options.h"
 #include "moment_options.h"
 
 #ifdef MOMENT_OPT_SINGLE_PRECISION
@@ -87,12 +89,14 @@ int compute_2nd_moment(const number_t *pic, int w, int h, int stride, double *sc
 	return 0;
 }
 
-int moment(const char *path, int w, int h, const char *fmt, int order)
+static const char *moment_feature_names[] = {"1stmoment", "2ndmoment"};
+
+int moment(const char *path, int w, int h, const char *fmt, int order, const cli_options *opts)
 {
 	double score = 0;
 	number_t *pic_buf = 0;
-	number_t *temp_buf = 0;
 	FILE *rfile = 0;
+	frame_writer fw = {0};
 	size_t data_sz;
 	int stride;
 	int ret = 1;
@@ -117,17 +121,17 @@ int moment(const char *path, int w, int h, const char *fmt, int order)
 		fflush(stdout);
 		goto fail_or_end;
 	}
-	if (!(temp_buf = aligned_malloc(data_sz * 2, MAX_ALIGN)))
+
+	if (!(rfile = fopen(path, "rb")))
 	{
-		printf("error: aligned_malloc failed for temp_buf.\n");
+		printf("error: fopen path %s failed\n", path);
 		fflush(stdout);
 		goto fail_or_end;
 	}
 
-	if (!(rfile = fopen(path, "rb")))
+	// order 1 outputs 1stmoment; order 2 outputs 1stmoment and 2ndmoment
+	if (frame_writer_open(&fw, opts->out_path, opts->binary, moment_feature_names, order == 2 ? 2 : 1))
 	{
-		printf("error: fopen path %s failed\n", path);
-		fflush(stdout);
 		goto fail_or_end;
 	}
 
@@ -157,8 +161,16 @@ int moment(const char *path, int w, int h, const char *fmt, int order)
 		goto fail_or_end;
 	}
 
+	size_t frame_sz = (w * h + offset) * ((!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p")) ? 1 : 2);
+	if (seek_frame(rfile, opts->ref_start_frame, frame_sz))
+	{
+		printf("error: seek to frame %d failed.\n", opts->ref_start_frame);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
 	int frm_idx = 0;
-	while (1)
+	while (opts->num_frames < 0 || frm_idx < opts->num_frames)
 	{
 		// read pic y
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
@@ -188,18 +200,15 @@ int moment(const char *path, int w, int h, const char *fmt, int order)
 		if (order == 1)
 		{
 			ret = compute_1st_moment(pic_buf, w, h, stride, &score);
-			printf("1stmoment: %d %f\n", frm_idx, score);
-			fflush(stdout);
+			frame_writer_put(&fw, frm_idx, 0, score);
 		}
 		else if (order == 2)
 		{
 			ret = compute_1st_moment(pic_buf, w, h, stride, &score);
-			printf("1stmoment: %d %f\n", frm_idx, score);
-			fflush(stdout);
+			frame_writer_put(&fw, frm_idx, 0, score);
 
 			ret = compute_2nd_moment(pic_buf, w, h, stride, &score);
-			printf("2ndmoment: %d %f\n", frm_idx, score);
-			fflush(stdout);
+			frame_writer_put(&fw, frm_idx, 1, score);
 		}
 		else
 		{
@@ -213,22 +222,26 @@ int moment(const char *path, int w, int h, const char *fmt, int order)
 			fflush(stdout);
 			goto fail_or_end;
 		}
+		if ((ret = frame_writer_end_frame(&fw)))
+		{
+			goto fail_or_end;
+		}
 
 		// pic skip u and v
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
 		{
-			if (fread(temp_buf, 1, offset, rfile) != (size_t)offset)
+			if (skip_bytes(rfile, offset))
 			{
-				printf("error: pic fread u and v failed.\n");
+				printf("error: pic skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
 		}
 		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
 		{
-			if (fread(temp_buf, 2, offset, rfile) != (size_t)offset)
+			if (skip_bytes(rfile, offset * 2))
 			{
-				printf("error: pic fread u and v failed.\n");
+				printf("error: pic skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
@@ -246,12 +259,12 @@ int moment(const char *path, int w, int h, const char *fmt, int order)
 	ret = 0;
 
 fail_or_end:
+	frame_writer_close(&fw);
 	if (rfile)
 	{
 		fclose(rfile);
 	}
 	aligned_free(pic_buf);
-	aligned_free(temp_buf);
 
 	return ret;
 }
@@ -19,11 +19,13 @@
 #include <stdio.h>
 #include <stdlib.h>
 
-int moment(const char *path, int w, int h, const char *fmt, int order);
+#include "common/cli_options.h"
+
+int moment(const char *path, int w, int h, const char *fmt, int order, const cli_options *opts);
 
 static void usage(void)
 {
-	puts("usage: moment order fmt video w h\n"
+	puts("usage: moment order fmt video w h [options]\n"
 		 "order:\n"
 		 "\t1\n"
 		 "\t2\n"
@@ -33,7 +35,12 @@ static void usage(void)
 		 "\tyuv444p\n"
 		 "\tyuv420p10le\n"
 		 "\tyuv422p10le\n"
-		 "\tyuv444p10le"
+		 "\tyuv444p10le\n"
+		 "options:\n"
+		 "\t--binary: write scores as a binary record stream\n"
+		 "\t--output: append scores to out_path instead of stdout\n"
+		 "\t--start-frame: start at frame n of video\n"
+		 "\t--num-frames: stop after n frames"
 	);
 }
 
@@ -42,6 +49,7 @@ int main(int argc, const char **argv)
 	const char *video_path;
 	int order;
 	const char *fmt;
+	cli_options opts;
 	int w;
 	int h;
 	int ret;
@@ -68,7 +76,12 @@ int main(int argc, const char **argv)
 		return 2;
 	}
 
-	ret = moment(video_path, w, h, fmt, order);
+	if (parse_cli_options(argc - 6, argv + 6, &opts)) {
+		usage();
+		return 2;
+	}
+
+	ret = moment(video_path, w, h, fmt, order, &opts);
 
 	if (ret)
 		return ret;
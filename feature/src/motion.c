@@ -234,18 +234,18 @@ int motion(const char *ref_path, int w, int h, const char *fmt)
 		// ref skip u and v
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
 		{
-			if (fread(temp_buf, 1, offset, ref_rfile) != (size_t)offset)
+			if (skip_bytes(ref_rfile, offset))
 			{
-				printf("error: ref fread u and v failed.\n");
+				printf("error: ref skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
 		}
 		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
 		{
-			if (fread(temp_buf, 2, offset, ref_rfile) != (size_t)offset)
+			if (skip_bytes(ref_rfile, offset * 2))
 			{
-				printf("error: ref fread u and v failed.\n");
+				printf("error: ref skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
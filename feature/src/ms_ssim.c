@@ -30,6 +30,8 @@
 #include "iqa/math_utils.h"
 #include "iqa/decimate.h"
 #include "iqa/ssim_tools.h"
+#include "common/frame_output.h"
+#include "common/cli_options.h"
 
 // unlike psnr, ssim/ms-ssim only works with single precision
 typedef float number_t;
@@ -329,16 +331,26 @@ fail_or_end:
 
 }
 
-int ms_ssim(const char *ref_path, const char *dis_path, int w, int h, const char *fmt)
+const char *ms_ssim_feature_names[1 + 3 * SCALES] =
+{
+	"ms_ssim",
+	"ms_ssim_l_scale0", "ms_ssim_c_scale0", "ms_ssim_s_scale0",
+	"ms_ssim_l_scale1", "ms_ssim_c_scale1", "ms_ssim_s_scale1",
+	"ms_ssim_l_scale2", "ms_ssim_c_scale2", "ms_ssim_s_scale2",
+	"ms_ssim_l_scale3", "ms_ssim_c_scale3", "ms_ssim_s_scale3",
+	"ms_ssim_l_scale4", "ms_ssim_c_scale4", "ms_ssim_s_scale4",
+};
+
+int ms_ssim(const char *ref_path, const char *dis_path, int w, int h, const char *fmt, const cli_options *opts)
 {
 	double score = 0;
 	double l_scores[SCALES], c_scores[SCALES], s_scores[SCALES];
 	number_t *ref_buf = 0;
 	number_t *dis_buf = 0;
-	number_t *temp_buf = 0;
 
 	FILE *ref_rfile = 0;
 	FILE *dis_rfile = 0;
+	frame_writer fw = {0};
 	size_t data_sz;
 	int stride;
 	int ret = 1;
@@ -369,12 +381,6 @@ int ms_ssim(const char *ref_path, const char *dis_path, int w, int h, const char
 		fflush(stdout);
 		goto fail_or_end;
 	}
-	if (!(temp_buf = aligned_malloc(data_sz * 2, MAX_ALIGN)))
-	{
-		printf("error: aligned_malloc failed for temp_buf.\n");
-		fflush(stdout);
-		goto fail_or_end;
-	}
 
 	if (!(ref_rfile = fopen(ref_path, "rb")))
 	{
@@ -389,6 +395,11 @@ int ms_ssim(const char *ref_path, const char *dis_path, int w, int h, const char
 		goto fail_or_end;
 	}
 
+	if (frame_writer_open(&fw, opts->out_path, opts->binary, ms_ssim_feature_names, 1 + 3 * SCALES))
+	{
+		goto fail_or_end;
+	}
+
 	size_t offset;
 	if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv420p10le"))
 	{
@@ -415,8 +426,22 @@ int ms_ssim(const char *ref_path, const char *dis_path, int w, int h, const char
 		goto fail_or_end;
 	}
 
+	size_t frame_sz = (w * h + offset) * ((!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p")) ? 1 : 2);
+	if (seek_frame(ref_rfile, opts->ref_start_frame, frame_sz))
+	{
+		printf("error: seek ref to frame %d failed.\n", opts->ref_start_frame);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+	if (seek_frame(dis_rfile, opts->dis_start_frame, frame_sz))
+	{
+		printf("error: seek dis to frame %d failed.\n", opts->dis_start_frame);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
 	int frm_idx = 0;
-	while (1)
+	while (opts->num_frames < 0 || frm_idx < opts->num_frames)
 	{
 		// read ref y
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
@@ -476,30 +501,33 @@ int ms_ssim(const char *ref_path, const char *dis_path, int w, int h, const char
 		}
 
 		// print
-		printf("ms_ssim: %d %f\n", frm_idx, score);
+		frame_writer_put(&fw, frm_idx, 0, score);
 		for (int scale=0; scale<SCALES; scale++)
 		{
-			printf("ms_ssim_l_scale%d: %d %f\n", scale, frm_idx, l_scores[scale]);
-			printf("ms_ssim_c_scale%d: %d %f\n", scale, frm_idx, c_scores[scale]);
-			printf("ms_ssim_s_scale%d: %d %f\n", scale, frm_idx, s_scores[scale]);
+			frame_writer_put(&fw, frm_idx, 1 + 3*scale, l_scores[scale]);
+			frame_writer_put(&fw, frm_idx, 2 + 3*scale, c_scores[scale]);
+			frame_writer_put(&fw, frm_idx, 3 + 3*scale, s_scores[scale]);
+		}
+		if ((ret = frame_writer_end_frame(&fw)))
+		{
+			goto fail_or_end;
 		}
-		fflush(stdout);
 
 		// ref skip u and v
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
 		{
-			if (fread(temp_buf, 1, offset, ref_rfile) != (size_t)offset)
+			if (skip_bytes(ref_rfile, offset))
 			{
-				printf("error: ref fread u and v failed.\n");
+				printf("error: ref skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
 		}
 		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
 		{
-			if (fread(temp_buf, 2, offset, ref_rfile) != (size_t)offset)
+			if (skip_bytes(ref_rfile, offset * 2))
 			{
-				printf("error: ref fread u and v failed.\n");
+				printf("error: ref skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
@@ -514,18 +542,18 @@ int ms_ssim(const char *ref_path, const char *dis_path, int w, int h, const char
 		// dis skip u and v
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
 		{
-			if (fread(temp_buf, 1, offset, dis_rfile) != (size_t)offset)
+			if (skip_bytes(dis_rfile, offset))
 			{
-				printf("error: dis fread u and v failed.\n");
+				printf("error: dis skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
 		}
 		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
 		{
-			if (fread(temp_buf, 2, offset, dis_rfile) != (size_t)offset)
+			if (skip_bytes(dis_rfile, offset * 2))
 			{
-				printf("error: dis fread u and v failed.\n");
+				printf("error: dis skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
@@ -543,6 +571,7 @@ int ms_ssim(const char *ref_path, const char *dis_path, int w, int h, const char
 	ret = 0;
 
 fail_or_end:
+	frame_writer_close(&fw);
 	if (ref_rfile)
 	{
 		fclose(ref_rfile);
@@ -553,7 +582,6 @@ fail_or_end:
 	}
 	aligned_free(ref_buf);
 	aligned_free(dis_buf);
-	aligned_free(temp_buf);
 
 	return ret;
 }
@@ -19,18 +19,27 @@
 #include <stdio.h>
 #include <stdlib.h>
 
-int ms_ssim(const char *ref_path, const char *dis_path, int w, int h, const char *fmt);
+#include "common/cli_options.h"
+
+int ms_ssim(const char *ref_path, const char *dis_path, int w, int h, const char *fmt, const cli_options *opts);
 
 static void usage(void)
 {
-	puts("usage: ms_ssim fmt ref dis w h\n"
+	puts("usage: ms_ssim fmt ref dis w h [options]\n"
 		 "fmts:\n"
 		 "\tyuv420p\n"
 		 "\tyuv422p\n"
 		 "\tyuv444p\n"
 		 "\tyuv420p10le\n"
 		 "\tyuv422p10le\n"
-		 "\tyuv444p10le"
+		 "\tyuv444p10le\n"
+		 "options:\n"
+		 "\t--binary: write scores as a binary record stream\n"
+		 "\t--output: append scores to out_path instead of stdout\n"
+		 "\t--start-frame: start at frame n of both ref and dis\n"
+		 "\t--ref-start-frame: start at frame n of ref\n"
+		 "\t--dis-start-frame: start at frame n of dis\n"
+		 "\t--num-frames: stop after n frames"
 	);
 }
 
@@ -39,6 +48,7 @@ int main(int argc, const char **argv)
 	const char *ref_path;
 	const char *dis_path;
 	const char *fmt;
+	cli_options opts;
 	int w;
 	int h;
 	int ret;
@@ -59,7 +69,12 @@ int main(int argc, const char **argv)
 		return 2;
 	}
 
-	ret = ms_ssim(ref_path, dis_path, w, h, fmt);
+	if (parse_cli_options(argc - 6, argv + 6, &opts)) {
+		usage();
+		return 2;
+	}
+
+	ret = ms_ssim(ref_path, dis_path, w, h, fmt, &opts);
 
 	if (ret)
 		return ret;
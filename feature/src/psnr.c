@@ -27,6 +27,8 @@
 
 #include "common/alloc.h"
 #include "common/file_io.h"
+#include "common/frame_output.h"
+#include "common/cli_options.h"
 #include "psnr_options.h"
 
 #ifdef PSNR_OPT_SINGLE_PRECISION
@@ -71,14 +73,16 @@ int compute_psnr(const number_t *ref, const number_t *dis, int w, int h, int ref
 	return 0;
 }
 
-int psnr(const char *ref_path, const char *dis_path, int w, int h, const char *fmt)
+const char *psnr_feature_names[1] = {"psnr"};
+
+int psnr(const char *ref_path, const char *dis_path, int w, int h, const char *fmt, const cli_options *opts)
 {
 	double score = 0;
 	number_t *ref_buf = 0;
 	number_t *dis_buf = 0;
-	number_t *temp_buf = 0;
 	FILE *ref_rfile = 0;
 	FILE *dis_rfile = 0;
+	frame_writer fw = {0};
 	size_t data_sz;
 	int stride;
 	int ret = 1;
@@ -109,12 +113,6 @@ int psnr(const char *ref_path, const char *dis_path, int w, int h, const char *f
 		fflush(stdout);
 		goto fail_or_end;
 	}
-	if (!(temp_buf = aligned_malloc(data_sz * 2, MAX_ALIGN)))
-	{
-		printf("error: aligned_malloc failed for temp_buf.\n");
-		fflush(stdout);
-		goto fail_or_end;
-	}
 
 	if (!(ref_rfile = fopen(ref_path, "rb")))
 	{
@@ -129,6 +127,11 @@ int psnr(const char *ref_path, const char *dis_path, int w, int h, const char *f
 		goto fail_or_end;
 	}
 
+	if (frame_writer_open(&fw, opts->out_path, opts->binary, psnr_feature_names, 1))
+	{
+		goto fail_or_end;
+	}
+
 	size_t offset;
 	if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv420p10le"))
 	{
@@ -155,8 +158,22 @@ int psnr(const char *ref_path, const char *dis_path, int w, int h, const char *f
 		goto fail_or_end;
 	}
 
+	size_t frame_sz = (w * h + offset) * ((!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p")) ? 1 : 2);
+	if (seek_frame(ref_rfile, opts->ref_start_frame, frame_sz))
+	{
+		printf("error: seek ref to frame %d failed.\n", opts->ref_start_frame);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+	if (seek_frame(dis_rfile, opts->dis_start_frame, frame_sz))
+	{
+		printf("error: seek dis to frame %d failed.\n", opts->dis_start_frame);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
 	int frm_idx = 0;
-	while (1)
+	while (opts->num_frames < 0 || frm_idx < opts->num_frames)
 	{
 		// read ref y
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
@@ -232,24 +249,27 @@ int psnr(const char *ref_path, const char *dis_path, int w, int h, const char *f
 		}
 
 		// print
-		printf("psnr: %d %f\n", frm_idx, score);
-		fflush(stdout);
+		frame_writer_put(&fw, frm_idx, 0, score);
+		if ((ret = frame_writer_end_frame(&fw)))
+		{
+			goto fail_or_end;
+		}
 
 		// ref skip u and v
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
 		{
-			if (fread(temp_buf, 1, offset, ref_rfile) != (size_t)offset)
+			if (skip_bytes(ref_rfile, offset))
 			{
-				printf("error: ref fread u and v failed.\n");
+				printf("error: ref skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
 		}
 		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
 		{
-			if (fread(temp_buf, 2, offset, ref_rfile) != (size_t)offset)
+			if (skip_bytes(ref_rfile, offset * 2))
 			{
-				printf("error: ref fread u and v failed.\n");
+				printf("error: ref skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
@@ -264,18 +284,18 @@ int psnr(const char *ref_path, const char *dis_path, int w, int h, const char *f
 		// dis skip u and v
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
 		{
-			if (fread(temp_buf, 1, offset, dis_rfile) != (size_t)offset)
+			if (skip_bytes(dis_rfile, offset))
 			{
-				printf("error: dis fread u and v failed.\n");
+				printf("error: dis skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
 		}
 		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
 		{
-			if (fread(temp_buf, 2, offset, dis_rfile) != (size_t)offset)
+			if (skip_bytes(dis_rfile, offset * 2))
 			{
-				printf("error: dis fread u and v failed.\n");
+				printf("error: dis skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
@@ -293,6 +313,7 @@ int psnr(const char *ref_path, const char *dis_path, int w, int h, const char *f
 	ret = 0;
 
 fail_or_end:
+	frame_writer_close(&fw);
 	if (ref_rfile)
 	{
 		fclose(ref_rfile);
@@ -303,7 +324,6 @@ fail_or_end:
 	}
 	aligned_free(ref_buf);
 	aligned_free(dis_buf);
-	aligned_free(temp_buf);
 
 	return ret;
 }
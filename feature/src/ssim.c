@@ -30,6 +30,8 @@
 #include "iqa/math_utils.h"
 #include "iqa/decimate.h"
 #include "iqa/ssim_tools.h"
+#include "common/frame_output.h"
+#include "common/cli_options.h"
 
 // unlike psnr, ssim/ms-ssim only works with single precision
 typedef float number_t;
@@ -184,16 +186,18 @@ fail_or_end:
 
 }
 
-int ssim(const char *ref_path, const char *dis_path, int w, int h, const char *fmt)
+const char *ssim_feature_names[4] = {"ssim", "ssim_l", "ssim_c", "ssim_s"};
+
+int ssim(const char *ref_path, const char *dis_path, int w, int h, const char *fmt, const cli_options *opts)
 {
 	double score = 0;
 	double l_score = 0, c_score = 0, s_score = 0;
 	number_t *ref_buf = 0;
 	number_t *dis_buf = 0;
-	number_t *temp_buf = 0;
 
 	FILE *ref_rfile = 0;
 	FILE *dis_rfile = 0;
+	frame_writer fw = {0};
 	size_t data_sz;
 	int stride;
 	int ret = 1;
@@ -224,12 +228,6 @@ int ssim(const char *ref_path, const char *dis_path, int w, int h, const char *f
 		fflush(stdout);
 		goto fail_or_end;
 	}
-	if (!(temp_buf = aligned_malloc(data_sz * 2, MAX_ALIGN)))
-	{
-		printf("error: aligned_malloc failed for temp_buf.\n");
-		fflush(stdout);
-		goto fail_or_end;
-	}
 
 	if (!(ref_rfile = fopen(ref_path, "rb")))
 	{
@@ -244,6 +242,11 @@ int ssim(const char *ref_path, const char *dis_path, int w, int h, const char *f
 		goto fail_or_end;
 	}
 
+	if (frame_writer_open(&fw, opts->out_path, opts->binary, ssim_feature_names, 4))
+	{
+		goto fail_or_end;
+	}
+
 	size_t offset;
 	if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv420p10le"))
 	{
@@ -270,8 +273,22 @@ int ssim(const char *ref_path, const char *dis_path, int w, int h, const char *f
 		goto fail_or_end;
 	}
 
+	size_t frame_sz = (w * h + offset) * ((!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p")) ? 1 : 2);
+	if (seek_frame(ref_rfile, opts->ref_start_frame, frame_sz))
+	{
+		printf("error: seek ref to frame %d failed.\n", opts->ref_start_frame);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+	if (seek_frame(dis_rfile, opts->dis_start_frame, frame_sz))
+	{
+		printf("error: seek dis to frame %d failed.\n", opts->dis_start_frame);
+		fflush(stdout);
+		goto fail_or_end;
+	}
+
 	int frm_idx = 0;
-	while (1)
+	while (opts->num_frames < 0 || frm_idx < opts->num_frames)
 	{
 		// read ref y
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
@@ -331,27 +348,30 @@ int ssim(const char *ref_path, const char *dis_path, int w, int h, const char *f
 		}
 
 		// print
-		printf("ssim: %d %f\n", frm_idx, score);
-		printf("ssim_l: %d %f\n", frm_idx, l_score);
-		printf("ssim_c: %d %f\n", frm_idx, c_score);
-		printf("ssim_s: %d %f\n", frm_idx, s_score);
-		fflush(stdout);
+		frame_writer_put(&fw, frm_idx, 0, score);
+		frame_writer_put(&fw, frm_idx, 1, l_score);
+		frame_writer_put(&fw, frm_idx, 2, c_score);
+		frame_writer_put(&fw, frm_idx, 3, s_score);
+		if ((ret = frame_writer_end_frame(&fw)))
+		{
+			goto fail_or_end;
+		}
 
 		// ref skip u and v
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
 		{
-			if (fread(temp_buf, 1, offset, ref_rfile) != (size_t)offset)
+			if (skip_bytes(ref_rfile, offset))
 			{
-				printf("error: ref fread u and v failed.\n");
+				printf("error: ref skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
 		}
 		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
 		{
-			if (fread(temp_buf, 2, offset, ref_rfile) != (size_t)offset)
+			if (skip_bytes(ref_rfile, offset * 2))
 			{
-				printf("error: ref fread u and v failed.\n");
+				printf("error: ref skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
@@ -366,18 +386,18 @@ int ssim(const char *ref_path, const char *dis_path, int w, int h, const char *f
 		// dis skip u and v
 		if (!strcmp(fmt, "yuv420p") || !strcmp(fmt, "yuv422p") || !strcmp(fmt, "yuv444p"))
 		{
-			if (fread(temp_buf, 1, offset, dis_rfile) != (size_t)offset)
+			if (skip_bytes(dis_rfile, offset))
 			{
-				printf("error: dis fread u and v failed.\n");
+				printf("error: dis skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
 		}
 		else if (!strcmp(fmt, "yuv420p10le") || !strcmp(fmt, "yuv422p10le") || !strcmp(fmt, "yuv444p10le"))
 		{
-			if (fread(temp_buf, 2, offset, dis_rfile) != (size_t)offset)
+			if (skip_bytes(dis_rfile, offset * 2))
 			{
-				printf("error: dis fread u and v failed.\n");
+				printf("error: dis skip u and v failed.\n");
 				fflush(stdout);
 				goto fail_or_end;
 			}
@@ -395,6 +415,7 @@ int ssim(const char *ref_path, const char *dis_path, int w, int h, const char *f
 	ret = 0;
 
 fail_or_end:
+	frame_writer_close(&fw);
 	if (ref_rfile)
 	{
 		fclose(ref_rfile);
@@ -405,7 +426,6 @@ fail_or_end:
 	}
 	aligned_free(ref_buf);
 	aligned_free(dis_buf);
-	aligned_free(temp_buf);
 
 	return ret;
 }
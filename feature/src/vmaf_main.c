@@ -20,15 +20,17 @@
 #include <stdlib.h>
 #include <string.h>
 
+#include "common/cli_options.h"
+
 int adm(const char *ref_path, const char *dis_path, int w, int h, const char *fmt);
 int ansnr(const char *ref_path, const char *dis_path, int w, int h, const char *fmt);
 int vif(const char *ref_path, const char *dis_path, int w, int h, const char *fmt);
 int motion(const char *dis_path, int w, int h, const char *fmt);
-int all(const char *ref_path, const char *dis_path, int w, int h, const char *fmt);
+int all(const char *ref_path, const char *dis_path, int w, int h, const char *fmt, const cli_options *opts);
 
 static void usage(void)
 {
-	puts("usage: vmaf app fmt ref dis w h\n"
+	puts("usage: vmaf app fmt ref dis w h [options]\n"
 	     "apps:\n"
 	     "\tadm\n"
 	     "\tansnr\n"
@@ -41,7 +43,17 @@ static void usage(void)
 		 "\tyuv444p\n"
 		 "\tyuv420p10le\n"
 		 "\tyuv422p10le\n"
-		 "\tyuv444p10le"
+		 "\tyuv444p10le\n"
+		 "options (all only):\n"
+		 "\t--binary: write scores as a binary record stream\n"
+		 "\t--output: append scores to out_path instead of stdout\n"
+		 "\t--start-frame: start at frame n of both ref and dis\n"
+		 "\t--ref-start-frame: start at frame n of ref\n"
+		 "\t--dis-start-frame: start at frame n of dis\n"
+		 "\t--num-frames: stop after n frames\n"
+		 "\t--skip-ref-features: skip motion, which depends on ref only\n"
+		 "\t--frames: only compute the frames listed in frames_path\n"
+		 "\t--threads: compute n frames at the same time, on n threads"
 	);
 }
 
@@ -51,6 +63,7 @@ int main(int argc, const char **argv)
 	const char *ref_path;
 	const char *dis_path;
 	const char *fmt;
+	cli_options opts;
 	int w;
 	int h;
 	int ret;
@@ -72,6 +85,11 @@ int main(int argc, const char **argv)
 		return 2;
 	}
 
+	if (parse_cli_options(argc - 7, argv + 7, &opts)) {
+		usage();
+		return 2;
+	}
+
 	if (!strcmp(app, "adm"))
 		ret = adm(ref_path, dis_path, w, h, fmt);
 	else if (!strcmp(app, "ansnr"))
@@ -81,7 +99,7 @@ int main(int argc, const char **argv)
 	else if (!strcmp(app, "motion"))
 		ret = motion(ref_path, w, h, fmt);
 	else if (!strcmp(app, "all"))
-		ret = all(ref_path, dis_path, w, h, fmt);
+		ret = all(ref_path, dis_path, w, h, fmt, &opts);
 	else
 		return 2;
 
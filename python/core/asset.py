@@ -2,6 +2,7 @@ __copyright__ = "Copyright 2016, Netflix, Inc."
 __license__ = "Apache, Version 2.0"
 
 import os
+import copy
 
 from core.mixin import WorkdirEnabled
 from tools.misc import get_file_name_without_extension, \
@@ -27,9 +28,14 @@ class Asset(WorkdirEnabled):
                            'yuv420p10le', 'yuv422p10le', 'yuv444p10le']
     DEFAULT_YUV_TYPE = 'yuv420p'
 
-    SUPPORTED_RESAMPLING_TYPES = ['lanczos', 'bilinear']
+    SUPPORTED_RESAMPLING_TYPES = ['lanczos', 'bilinear', 'bicubic']
     DEFAULT_RESAMPLING_TYPE = 'bilinear'
 
+    # how workfiles are rescaled: by an ffmpeg process, or in-process by
+    # tools.scaler.YuvScaler
+    SUPPORTED_SCALERS = ['ffmpeg', 'numpy']
+    DEFAULT_SCALER = 'ffmpeg'
+
     # ==== constructor ====
 
     def __init__(self, dataset, content_id, asset_id,
@@ -328,6 +334,11 @@ class Asset(WorkdirEnabled):
                 s += "_"
             s += "{}".format(self.resampling_type)
 
+        if self.scaler != self.DEFAULT_SCALER:
+            if s != "":
+                s += "_"
+            s += "{}".format(self.scaler)
+
         return s
 
     def to_string(self):
@@ -412,6 +423,18 @@ class Asset(WorkdirEnabled):
                 workdir=self.workdir,
                 str=str(self))
 
+    def copy_with_new_workdir(self):
+        """
+        :return: a copy of this asset with a workdir of its own, e.g. for
+        executors running on the asset at the same time, each opening its
+        workfiles
+        """
+        asset_copy = copy.copy(self)
+        # not shared, as executors set use_path_as_workpath in it
+        asset_copy.asset_dict = dict(self.asset_dict)
+        asset_copy._get_workdir(os.path.dirname(self.workdir))
+        return asset_copy
+
     # ==== bitrate ====
 
     @property
@@ -467,6 +490,17 @@ class Asset(WorkdirEnabled):
         else:
             return self.DEFAULT_RESAMPLING_TYPE
 
+    @property
+    def scaler(self):
+        if 'scaler' in self.asset_dict:
+            if self.asset_dict['scaler'] in self.SUPPORTED_SCALERS:
+                return self.asset_dict['scaler']
+            else:
+                assert False, "Unsupported scaler: {}".format(
+                    self.asset_dict['scaler'])
+        else:
+            return self.DEFAULT_SCALER
+
     @property
     def use_path_as_workpath(self):
         """
@@ -5,11 +5,18 @@ import multiprocessing
 import os
 import sys
 import subprocess
-from time import sleep
+import stat
+from time import time
 import hashlib
+import atexit
+import traceback
+import Queue
+from contextlib import contextmanager
 
 from tools.misc import make_parent_dirs_if_nonexist, get_dir_without_last_slash
 from core.mixin import TypeVersionEnabled
+from tools.reader import YuvReader
+from tools.scaler import scale_yuv_file
 import config
 
 
@@ -23,8 +30,22 @@ class Executor(TypeVersionEnabled):
     Executor is the base class for FeatureExtractor and QualityRunner, and it
     provides a number of shared housekeeping functions, including reusing
     Results, creating FIFO pipes, cleaning up log files/Results, etc.
+
+    With optional_dict={'frame_sampling': n}, an Executor that supports it
+    evaluates each asset on one frame out of n only, for a fast approximate
+    Result: every nth frame (optional_dict['frame_sampling_type'] 'uniform',
+    the default), or one frame drawn at random out of each run of n frames
+    ('stratified'). The sampling is reported in executor_id (e.g.
+    VMAF_feature_V0.2.1_uniform4), so that Results on sampled frames never
+    mix with the ones on all frames.
     """
 
+    SUPPORTED_FRAME_SAMPLING_TYPES = ['uniform', 'stratified']
+    DEFAULT_FRAME_SAMPLING_TYPE = 'uniform'
+
+    # whether optional_dict={'frame_sampling': n} is supported
+    _supports_frame_sampling = False
+
     def __init__(self,
                  assets,
                  logger,
@@ -44,11 +65,39 @@ class Executor(TypeVersionEnabled):
         self.result_store = result_store
         self.optional_dict = optional_dict
 
+        # results bulk-loaded from result_store ahead of _run_on_asset, keyed
+        # by asset; a None value means the result is known to be absent
+        self._prefetched_results = {}
+
         self._assert_assets()
 
     @property
     def executor_id(self):
-        return TypeVersionEnabled.get_type_version_string(self)
+        executor_id = TypeVersionEnabled.get_type_version_string(self)
+        frame_sampling = self._frame_sampling
+        if frame_sampling is not None:
+            frame_sampling_type, n = frame_sampling
+            executor_id += "_{type}{n}".format(type=frame_sampling_type, n=n)
+        return executor_id
+
+    @property
+    def _frame_sampling(self):
+        # (frame_sampling_type, n) from optional_dict, or None if all frames
+        # are evaluated
+        if self.optional_dict is None:
+            return None
+        n = self.optional_dict.get('frame_sampling', 1)
+        if n == 1:
+            return None
+        assert self._supports_frame_sampling, \
+            "{type} does not support frame sampling.".format(type=self.TYPE)
+        assert isinstance(n, int) and n > 1, \
+            "Frame sampling must be a positive integer: {}".format(n)
+        frame_sampling_type = self.optional_dict.get(
+            'frame_sampling_type', self.DEFAULT_FRAME_SAMPLING_TYPE)
+        assert frame_sampling_type in self.SUPPORTED_FRAME_SAMPLING_TYPES, \
+            "Unsupported frame sampling type: {}".format(frame_sampling_type)
+        return frame_sampling_type, n
 
     def run(self):
         """
@@ -60,6 +109,14 @@ class Executor(TypeVersionEnabled):
                 "For each asset, if {type} result has not been generated, run "
                 "and generate {type} result...".format(type=self.executor_id))
 
+        prefetched_results = self._prefetch_results(self.assets)
+
+        # only the assets without a result in result_store open workfiles
+        if self._ref_workfile_cache is not None:
+            self._ref_workfile_cache.add_assets(
+                [asset for asset, result in zip(self.assets, prefetched_results)
+                 if result is None])
+
         self.results = map(self._run_on_asset, self.assets)
 
     def remove_results(self):
@@ -71,6 +128,33 @@ class Executor(TypeVersionEnabled):
         for asset in self.assets:
             self._remove_result(asset)
 
+    def _prefetch_results(self, assets):
+        """
+        Load the results of assets from result_store in one bulk call, so that
+        _run_on_asset does not have to probe result_store asset by asset.
+        :param assets:
+        :return: list of prefetched results, None for assets not in store
+        """
+        if self.result_store is None:
+            return [None for _ in assets]
+
+        assets_to_load = filter(
+            lambda asset: asset not in self._prefetched_results, assets)
+        if assets_to_load:
+            loaded_results = self.result_store.load_many(assets_to_load,
+                                                         self.executor_id)
+            for asset, result in zip(assets_to_load, loaded_results):
+                self._prefetched_results[asset] = result
+
+        return map(lambda asset: self._prefetched_results[asset], assets)
+
+    def _load_result(self, asset):
+        if self.result_store is None:
+            return None
+        if asset in self._prefetched_results:
+            return self._prefetched_results.pop(asset)
+        return self.result_store.load(asset, self.executor_id)
+
     def _assert_assets(self):
 
         list_dataset_contentid_assetid = \
@@ -90,20 +174,58 @@ class Executor(TypeVersionEnabled):
 
         pass
 
-    def _wait_for_workfiles(self, asset):
-        # wait til workfile paths being generated
-        # FIXME: use proper mutex (?)
-        for i in range(10):
-            if os.path.exists(asset.ref_workfile_path) and \
-                    os.path.exists(asset.dis_workfile_path):
-                break
-            sleep(0.1)
-        else:
-            raise RuntimeError(
-                "ref or dis video workfile path {ref} or {dis} is missing.".
-                    format(ref=asset.ref_workfile_path,
-                           dis=asset.dis_workfile_path)
-            )
+    @property
+    def _use_fifo_workfiles(self):
+        # whether to open the workfiles as FIFOs, written while being read:
+        # in fifo mode, unless the computation needs to seek in them
+        return self.fifo_mode
+
+    # seconds to wait for the workfile processes to create their FIFOs
+    WORKFILE_READY_TIMEOUT = 60.0
+
+    def _start_workfile_process(self, open_workfile, asset):
+        # start a process running open_workfile(asset, fifo_mode=True), i.e.
+        # _open_ref_workfile or _open_dis_workfile, which signals on the
+        # returned connection once its FIFO is created
+        ready_conn, child_ready_conn = multiprocessing.Pipe(duplex=False)
+        workfile_process = multiprocessing.Process(
+            target=open_workfile, args=(asset, True, child_ready_conn))
+        workfile_process.start()
+        # only the child holds the sending end now, so that the connection
+        # reaches end of file if the child exits without signaling
+        child_ready_conn.close()
+        return workfile_process, ready_conn
+
+    def _wait_for_workfiles(self, asset, workfile_processes, ready_conns):
+        # wait til the workfile processes have created the workfile FIFOs
+        deadline = time() + self.WORKFILE_READY_TIMEOUT
+        try:
+            for workfile_process, ready_conn in \
+                    zip(workfile_processes, ready_conns):
+                if not ready_conn.poll(max(deadline - time(), 0.0)):
+                    raise RuntimeError(
+                        "Workfile process of asset {asset} did not create "
+                        "its workfile within {timeout} sec.".format(
+                            asset=str(asset),
+                            timeout=self.WORKFILE_READY_TIMEOUT))
+                try:
+                    ready_conn.recv()
+                except EOFError:
+                    workfile_process.join()
+                    raise RuntimeError(
+                        "Workfile process of asset {asset} failed with exit "
+                        "code {code} before creating its workfile.".format(
+                            asset=str(asset), code=workfile_process.exitcode))
+        finally:
+            for ready_conn in ready_conns:
+                ready_conn.close()
+
+    @staticmethod
+    def _signal_workfile_ready(ready_conn):
+        # in a workfile process, see _start_workfile_process
+        if ready_conn is not None:
+            ready_conn.send(True)
+            ready_conn.close()
 
     def _prepare_log_file(self, asset):
 
@@ -131,10 +253,7 @@ class Executor(TypeVersionEnabled):
         # asserts
         self._assert_an_asset(asset)
 
-        if self.result_store:
-            result = self.result_store.load(asset, self.executor_id)
-        else:
-            result = None
+        result = self._load_result(asset)
 
         # if result can be retrieved from result_store, skip log file
         # generation and reading result from log file, but directly return
@@ -149,90 +268,261 @@ class Executor(TypeVersionEnabled):
                 self.logger.info('{id} result does\'t exist. Perform {id} '
                                  'calculation.'.format(id=self.executor_id))
 
-            # at this stage, it is certain that asset.ref_path and
-            # asset.dis_path will be used. must early determine that
-            # they exists
-            self._assert_paths(asset)
+            result = self._generate_result(asset)
 
-            # if no rescaling is involved, directly work on ref_path/dis_path,
-            # instead of opening workfiles
-            self._set_asset_use_path_as_workpath(asset)
+            # save result
+            if self.result_store:
+                self.result_store.save(result)
 
-            # remove workfiles if exist (do early here to avoid race condition
-            # when ref path and dis path have some overlap)
-            if asset.use_path_as_workpath:
-                # do nothing
-                pass
+        result = self._post_process_result(result)
+
+        return result
+
+    def _generate_result(self, asset):
+        # run the computation on asset and collect its Result, regardless of
+        # result_store, including opening and cleaning up workfiles and log
+        # files
+
+        capture_output = self._capture_output
+
+        with self._open_workfiles(asset):
+            if capture_output:
+                # capture the output in memory (e.g. the executable's stdout
+                # through a pipe), bypassing the log file write and read
+                output = self._run_and_capture_output(asset)
             else:
-                self._close_ref_workfile(asset)
-                self._close_dis_workfile(asset)
+                self._prepare_log_file(asset)
+                self._run_and_generate_log_file(asset)
 
-            log_file_path = self._get_log_file_path(asset)
-            make_parent_dirs_if_nonexist(log_file_path)
+        if self.logger:
+            self.logger.info("Read {id} log file, get scores...".
+                             format(id=self.executor_id))
 
+        # collect result from captured output or each asset's log file
+        if capture_output:
+            result = self._read_result_from_output(asset, output)
+        else:
+            result = self._read_result(asset)
+
+        self._clean_up_workdir(asset, remove_log=not capture_output)
+
+        return result
+
+    @contextmanager
+    def _open_workfiles(self, asset):
+        # context manager opening the workfiles of asset for the computation
+        # run in the with block (in fifo mode, started in processes writing
+        # them while they are read), and closing them afterwards
+
+        # at this stage, it is certain that asset.ref_path and
+        # asset.dis_path will be used. must early determine that
+        # they exists
+        self._assert_paths(asset)
+
+        # if no rescaling is involved, directly work on ref_path/dis_path,
+        # instead of opening workfiles
+        self._set_asset_use_path_as_workpath(asset)
+
+        # remove workfiles if exist (do early here to avoid race condition
+        # when ref path and dis path have some overlap)
+        if asset.use_path_as_workpath:
+            # do nothing
+            pass
+        else:
+            self._close_ref_workfile(asset)
+            self._close_dis_workfile(asset)
+
+        log_file_path = self._get_log_file_path(asset)
+        make_parent_dirs_if_nonexist(log_file_path)
+
+        # a reference shared with other assets is read from
+        # ref_workfile_cache, produced only once across assets
+        ref_workfile_holder = None
+
+        # in fifo mode, the processes writing the workfiles while they are
+        # being read
+        workfile_processes = []
+
+        try:
             if asset.use_path_as_workpath:
                 # do nothing
                 pass
+            elif self._use_fifo_workfiles:
+                if self._use_ref_workfile_cache(asset):
+                    ref_workfile_holder = self._open_cached_ref_workfile(asset)
+                    open_workfiles = [self._open_dis_workfile]
+                else:
+                    open_workfiles = [self._open_ref_workfile,
+                                      self._open_dis_workfile]
+                ready_conns = []
+                for open_workfile in open_workfiles:
+                    workfile_process, ready_conn = \
+                        self._start_workfile_process(open_workfile, asset)
+                    workfile_processes.append(workfile_process)
+                    ready_conns.append(ready_conn)
+                self._wait_for_workfiles(asset, workfile_processes, ready_conns)
             else:
-                if self.fifo_mode:
-                    ref_p = multiprocessing.Process(target=self._open_ref_workfile,
-                                                    args=(asset, True))
-                    dis_p = multiprocessing.Process(target=self._open_dis_workfile,
-                                                    args=(asset, True))
-                    ref_p.start()
-                    dis_p.start()
-                    self._wait_for_workfiles(asset)
+                if self._use_ref_workfile_cache(asset):
+                    ref_workfile_holder = self._open_cached_ref_workfile(asset)
                 else:
                     self._open_ref_workfile(asset, fifo_mode=False)
-                    self._open_dis_workfile(asset, fifo_mode=False)
+                self._open_dis_workfile(asset, fifo_mode=False)
 
-            self._prepare_log_file(asset)
+            yield
 
-            self._run_and_generate_log_file(asset)
+            # a workfile process failing, e.g. on a corrupt video, would only
+            # show as a truncated workfile otherwise
+            self._join_workfile_processes(asset, workfile_processes)
+        except:
+            exc_type = sys.exc_info()[0]
+            self._abort_workfile_processes(asset, workfile_processes)
+            if self.delete_workdir and not asset.use_path_as_workpath:
+                self._close_ref_workfile(asset)
+                self._close_dis_workfile(asset)
+            # a workfile process that failed by itself (not terminated by
+            # _abort_workfile_processes) is the likely cause, unless the with
+            # block is in a generator closed before its end, i.e. stopped on
+            # purpose (see FeatureExtractor.iter_frames)
+            if exc_type is not GeneratorExit:
+                for workfile_process in workfile_processes:
+                    if workfile_process.exitcode > 0:
+                        self._raise_workfile_process_failure(
+                            asset, workfile_process)
+            raise
+        finally:
+            if ref_workfile_holder is not None:
+                self._ref_workfile_cache.release(ref_workfile_holder)
+
+        # clean up workfiles
+        if self.delete_workdir:
+            if asset.use_path_as_workpath:
+                # do nothing
+                pass
+            else:
+                self._close_ref_workfile(asset)
+                self._close_dis_workfile(asset)
 
-            # clean up workfiles
-            if self.delete_workdir:
-                if asset.use_path_as_workpath:
-                    # do nothing
-                    pass
-                else:
-                    self._close_ref_workfile(asset)
-                    self._close_dis_workfile(asset)
+    def _clean_up_workdir(self, asset, remove_log):
 
-            if self.logger:
-                self.logger.info("Read {id} log file, get scores...".
-                                 format(type=self.executor_id))
+        # clean up workdir and log files in it
+        if self.delete_workdir:
 
-            # collect result from each asset's log file
-            result = self._read_result(asset)
+            # remove log file
+            if remove_log:
+                self._remove_log(asset)
 
-            # save result
-            if self.result_store:
-                self.result_store.save(result)
+            # remove dir
+            log_file_path = self._get_log_file_path(asset)
+            log_dir = get_dir_without_last_slash(log_file_path)
+            try:
+                os.rmdir(log_dir)
+            except OSError as e:
+                if e.errno == 39: # [Errno 39] Directory not empty
+                    # VQM could generate an error file with non-critical
+                    # information like: '3 File is longer than 15 seconds.
+                    # Results will be calculated using first 15 seconds
+                    # only.' In this case, want to keep this
+                    # informational file and pass
+                    pass
 
-            # clean up workdir and log files in it
-            if self.delete_workdir:
+    # seconds to wait for a workfile process to exit once its workfile has
+    # been read
+    WORKFILE_PROCESS_JOIN_TIMEOUT = 10.0
+
+    def _join_workfile_processes(self, asset, workfile_processes):
+        deadline = time() + self.WORKFILE_PROCESS_JOIN_TIMEOUT
+        for workfile_process in workfile_processes:
+            workfile_process.join(max(deadline - time(), 0.0))
+        for workfile_process in workfile_processes:
+            if workfile_process.is_alive():
+                # e.g. blocked opening a FIFO that was never read
+                raise RuntimeError(
+                    "Workfile process of asset {asset} did not finish.".
+                        format(asset=str(asset)))
+        for workfile_process in workfile_processes:
+            if workfile_process.exitcode != 0:
+                self._raise_workfile_process_failure(asset, workfile_process)
 
-                # remove log file
-                self._remove_log(asset)
+    @staticmethod
+    def _raise_workfile_process_failure(asset, workfile_process):
+        raise RuntimeError(
+            "Workfile process of asset {asset} failed with exit code "
+            "{code}.".format(asset=str(asset), code=workfile_process.exitcode))
+
+    # seconds for aborted workfile processes to exit by themselves, once
+    # unblocked, before being terminated
+    WORKFILE_PROCESS_ABORT_TIMEOUT = 1.0
+
+    def _abort_workfile_processes(self, asset, workfile_processes):
+        # stop workfile processes: unblock whatever process waits on the
+        # other end of a workfile FIFO (workfile processes, or ffmpeg, which
+        # a terminated workfile process leaves behind) so that it exits by
+        # itself, and terminate the workfile processes that do not
+        if not workfile_processes:
+            return
+        workfile_paths = [asset.ref_workfile_path, asset.dis_workfile_path]
+        # a workfile process may only start blocking on a FIFO after it is
+        # unblocked, e.g. when closing it after a failure (see
+        # _write_workfile): retry until the processes exit
+        deadline = time() + self.WORKFILE_PROCESS_ABORT_TIMEOUT
+        while time() < deadline and \
+                any(p.is_alive() for p in workfile_processes):
+            for workfile_path in workfile_paths:
+                self._unblock_fifo(workfile_path)
+            for workfile_process in workfile_processes:
+                workfile_process.join(0.01)
+        for workfile_process in workfile_processes:
+            if workfile_process.is_alive():
+                workfile_process.terminate()
+                workfile_process.join()
+        for workfile_path in workfile_paths:
+            self._unblock_fifo(workfile_path)
 
-                # remove dir
-                log_file_path = self._get_log_file_path(asset)
-                log_dir = get_dir_without_last_slash(log_file_path)
-                try:
-                    os.rmdir(log_dir)
-                except OSError as e:
-                    if e.errno == 39: # [Errno 39] Directory not empty
-                        # VQM could generate an error file with non-critical
-                        # information like: '3 File is longer than 15 seconds.
-                        # Results will be calculated using first 15 seconds
-                        # only.' In this case, want to keep this
-                        # informational file and pass
-                        pass
+    @staticmethod
+    def _unblock_fifo(path):
+        # open and close both ends of FIFO path without blocking: a process
+        # blocked opening the other end proceeds, and then sees a closed pipe
+        try:
+            if not stat.S_ISFIFO(os.stat(path).st_mode):
+                return
+        except OSError:
+            return
+        for flags in [os.O_RDONLY | os.O_NONBLOCK, os.O_WRONLY | os.O_NONBLOCK]:
+            try:
+                os.close(os.open(path, flags))
+            except OSError:
+                # ENXIO: no process reading
+                pass
 
-        result = self._post_process_result(result)
+    @property
+    def _ref_workfile_cache(self):
+        if self.optional_dict is None:
+            return None
+        return self.optional_dict.get('ref_workfile_cache')
 
-        return result
+    def _use_ref_workfile_cache(self, asset):
+        # one-off assets keep opening their ref workfile as usual
+        return self._ref_workfile_cache is not None \
+               and self._ref_workfile_cache.is_shared(asset)
+
+    @property
+    def _capture_output(self):
+        # whether _run_on_asset captures the output in memory (via
+        # _run_and_capture_output and _read_result_from_output) instead of
+        # going through the log file; wait to be overridden
+        return False
+
+    def _run_and_capture_output(self, asset):
+        # wait to be overridden, along with _capture_output
+        assert False, "{cls} captures its output, but does not override " \
+                      "_run_and_capture_output.".format(
+                          cls=self.__class__.__name__)
+
+    def _read_result_from_output(self, asset, output):
+        # wait to be overridden, along with _capture_output
+        assert False, "{cls} captures its output, but does not override " \
+                      "_read_result_from_output.".format(
+                          cls=self.__class__.__name__)
 
     @staticmethod
     def _set_asset_use_path_as_workpath(asset):
@@ -242,6 +532,17 @@ class Executor(TypeVersionEnabled):
                 and asset.quality_width_height == asset.dis_width_height:
             asset.use_path_as_workpath = True
 
+    @staticmethod
+    def _get_workfile_start_end_frames(asset):
+        # frame ranges (start, end inclusive) of the ref/dis workfiles to be
+        # processed, None meaning the entire workfile: workfiles generated
+        # from ref_path/dis_path are already trimmed to the asset's ranges,
+        # whereas ref_path/dis_path used directly as workpaths are not
+        if asset.use_path_as_workpath:
+            return asset.ref_start_end_frame, asset.dis_start_end_frame
+        else:
+            return None, None
+
     @classmethod
     def _post_process_result(cls, result):
         # do nothing, wait to be overridden
@@ -259,7 +560,7 @@ class Executor(TypeVersionEnabled):
 
     # ===== workfile =====
 
-    def _open_ref_workfile(self, asset, fifo_mode):
+    def _open_ref_workfile(self, asset, fifo_mode, ready_conn=None):
         # For now, only works for YUV format -- all need is to copy from ref
         # file to ref workfile
 
@@ -270,29 +571,59 @@ class Executor(TypeVersionEnabled):
         # if fifo mode, mkfifo
         if fifo_mode:
             os.mkfifo(asset.ref_workfile_path)
+        self._signal_workfile_ready(ready_conn)
+
+        self._write_workfile(self._generate_ref_workfile, asset,
+                             asset.ref_workfile_path, fifo_mode)
+
+    def _write_workfile(self, generate_workfile, asset, workfile_path,
+                        fifo_mode):
+        # run generate_workfile(asset, workfile_path); in fifo mode, make sure
+        # that the reader of the FIFO is not left blocked opening it if the
+        # generation fails before opening it
+        if not fifo_mode:
+            return generate_workfile(asset, workfile_path)
+        try:
+            ret = generate_workfile(asset, workfile_path)
+        except:
+            # wait for the reader to open the FIFO, then close it: the reader
+            # sees an end of file (if the reader is gone, the parent process
+            # unblocks this open, see _abort_workfile_processes)
+            open(workfile_path, 'wb').close()
+            raise
+        if ret != 0:
+            # ffmpeg failed, or its reader closed the FIFO before the end
+            # (EPIPE): only a reader still blocked opening it needs unblocking
+            self._unblock_fifo(workfile_path)
+        return ret
+
+    def _generate_ref_workfile(self, asset, ref_workfile_path):
+        # convert ref file to quality resolution, into ref_workfile_path;
+        # return the exit code
+        return self._convert_to_workfile(
+            asset, asset.ref_path, asset.ref_width_height,
+            asset.ref_start_end_frame, ref_workfile_path)
+
+    def _generate_cached_ref_workfile(self, asset, ref_workfile_path):
+        # for RefWorkfileCache.acquire(): unlike in fifo mode, a failed
+        # conversion must not leave a truncated workfile to be shared
+        ret = self._generate_ref_workfile(asset, ref_workfile_path)
+        if ret != 0:
+            raise RuntimeError(
+                "Failed to generate ref workfile of {ref} (exit code {ret}).".
+                    format(ref=asset.ref_path, ret=ret))
+
+    def _open_cached_ref_workfile(self, asset):
+        # link ref workfile to the one shared in ref_workfile_cache, producing
+        # it if not cached yet; return the holder to release it
+        cached_ref_workfile_path, holder = self._ref_workfile_cache.acquire(
+            asset, self._generate_cached_ref_workfile)
+        if os.path.lexists(asset.ref_workfile_path):
+            os.remove(asset.ref_workfile_path)
+        os.symlink(cached_ref_workfile_path, asset.ref_workfile_path)
+        return holder
 
-        width, height = asset.ref_width_height
-        quality_width, quality_height = asset.quality_width_height
-        yuv_type = asset.yuv_type
-        resampling_type = asset.resampling_type
-
-        src_fmt_cmd = '-f rawvideo -pix_fmt {yuv_fmt} -s {width}x{height}'.\
-            format(yuv_fmt=asset.yuv_type, width=width, height=height)
-
-        from private.config import FFMPEG_PATH
-        ffmpeg_cmd = '{ffmpeg} {src_fmt_cmd} -i {src} -an -vsync 0 ' \
-                     '-pix_fmt {yuv_type} -s {width}x{height} -f rawvideo ' \
-                     '-sws_flags {resampling_type} -y {dst}'.format(
-            ffmpeg=FFMPEG_PATH, src=asset.ref_path, dst=asset.ref_workfile_path,
-            width=quality_width, height=quality_height,
-            src_fmt_cmd=src_fmt_cmd,
-            yuv_type=yuv_type,
-            resampling_type=resampling_type)
-        if self.logger:
-            self.logger.info(ffmpeg_cmd)
-        subprocess.call(ffmpeg_cmd, shell=True)
-
-    def _open_dis_workfile(self, asset, fifo_mode):
+    def _open_dis_workfile(self, asset, fifo_mode, ready_conn=None):
         # For now, only works for YUV format -- all need is to copy from dis
         # file to dis workfile
 
@@ -303,27 +634,73 @@ class Executor(TypeVersionEnabled):
         # if fifo mode, mkfifo
         if fifo_mode:
             os.mkfifo(asset.dis_workfile_path)
+        self._signal_workfile_ready(ready_conn)
+
+        self._write_workfile(self._generate_dis_workfile, asset,
+                             asset.dis_workfile_path, fifo_mode)
+
+    def _generate_dis_workfile(self, asset, dis_workfile_path):
+        # convert dis file to quality resolution, into dis_workfile_path;
+        # return the exit code
+        return self._convert_to_workfile(
+            asset, asset.dis_path, asset.dis_width_height,
+            asset.dis_start_end_frame, dis_workfile_path)
 
-        width, height = asset.dis_width_height
+    def _convert_to_workfile(self, asset, src_path, width_height,
+                             start_end_frame, workfile_path):
+        # convert src_path (ref or dis file) to quality resolution, into
+        # workfile_path, by ffmpeg or in-process by YuvScaler depending on
+        # asset.scaler; return the exit code
+
+        width, height = width_height
         quality_width, quality_height = asset.quality_width_height
         yuv_type = asset.yuv_type
         resampling_type = asset.resampling_type
 
+        if asset.scaler == 'numpy':
+            if self.logger:
+                self.logger.info(
+                    "Scale {src} to {width}x{height} into {dst}.".format(
+                        src=src_path, width=quality_width,
+                        height=quality_height, dst=workfile_path))
+            scale_yuv_file(src_path, width, height, workfile_path,
+                           quality_width, quality_height, yuv_type,
+                           resampling_type, start_end_frame)
+            return 0
+
         src_fmt_cmd = '-f rawvideo -pix_fmt {yuv_fmt} -s {width}x{height}'.\
             format(yuv_fmt=asset.yuv_type, width=width, height=height)
+        src_range_cmd, dst_range_cmd = self._get_ffmpeg_frame_range_cmds(
+            start_end_frame, width, height, yuv_type)
 
         from private.config import FFMPEG_PATH
-        ffmpeg_cmd = '{ffmpeg} {src_fmt_cmd} -i {src} -an -vsync 0 ' \
-                     '-pix_fmt {yuv_type} -s {width}x{height} -f rawvideo ' \
+        ffmpeg_cmd = '{ffmpeg} {src_fmt_cmd}{src_range_cmd} -i {src} -an -vsync 0 ' \
+                     '-pix_fmt {yuv_type} -s {width}x{height}{dst_range_cmd} -f rawvideo ' \
                      '-sws_flags {resampling_type} -y {dst}'.format(
-            ffmpeg=FFMPEG_PATH, src=asset.dis_path, dst=asset.dis_workfile_path,
+            ffmpeg=FFMPEG_PATH, src=src_path, dst=workfile_path,
             width=quality_width, height=quality_height,
             src_fmt_cmd=src_fmt_cmd,
+            src_range_cmd=src_range_cmd,
+            dst_range_cmd=dst_range_cmd,
             yuv_type=yuv_type,
             resampling_type=resampling_type)
         if self.logger:
             self.logger.info(ffmpeg_cmd)
-        subprocess.call(ffmpeg_cmd, shell=True)
+        return subprocess.call(ffmpeg_cmd, shell=True)
+
+    @staticmethod
+    def _get_ffmpeg_frame_range_cmds(start_end_frame, width, height, yuv_type):
+        # ffmpeg options to only convert frames start to end (inclusive) of a
+        # raw video: seek straight to the byte offset of the start frame on
+        # input, and stop after the end frame on output
+        if start_end_frame is None:
+            return '', ''
+        start_frame, end_frame = start_end_frame
+        src_range_cmd = ' -skip_initial_bytes {skip}'.format(
+            skip=start_frame * YuvReader.get_num_bytes_per_frm(width, height, yuv_type))
+        dst_range_cmd = ' -vframes {num_frms}'.format(
+            num_frms=end_frame - start_frame + 1)
+        return src_range_cmd, dst_range_cmd
 
     @staticmethod
     def _close_ref_workfile(asset):
@@ -333,7 +710,9 @@ class Executor(TypeVersionEnabled):
                and asset.ref_path != asset.ref_workfile_path
 
         # caution: never remove ref file!!!!!!!!!!!!!!!
-        if os.path.exists(asset.ref_workfile_path):
+        # (lexists: ref workfile may be a link to a cached one, see
+        # _open_cached_ref_workfile)
+        if os.path.lexists(asset.ref_workfile_path):
             os.remove(asset.ref_workfile_path)
 
     @staticmethod
@@ -357,6 +736,198 @@ class Executor(TypeVersionEnabled):
             self.result_store.delete(asset, self.executor_id)
 
 
+def _run_executor(args):
+    executor_class, asset, fifo_mode, \
+    delete_workdir, result_store, optional_dict = args
+    executor = executor_class([asset], None, fifo_mode,
+                              delete_workdir, result_store, optional_dict)
+    executor.run()
+    return executor
+
+
+def _executor_pool_worker_loop(task_queue, result_queue):
+    # runs in a pool worker process: take chunks of tasks until sentinel None
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        batch_id, chunk = task
+        for idx, args in chunk:
+            try:
+                executor = _run_executor(args)
+                error = None
+            except Exception as e:
+                executor = None
+                error = "{type}: {msg}\n{tb}".format(
+                    type=type(e).__name__, msg=e, tb=traceback.format_exc())
+            try:
+                result_queue.put((batch_id, idx, executor, error))
+            except Exception as e:
+                # e.g. executor not picklable; still report back
+                result_queue.put((batch_id, idx, None,
+                                  "{type}: {msg}".format(
+                                      type=type(e).__name__, msg=e)))
+
+
+class ExecutorPool(object):
+    """
+    A pool of persistent worker processes to run Executors on assets. Unlike
+    multiprocessing.Pool, the workers are not daemonic, so that an Executor
+    running in a worker can itself start child processes (e.g. to open FIFO
+    workfiles). Workers are started on first use and kept alive across calls
+    to run(), until close() (registered at exit by get_executor_pool).
+
+    What is sent to a worker for each asset is a small tuple of executor
+    class (pickled by reference), asset and options; what is sent back is
+    the executor with its results, or the error raised on that asset.
+    """
+
+    # how often to check for dead workers while waiting for results
+    POLL_INTERVAL_SEC = 1.0
+
+    def __init__(self, num_workers=None):
+        self.num_workers = num_workers if num_workers is not None \
+            else multiprocessing.cpu_count()
+        assert self.num_workers > 0
+        self._pid = os.getpid()
+        self._workers = []
+        self._task_queue = None
+        self._result_queue = None
+        self._next_batch_id = 0
+
+    @property
+    def is_alive(self):
+        return len(self._workers) > 0 \
+               and all(map(lambda worker: worker.is_alive(), self._workers))
+
+    @property
+    def is_owned_by_current_process(self):
+        # a forked child inherits the pool object, but not its workers
+        return self._pid == os.getpid()
+
+    def _start(self):
+        self._task_queue = multiprocessing.Queue()
+        self._result_queue = multiprocessing.Queue()
+        self._workers = []
+        for _ in range(self.num_workers):
+            worker = multiprocessing.Process(
+                target=_executor_pool_worker_loop,
+                args=(self._task_queue, self._result_queue))
+            worker.daemon = False
+            worker.start()
+            self._workers.append(worker)
+
+    def close(self):
+        if not self.is_owned_by_current_process:
+            return
+        for worker in self._workers:
+            if worker.is_alive():
+                self._task_queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+
+    def run(self, list_args, chunksize=1, ordered=True):
+        """
+        Run each args of list_args (executor_class, asset, fifo_mode,
+        delete_workdir, result_store, optional_dict) in the workers.
+        :param list_args:
+        :param chunksize: number of assets sent to a worker in one message
+        :param ordered: if True, yield in the order of list_args; otherwise
+        yield as soon as each asset completes
+        :return: generator of (index into list_args, executor, error), where
+        exactly one of executor and error (a string) is None
+        """
+        assert self.is_owned_by_current_process
+        assert chunksize > 0
+
+        if not self.is_alive:
+            self.close()
+            self._start()
+
+        batch_id = self._next_batch_id
+        self._next_batch_id += 1
+
+        indexed_args = list(enumerate(list_args))
+        for i in range(0, len(indexed_args), chunksize):
+            self._task_queue.put((batch_id, indexed_args[i:i + chunksize]))
+
+        next_idx = 0
+        pending = {}
+        num_received = 0
+        while num_received < len(indexed_args):
+            try:
+                _batch_id, idx, executor, error = \
+                    self._result_queue.get(timeout=self.POLL_INTERVAL_SEC)
+            except Queue.Empty:
+                if not self.is_alive:
+                    self.close()
+                    raise RuntimeError(
+                        "ExecutorPool worker died unexpectedly, {} of {} "
+                        "assets left unfinished.".format(
+                            len(indexed_args) - num_received,
+                            len(indexed_args)))
+                continue
+            if _batch_id != batch_id:
+                # leftover of an earlier run() abandoned by its caller
+                continue
+            num_received += 1
+            if not ordered:
+                yield idx, executor, error
+                continue
+            pending[idx] = (executor, error)
+            while next_idx in pending:
+                executor, error = pending.pop(next_idx)
+                yield next_idx, executor, error
+                next_idx += 1
+
+
+_executor_pool = None
+
+def get_executor_pool(num_workers=None):
+    """
+    Get the process-wide ExecutorPool, so that workers are reused across
+    calls. A new pool is created if the number of workers asked for differs.
+    :param num_workers: if None, number of CPUs
+    :return:
+    """
+    global _executor_pool
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
+    if _executor_pool is None \
+            or not _executor_pool.is_owned_by_current_process \
+            or _executor_pool.num_workers != num_workers:
+        if _executor_pool is not None:
+            _executor_pool.close()
+        _executor_pool = ExecutorPool(num_workers)
+    return _executor_pool
+
+def _close_executor_pool():
+    if _executor_pool is not None:
+        _executor_pool.close()
+
+atexit.register(_close_executor_pool)
+
+
+class ExecutorsFailedError(RuntimeError):
+    """
+    Raised by run_executors_in_parallel and
+    run_multiple_executors_in_parallel in parallel mode, once every asset has
+    run, if some of them failed. It carries what the call would have
+    returned, so that the assets that succeeded are not lost:
+    executors_results_list, with None as executor and result of each failed
+    (executor class, asset) pair, and failures, the list of (executor class,
+    asset, error message) of the failed pairs.
+    """
+
+    def __init__(self, message, failures, executors_results_list):
+        super(ExecutorsFailedError, self).__init__(message)
+        self.failures = failures
+        self.executors_results_list = executors_results_list
+
+
 def run_executors_in_parallel(executor_class,
                               assets,
                               fifo_mode=True,
@@ -365,9 +936,21 @@ def run_executors_in_parallel(executor_class,
                               logger=None,
                               result_store=None,
                               optional_dict=None,
+                              num_workers=None,
+                              chunksize=1,
                               ):
     """
-    Run multiple Executors in parallel.
+    Run multiple Executors in parallel. If result_store is given, results
+    already in the store are bulk-loaded up front, and only the assets
+    whose results are missing are dispatched to the parallel workers.
+
+    In parallel mode, the workers of a process-wide ExecutorPool are used. A
+    failure on one asset does not stop the others: all assets are run, then
+    an ExecutorsFailedError (a RuntimeError) listing every failed asset is
+    raised. Its executors_results_list[0] holds the (executors, results) of
+    the call, with None for each failed asset; its failures, the (executor
+    class, asset, error message) of each failed asset. In serial mode, the
+    first failure is raised as is.
     :param executor_class:
     :param assets:
     :param fifo_mode:
@@ -376,42 +959,146 @@ def run_executors_in_parallel(executor_class,
     :param logger:
     :param result_store:
     :param optional_dict:
+    :param num_workers: number of worker processes, default number of CPUs
+    :param chunksize: number of assets sent to a worker at a time
     :return:
     """
+    return run_multiple_executors_in_parallel(
+        [executor_class], assets, fifo_mode=fifo_mode,
+        delete_workdir=delete_workdir, parallelize=parallelize, logger=logger,
+        result_store=result_store, optional_dict=optional_dict,
+        num_workers=num_workers, chunksize=chunksize)[0]
+
+
+def run_multiple_executors_in_parallel(executor_classes,
+                                       assets,
+                                       fifo_mode=True,
+                                       delete_workdir=True,
+                                       parallelize=True,
+                                       logger=None,
+                                       result_store=None,
+                                       optional_dict=None,
+                                       num_workers=None,
+                                       chunksize=1,
+                                       ):
+    """
+    Same as run_executors_in_parallel, but for several Executor classes on
+    the same assets. All (executor class, asset) pairs are dispatched to the
+    ExecutorPool in one batch, so that the workers stay busy across executor
+    classes of different costs, instead of finishing every asset of one class
+    before starting the next class.
+    :param executor_classes:
+    :param assets:
+    :param fifo_mode:
+    :param delete_workdir:
+    :param parallelize:
+    :param logger:
+    :param result_store:
+    :param optional_dict:
+    :param num_workers: number of worker processes, default number of CPUs
+    :param chunksize: number of (executor class, asset) pairs sent to a
+    worker at a time
+    :return: list of (executors, results), one per executor class. On
+    failures in parallel mode, see ExecutorsFailedError.
+    """
 
-    def run_executor(args):
-        executor_class, asset, fifo_mode, \
-        delete_workdir, result_store, optional_dict = args
-        executor = executor_class([asset], None, fifo_mode,
-                                  delete_workdir, result_store, optional_dict)
-        executor.run()
-        return executor
+    # partition (executor class, asset) pairs into the ones with results
+    # already in result_store and the ones to compute. The former are
+    # completed here, without running them, so that no worker is spawned
+    # just to load a result.
+    cached_executors = {}
+    if result_store is not None:
+        for class_idx, executor_class in enumerate(executor_classes):
+            # an executor on no asset, only to get executor_id: one on all
+            # assets would reject a list with a repeated asset
+            executor_id = executor_class([], logger, fifo_mode,
+                                         delete_workdir, result_store,
+                                         optional_dict).executor_id
+            prefetched_results = result_store.load_many(assets, executor_id)
+            for asset_idx, (asset, result) in \
+                    enumerate(zip(assets, prefetched_results)):
+                if result is not None:
+                    cached_executor = executor_class(
+                        [asset], None, fifo_mode, delete_workdir,
+                        result_store, optional_dict)
+                    cached_executor.results = \
+                        [cached_executor._post_process_result(result)]
+                    cached_executors[(class_idx, asset_idx)] = cached_executor
 
     # pack key arguments to be used as inputs to map function
+    list_keys = []
     list_args = []
-    for asset in assets:
-        list_args.append(
-            [executor_class, asset, fifo_mode,
-             delete_workdir, result_store, optional_dict])
-
-    # map arguments to func
-    if parallelize:
-        try:
-            from pathos.pp_map import pp_map
-            executors = pp_map(run_executor, list_args)
-        except ImportError:
-            # fall back
-            msg = "pathos.pp_map cannot be imported for parallel execution, " \
-                  "fall back to sequential map()."
-            if logger:
-                logger.warn(msg)
-            else:
-                print 'Warning: {}'.format(msg)
-            executors = map(run_executor, list_args)
+    for class_idx, executor_class in enumerate(executor_classes):
+        for asset_idx, asset in enumerate(assets):
+            if (class_idx, asset_idx) in cached_executors:
+                continue
+            if parallelize and class_idx > 0:
+                # executors of different classes may run on the same asset
+                # at the same time: each needs a workdir of its own, where it
+                # opens the asset's workfiles
+                asset = asset.copy_with_new_workdir()
+            list_keys.append((class_idx, asset_idx))
+            list_args.append(
+                [executor_class, asset, fifo_mode,
+                 delete_workdir, result_store, optional_dict])
+
+    # announce the assets to compute to ref_workfile_cache before it is sent
+    # to the workers along with optional_dict, so that each worker knows
+    # which references are shared across assets
+    if optional_dict is not None \
+            and optional_dict.get('ref_workfile_cache') is not None:
+        optional_dict['ref_workfile_cache'].add_assets(
+            [assets[asset_idx] for _, asset_idx in list_keys])
+
+    # map arguments to func; in parallel mode, the executor of a failed
+    # (executor class, asset) pair is left None
+    failures = []
+    if parallelize and list_args:
+        executor_pool = get_executor_pool(num_workers)
+        executors = [None] * len(list_args)
+        for idx, executor, error in executor_pool.run(
+                list_args, chunksize=chunksize, ordered=False):
+            if error is not None:
+                executor_class, asset = list_args[idx][:2]
+                failures.append((executor_class, asset, error))
+                if logger:
+                    logger.error("{id} failed on asset {asset}: {error}".format(
+                        id=executor_class.TYPE, asset=str(asset), error=error))
+            executors[idx] = executor
     else:
-        executors = map(run_executor, list_args)
-
-    # aggregate results
-    results = [executor.results[0] for executor in executors]
-
-    return executors, results
+        executors = map(_run_executor, list_args)
+
+    # merge back in the order of executor classes and assets
+    computed_executors = dict(zip(list_keys, executors))
+    computed_executors.update(cached_executors)
+    executors_results_list = []
+    for class_idx in range(len(executor_classes)):
+        executors = map(lambda asset_idx: computed_executors[(class_idx, asset_idx)],
+                        range(len(assets)))
+
+        # aggregate results
+        results = [executor.results[0] if executor is not None else None
+                   for executor in executors]
+
+        executors_results_list.append((executors, results))
+
+    if failures:
+        def describe_failure((executor_class, asset, error)):
+            # name the executor type if there are several
+            if len(executor_classes) == 1:
+                return "{asset}: {error}".format(
+                    asset=str(asset), error=error)
+            return "{type} on {asset}: {error}".format(
+                type=executor_class.TYPE, asset=str(asset), error=error)
+        raise ExecutorsFailedError(
+            "{type} failed on {num} of {total} {unit}:\n{details}".format(
+                type=", ".join(sorted(set(map(
+                    lambda failure: failure[0].TYPE, failures)))),
+                num=len(failures),
+                total=len(list_args),
+                unit="assets" if len(executor_classes) == 1
+                else "(type, asset) pairs",
+                details="\n".join(map(describe_failure, failures))),
+            failures, executors_results_list)
+
+    return executors_results_list
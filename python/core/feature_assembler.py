@@ -1,9 +1,11 @@
 __copyright__ = "Copyright 2016, Netflix, Inc."
 __license__ = "Apache, Version 2.0"
 
-from core.feature_extractor import FeatureExtractor
+from itertools import izip
+
+from core.feature_extractor import FeatureExtractor, FusedFeatureExtractor
 from core.result import BasicResult
-from core.executor import run_executors_in_parallel
+from core.executor import run_multiple_executors_in_parallel
 
 class FeatureAssembler(object):
     """
@@ -13,7 +15,8 @@ class FeatureAssembler(object):
 
     def __init__(self, feature_dict, feature_option_dict, assets, logger,
                  fifo_mode, delete_workdir, result_store,
-                 optional_dict=None, parallelize=False):
+                 optional_dict=None, parallelize=False, num_workers=None,
+                 fuse=False):
         """
         :param feature_dict: in the format of:
         {FeatureExtractor_type:'all', ...}, or
@@ -30,7 +33,13 @@ class FeatureAssembler(object):
         :param delete_workdir:
         :param result_store:
         :param optional_dict:
-        :param parallelize:
+        :param parallelize: if True, run all (FeatureExtractor type, asset)
+        pairs concurrently in one batch of worker processes
+        :param num_workers: number of worker processes if parallelize, default
+        number of CPUs
+        :param fuse: if True, compute the FeatureExtractor types that
+        FusedFeatureExtractor can fuse (e.g. VMAF_feature and PSNR_feature)
+        in a single pass over each asset, with the same results
         :return:
         """
         self.feature_dict = feature_dict
@@ -42,6 +51,8 @@ class FeatureAssembler(object):
         self.result_store = result_store
         self.optional_dict = optional_dict
         self.parallelize = parallelize
+        self.num_workers = num_workers
+        self.fuse = fuse
 
         self.type2results_dict = {}
 
@@ -52,26 +63,40 @@ class FeatureAssembler(object):
         """
 
         # for each FeatureExtractor_type key in feature_dict, find the subclass
-        # of FeatureExtractor, run, and put results in a dict
-        for fextractor_type in self.feature_dict:
-
-            # fextractor = self._get_fextractor_instance(fextractor_type)
-            # fextractor.run()
-            # results = fextractor.results
-
-            fextractor_class = FeatureExtractor.find_subclass(fextractor_type)
-            _, results = run_executors_in_parallel(
-                fextractor_class,
-                assets=self.assets,
-                fifo_mode=self.fifo_mode,
-                delete_workdir=self.delete_workdir,
-                parallelize=self.parallelize,
-                result_store=self.result_store,
-                optional_dict=self.optional_dict,
-            )
+        # of FeatureExtractor, run, and put results in a dict. All (type,
+        # asset) pairs are scheduled together, so that a cheap type does not
+        # wait for the slowest asset of an expensive one.
+        # If fuse, the fused types are run as one FusedFeatureExtractor,
+        # whose per-type Results are handed back.
+        fused_types = self._get_fused_types()
+        fextractor_types = [fextractor_type
+                            for fextractor_type in self.feature_dict
+                            if fextractor_type not in fused_types]
+        fextractor_classes = map(FeatureExtractor.find_subclass, fextractor_types)
+        if fused_types:
+            fextractor_classes.append(FusedFeatureExtractor)
+        executors_results_list = run_multiple_executors_in_parallel(
+            fextractor_classes,
+            assets=self.assets,
+            fifo_mode=self.fifo_mode,
+            delete_workdir=self.delete_workdir,
+            parallelize=self.parallelize,
+            result_store=self.result_store,
+            optional_dict=self._get_optional_dict(fused_types),
+            num_workers=self.num_workers,
+        )
 
+        for fextractor_type, (_, results) in \
+                zip(fextractor_types, executors_results_list):
             self.type2results_dict[fextractor_type] = results
 
+        if fused_types:
+            fused_executors, _ = executors_results_list[-1]
+            for type_idx, fextractor_type in enumerate(fused_types):
+                self.type2results_dict[fextractor_type] = map(
+                    lambda executor: executor.fextractor_results[0][type_idx],
+                    fused_executors)
+
         # assemble an output dict with demanded atom features
         # atom_features_dict = self.fextractor_atom_features_dict
         result_dicts = [dict() for _ in self.assets]
@@ -88,6 +113,55 @@ class FeatureAssembler(object):
             zip(self.assets, result_dicts)
         )
 
+    def iter_frames(self, asset):
+        """
+        Streaming counterpart of run() on one asset: run the FeatureExtractors
+        side by side, and yield the demanded atom features of each frame as
+        soon as all of them have output it (see FeatureExtractor.iter_frames).
+        Stopping the iteration stops all FeatureExtractors.
+        :param asset:
+        :return: generator of one dict per frame, in the format of
+        {score_key: score}
+        """
+        # if fuse, the frames of the fused types all come from one
+        # FusedFeatureExtractor
+        fused_types = self._get_fused_types()
+        fextractor_types = [fextractor_type
+                            for fextractor_type in self.feature_dict
+                            if fextractor_type not in fused_types]
+        frame_iters = []
+        try:
+            fextractors = map(self._get_fextractor_instance, fextractor_types)
+            if fused_types:
+                fextractors.append(FusedFeatureExtractor(
+                    assets=self.assets,
+                    logger=self.logger,
+                    fifo_mode=self.fifo_mode,
+                    delete_workdir=self.delete_workdir,
+                    result_store=self.result_store,
+                    optional_dict=self._get_optional_dict(fused_types)))
+            for fextractor in fextractors:
+                # each FeatureExtractor opens the asset's workfiles in a
+                # workdir of its own
+                frame_iters.append(fextractor.iter_frames(
+                    asset if not frame_iters else asset.copy_with_new_workdir()))
+
+            for frames in izip(*frame_iters):
+                assembled_frame = {}
+                for fextractor_types_of_frame, frame in zip(
+                        [[fextractor_type] for fextractor_type in
+                         fextractor_types] + [fused_types], frames):
+                    for fextractor_type in fextractor_types_of_frame:
+                        for atom_feature in \
+                                self._get_atom_features(fextractor_type):
+                            score_key = self._get_score_key(fextractor_type,
+                                                            atom_feature)
+                            assembled_frame[score_key] = frame[score_key]
+                yield assembled_frame
+        finally:
+            for frame_iter in frame_iters:
+                frame_iter.close()
+
     def remove_results(self):
         """
         Remove all relevant Results stored in ResultStore, which is specified
@@ -98,11 +172,35 @@ class FeatureAssembler(object):
             fextractor = self._get_fextractor_instance(fextractor_type)
             fextractor.remove_results()
 
+    def _get_fused_types(self):
+        # FeatureExtractor types to run as one FusedFeatureExtractor, in the
+        # order of feature_dict; fusing a single type gains nothing
+        if not self.fuse:
+            return []
+        fused_types = [fextractor_type
+                       for fextractor_type in self.feature_dict
+                       if fextractor_type in FusedFeatureExtractor.FUSED_GROUPS]
+        return fused_types if len(fused_types) > 1 else []
+
+    def _get_optional_dict(self, fused_types):
+        # the FusedFeatureExtractor, if any, takes its components from
+        # optional_dict, which the other FeatureExtractors ignore
+        if not fused_types:
+            return self.optional_dict
+        optional_dict = dict(self.optional_dict or {})
+        optional_dict['fextractor_types'] = fused_types
+        return optional_dict
+
     def _get_scores_key(self, fextractor_type, atom_feature):
         fextractor_subclass = FeatureExtractor.find_subclass(fextractor_type)
         scores_key = fextractor_subclass.get_scores_key(atom_feature)
         return scores_key
 
+    def _get_score_key(self, fextractor_type, atom_feature):
+        fextractor_subclass = FeatureExtractor.find_subclass(fextractor_type)
+        score_key = fextractor_subclass.get_score_key(atom_feature)
+        return score_key
+
     def _get_atom_features(self, fextractor_type):
         if self.feature_dict[fextractor_type] == 'all':
             fextractor_class = FeatureExtractor.find_subclass(fextractor_type)
@@ -1,16 +1,47 @@
 __copyright__ = "Copyright 2016, Netflix, Inc."
 __license__ = "Apache, Version 2.0"
 
+import os
 import re
+import shlex
+import signal
 import subprocess
+from itertools import izip, chain, count, takewhile
 import numpy as np
 import ast
+import collections
 
 import config
 from core.executor import Executor
 from core.result import Result
+from core.vmaf_feature_lib import VmafFeatureLib
 from tools.reader import YuvReader
 
+
+class _OutputTailRecorder(object):
+    """
+    Wraps a file object read through read() and readline() (e.g. the stdout
+    pipe of an executable), and keeps the last bytes read, so that the output
+    can still be reported after it is parsed.
+    """
+
+    TAIL_NUM_BYTES = 4096
+
+    def __init__(self, output_file):
+        self._output_file = output_file
+        self.tail = ''
+
+    def _record(self, data):
+        self.tail = (self.tail + data)[-self.TAIL_NUM_BYTES:]
+        return data
+
+    def read(self, *args):
+        return self._record(self._output_file.read(*args))
+
+    def readline(self, *args):
+        return self._record(self._output_file.readline(*args))
+
+
 class FeatureExtractor(Executor):
     """
     FeatureExtractor takes in a list of assets, and run feature extraction on
@@ -24,14 +55,334 @@ class FeatureExtractor(Executor):
         command-line executable and generate feature scores in a log file.
         3) Override _get_feature_scores(self, asset), which read the feature
         scores from the log file, and return the scores in a dictionary format.
-    For an example, follow VmafFeatureExtractor.
+    For an example, follow MomentFeatureExtractor.
+
+    Alternatively, if the command-line executable prints lines of the form
+    "<atom_feature>: <frame_idx> <score>" to stdout, it is enough to:
+        1) Override TYPE and VERSION
+        2) Override _get_exec_cmd(self, asset), which returns the command line
+        (without output redirection) to run on the asset.
+    In this case, stdout is by default captured through a pipe and parsed in
+    memory, skipping the log file; pass optional_dict={'capture_stdout':
+    False} to go through the log file instead. If the executable then exits
+    with an error, a RuntimeError with its last lines of output is raised.
+    The executable may also write
+    the binary record stream described in feature/src/common/frame_output.h
+    (e.g. the --binary option of feature/vmaf), which is detected and read
+    directly into arrays. For an example, follow VmafFeatureExtractor.
+
+    Besides run(), iter_frames(asset) yields the feature scores of an asset
+    frame by frame, as the executable outputs them.
+
+    FeatureExtractors support frame sampling (see Executor): by default, the
+    scores of the sampled frames are picked out of the ones of all frames; a
+    derived class whose executable computes the sampled frames only sets
+    _computes_sampled_frames, e.g. VmafFeatureExtractor.
     """
 
+    # matches one "<atom_feature>: <frame_idx> <score>" line of output
+    SCORE_LINE_PATTERN = re.compile(r"^(\w+): ([0-9]+) ([0-9.-]+)", re.MULTILINE)
+
+    # see feature/src/common/frame_output.h
+    BINARY_OUTPUT_MAGIC = 'VMAFBIN1'
+
+    # number of lines of the captured output of a failed executable to report
+    OUTPUT_TAIL_NUM_LINES = 10
+
+    # atom features that depend on the reference video only. With
+    # optional_dict={'ref_feature_cache': RefFeatureCache()}, they are
+    # computed once per reference and reused by the assets sharing it; a
+    # derived class lists them here, and skips computing them when
+    # _skip_ref_features is set (see _generate_result).
+    REF_ATOM_FEATURES = []
+
+    _skip_ref_features = False
+
+    _supports_frame_sampling = True
+
+    # whether the computation is on the sampled frames only (see
+    # _get_sampled_frame_idxs), rather than on all frames
+    _computes_sampled_frames = False
+
+    # seed of the frames drawn by 'stratified' frame sampling, fixed so that
+    # the same frames are sampled across runs and FeatureExtractors
+    FRAME_SAMPLING_SEED = 0
+
+    def iter_frames(self, asset):
+        """
+        Run on asset and yield its feature scores frame by frame, as soon as
+        the executable outputs them, instead of in a Result once it finishes:
+        e.g. to stop once a quality floor is violated, or to go through
+        multi-hour content in bounded memory:
+            for frame in fextractor.iter_frames(asset):
+                if frame['VMAF_feature_vif_score'] < 0.5:
+                    break
+        Stopping the iteration (i.e. closing the generator) stops the
+        executable and cleans up the workfiles.
+
+        If asset's Result is in result_store, its frames are yielded from it
+        instead. Streamed scores are not saved to result_store. Without an
+        executable printing to stdout (see _get_exec_cmd), the Result is
+        generated first, as in run().
+        :param asset:
+        :return: generator of one dict per frame, in the format of
+        {score_key: score}, including the derived features
+        """
+        self._assert_an_asset(asset)
+
+        result = self._load_result(asset)
+        if result is None and not self._capture_output:
+            result = self._generate_result(asset)
+            if self.result_store:
+                self.result_store.save(result)
+
+        if result is not None:
+            result = self._post_process_result(result)
+            for frame in result.get_perframe_score_dicts():
+                yield frame
+            return
+
+        for frame in self._generate_frames(asset):
+            yield frame
+
     def _read_result(self, asset):
         result = {}
-        result.update(self._get_feature_scores(asset))
+        result.update(self._pick_sampled_frames(self._get_feature_scores(asset)))
+        return Result(asset, self.executor_id, result)
+
+    def _read_result_from_output(self, asset, output):
+        result = {}
+        result.update(self._pick_sampled_frames(self._parse_feature_scores(output)))
         return Result(asset, self.executor_id, result)
 
+    def _iter_sampled_frame_idxs(self):
+        # indexes of the frames sampled (see Executor._frame_sampling) out of
+        # an asset's, relative to its start frame, in ascending order and
+        # without end: the index of frame k * n (uniform), or of a frame drawn
+        # at random between k * n and k * n + n - 1 (stratified), k = 0, 1...
+        frame_sampling_type, n = self._frame_sampling
+        random_state = np.random.RandomState(self.FRAME_SAMPLING_SEED)
+        for stratum_start in count(0, n):
+            if frame_sampling_type == 'uniform':
+                yield stratum_start
+            else:
+                yield stratum_start + random_state.randint(n)
+
+    def _get_sampled_frame_idxs(self, num_frms):
+        # indexes of the frames sampled out of the first num_frms frames
+        return list(takewhile(lambda idx: idx < num_frms,
+                              self._iter_sampled_frame_idxs()))
+
+    def _pick_sampled_frames(self, feature_result):
+        # pick the scores of the sampled frames out of feature_result, the
+        # scores of all frames in the format of {scores_key: scores}, unless
+        # the computation is already on the sampled frames only
+        if self._frame_sampling is None or self._computes_sampled_frames:
+            return feature_result
+        sampled_feature_result = {}
+        for scores_key, scores in feature_result.items():
+            sampled_feature_result[scores_key] = map(
+                lambda idx: scores[idx], self._get_sampled_frame_idxs(len(scores)))
+        return sampled_feature_result
+
+    def _iter_sampled_frames(self, feature_results):
+        # streaming counterpart of _pick_sampled_frames: yield the feature
+        # scores of the sampled frames out of the ones of all frames
+        if self._frame_sampling is None or self._computes_sampled_frames:
+            for feature_result in feature_results:
+                yield feature_result
+            return
+        sampled_frame_idxs = self._iter_sampled_frame_idxs()
+        sampled_frame_idx = next(sampled_frame_idxs)
+        for frame_idx, feature_result in enumerate(feature_results):
+            if frame_idx == sampled_frame_idx:
+                yield feature_result
+                sampled_frame_idx = next(sampled_frame_idxs)
+
+    @property
+    def _capture_output(self):
+        # override Executor._capture_output
+        if not hasattr(self, '_get_exec_cmd'):
+            return False
+        if self.optional_dict is not None \
+                and self.optional_dict.get('capture_stdout') is False:
+            return False
+        return True
+
+    def _run_and_generate_log_file(self, asset):
+        # routine to call the command-line executable and generate feature
+        # scores in the log file.
+
+        log_file_path = self._get_log_file_path(asset)
+
+        # APPEND (>>) result (since _prepare_log_file method has already
+        # created the file and written something in advance).
+        cmd = "{exec_cmd} >> {log_file_path}".format(
+            exec_cmd=self._get_exec_cmd(asset),
+            log_file_path=log_file_path,
+        )
+
+        if self.logger:
+            self.logger.info(cmd)
+
+        subprocess.call(cmd, shell=True)
+
+    def _run_and_capture_output(self, asset):
+        # override Executor._run_and_capture_output(asset)
+
+        cmd = self._get_exec_cmd(asset)
+
+        if self.logger:
+            self.logger.info(cmd)
+
+        p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
+        output, _ = p.communicate()
+        self._assert_exec_succeeded(asset, cmd, p.returncode, output)
+        return output
+
+    def _assert_exec_succeeded(self, asset, cmd, returncode, output):
+        # the executable reports its errors on stdout, which is captured
+        # instead of kept in a log file: pass on its last lines
+        if returncode != 0:
+            raise RuntimeError(
+                "{type} failed on asset {asset} with exit code {code}.\n"
+                "Command: {cmd}\nOutput (last lines):\n{output}".format(
+                    type=self.TYPE, asset=str(asset), code=returncode,
+                    cmd=cmd, output="\n".join(
+                        output.splitlines()[-self.OUTPUT_TAIL_NUM_LINES:])))
+
+    def _generate_frames(self, asset):
+        # streaming counterpart of _generate_result(asset), see iter_frames
+        try:
+            with self._open_workfiles(asset):
+                for feature_result in self._iter_sampled_frames(
+                        self._run_and_iter_output(asset)):
+                    yield self._get_frame_scores(asset, feature_result)
+        finally:
+            self._clean_up_workdir(asset, remove_log=False)
+
+    def _run_and_iter_output(self, asset):
+        # streaming counterpart of _run_and_capture_output(asset): yield the
+        # feature scores of each frame as soon as the executable prints them,
+        # in the format of {scores_key: [score]}
+
+        cmd = self._get_exec_cmd(asset)
+
+        if self.logger:
+            self.logger.info(cmd)
+
+        # python ignores SIGPIPE, and so would the executable: restore it, so
+        # that the executable exits once the pipe is closed
+        p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE,
+                             bufsize=-1, preexec_fn=lambda: signal.signal(
+                                 signal.SIGPIPE, signal.SIG_DFL))
+        output_file = _OutputTailRecorder(p.stdout)
+        closed_early = False
+        try:
+            for feature_result in self._iter_feature_scores(output_file):
+                try:
+                    yield feature_result
+                except GeneratorExit:
+                    closed_early = True
+                    raise
+        finally:
+            # if stopped early, the executable gets a broken pipe writing its
+            # next frame, and exits
+            p.stdout.close()
+            p.wait()
+            if not closed_early:
+                self._assert_exec_succeeded(asset, cmd, p.returncode,
+                                            output_file.tail)
+
+    def _get_frame_scores(self, asset, feature_result):
+        # post-process the feature scores of one frame, in the format of
+        # {scores_key: [score]}, and return them in the format of
+        # {score_key: score}
+        result = self._post_process_result(
+            Result(asset, self.executor_id, feature_result))
+        return result.get_perframe_score_dicts()[0]
+
+    @property
+    def _ref_feature_cache(self):
+        if self.optional_dict is None:
+            return None
+        return self.optional_dict.get('ref_feature_cache')
+
+    def _generate_result(self, asset):
+        # override Executor._generate_result(asset): take REF_ATOM_FEATURES
+        # from ref_feature_cache if an asset with the same reference has
+        # already computed them, otherwise compute and save them there
+
+        ref_feature_cache = self._ref_feature_cache
+        if ref_feature_cache is None or not self.REF_ATOM_FEATURES:
+            return super(FeatureExtractor, self)._generate_result(asset)
+
+        cached_ref_feature_result = ref_feature_cache.load(asset, self.executor_id)
+        if cached_ref_feature_result is not None:
+            self._skip_ref_features = True
+            try:
+                result = super(FeatureExtractor, self)._generate_result(asset)
+            finally:
+                self._skip_ref_features = False
+            ref_feature_result = self._match_ref_feature_result(
+                cached_ref_feature_result, result.result_dict)
+            if ref_feature_result is not None:
+                result.result_dict.update(ref_feature_result)
+                return result
+            # cached features cover fewer frames than needed: recompute
+
+        result = super(FeatureExtractor, self)._generate_result(asset)
+
+        ref_feature_result = {}
+        for atom_feature in self.REF_ATOM_FEATURES:
+            scores_key = self.get_scores_key(atom_feature)
+            ref_feature_result[scores_key] = result.result_dict[scores_key]
+        ref_feature_cache.save(asset, self.executor_id, ref_feature_result)
+
+        return result
+
+    def _match_ref_feature_result(self, ref_feature_result, feature_result):
+        # fit cached reference features to the features computed on an
+        # asset, or return None if they do not cover its frames: by default,
+        # the executable processes as many frames as the shorter of ref and
+        # dis, so truncate to that
+        num_frms = len(feature_result[self.get_scores_key(
+            self._get_computed_atom_features()[0])])
+        matched_ref_feature_result = {}
+        for scores_key, scores in ref_feature_result.items():
+            if len(scores) < num_frms:
+                return None
+            matched_ref_feature_result[scores_key] = scores[:num_frms]
+        return matched_ref_feature_result
+
+    def _get_computed_atom_features(self):
+        # atom features expected from the computation, i.e. ATOM_FEATURES
+        # less REF_ATOM_FEATURES if skipped
+        if self._skip_ref_features:
+            return [atom_feature for atom_feature in self.ATOM_FEATURES
+                    if atom_feature not in self.REF_ATOM_FEATURES]
+        return self.ATOM_FEATURES
+
+    def _get_frame_range_opts(self, asset):
+        # options of the feature executables (see
+        # feature/src/common/cli_options.h) to seek the workfiles directly to
+        # the asset's start frames and stop after its end frames
+        ref_start_end_frame, dis_start_end_frame = \
+            self._get_workfile_start_end_frames(asset)
+        opts = ''
+        num_frms_list = []
+        if ref_start_end_frame is not None:
+            start_frame, end_frame = ref_start_end_frame
+            opts += ' --ref-start-frame {}'.format(start_frame)
+            num_frms_list.append(end_frame - start_frame + 1)
+        if dis_start_end_frame is not None:
+            start_frame, end_frame = dis_start_end_frame
+            opts += ' --dis-start-frame {}'.format(start_frame)
+            num_frms_list.append(end_frame - start_frame + 1)
+        if num_frms_list:
+            opts += ' --num-frames {}'.format(min(num_frms_list))
+        return opts
+
     @classmethod
     def get_scores_key(cls, atom_feature):
         return "{type}_{atom_feature}_scores".format(
@@ -48,38 +399,155 @@ class FeatureExtractor(Executor):
 
         log_file_path = self._get_log_file_path(asset)
 
+        with open(log_file_path, 'rb') as log_file:
+            log_str = log_file.read()
+
+        return self._parse_feature_scores(log_str)
+
+    def _parse_feature_scores(self, output):
+        # parse "<atom_feature>: <frame_idx> <score>" lines of output in a
+        # single pass, and return the scores in a dictionary format.
+
+        if self.BINARY_OUTPUT_MAGIC in output:
+            return self._parse_binary_feature_scores(output)
+
+        atom_features = self._get_computed_atom_features()
+
         atom_feature_scores_dict = {}
-        atom_feature_idx_dict = {}
-        for atom_feature in self.ATOM_FEATURES:
+        for atom_feature in atom_features:
             atom_feature_scores_dict[atom_feature] = []
-            atom_feature_idx_dict[atom_feature] = 0
 
-        with open(log_file_path, 'rt') as log_file:
-            for line in log_file.readlines():
-                for atom_feature in self.ATOM_FEATURES:
-                    re_template = "{af}: ([0-9]+) ([0-9.-]+)".format(af=atom_feature)
-                    mo = re.match(re_template, line)
-                    if mo:
-                        cur_idx = int(mo.group(1))
-                        assert cur_idx == atom_feature_idx_dict[atom_feature]
-                        atom_feature_scores_dict[atom_feature].append(float(mo.group(2)))
-                        atom_feature_idx_dict[atom_feature] += 1
-                        continue
-
-        len_score = len(atom_feature_scores_dict[self.ATOM_FEATURES[0]])
+        for mo in self.SCORE_LINE_PATTERN.finditer(output):
+            scores = atom_feature_scores_dict.get(mo.group(1))
+            if scores is None:
+                continue
+            assert int(mo.group(2)) == len(scores)
+            scores.append(float(mo.group(3)))
+
+        len_score = len(atom_feature_scores_dict[atom_features[0]])
         assert len_score != 0
-        for atom_feature in self.ATOM_FEATURES[1:]:
+        for atom_feature in atom_features[1:]:
             assert len_score == len(atom_feature_scores_dict[atom_feature]), \
                 "Feature data possibly corrupt. Run cleanup script and try again."
 
         feature_result = {}
 
-        for atom_feature in self.ATOM_FEATURES:
+        for atom_feature in atom_features:
             scores_key = self.get_scores_key(atom_feature)
             feature_result[scores_key] = atom_feature_scores_dict[atom_feature]
 
         return feature_result
 
+    def _parse_binary_feature_scores(self, output):
+        # read the binary record stream (anything before the magic, e.g. the
+        # log file header, is skipped), and return the scores in a dictionary
+        # format.
+
+        pos = output.index(self.BINARY_OUTPUT_MAGIC) + len(self.BINARY_OUTPUT_MAGIC)
+        header_len = int(np.frombuffer(output, dtype=np.uint32, count=1, offset=pos)[0])
+        pos += np.dtype(np.uint32).itemsize
+        feature_names = output[pos:pos + header_len].rstrip('\0').split('\n')
+        pos += header_len
+
+        row_size = np.dtype(np.float64).itemsize * len(feature_names)
+        assert (len(output) - pos) % row_size == 0, \
+            "Feature data possibly corrupt: {}".format(
+                output[pos + (len(output) - pos) // row_size * row_size:])
+
+        scores_mtx = np.frombuffer(output, dtype=np.float64, offset=pos)\
+            .reshape(-1, len(feature_names))
+
+        return self._get_feature_scores_from_mtx(scores_mtx, feature_names)
+
+    def _iter_feature_scores(self, output_file):
+        # streaming counterpart of _parse_feature_scores(output): read the
+        # output of the executable from output_file (e.g. a pipe) and yield
+        # the feature scores of each frame as soon as it is complete, in the
+        # format of {scores_key: [score]}
+
+        head = output_file.read(len(self.BINARY_OUTPUT_MAGIC))
+        if head == self.BINARY_OUTPUT_MAGIC:
+            feature_results = self._iter_binary_feature_scores(output_file)
+        else:
+            lines = chain((head + output_file.readline()).splitlines(True),
+                          iter(output_file.readline, ''))
+            feature_results = self._iter_text_feature_scores(lines)
+
+        num_frms = 0
+        for feature_result in feature_results:
+            num_frms += 1
+            yield feature_result
+        assert num_frms != 0
+
+    def _iter_text_feature_scores(self, lines):
+        # yield the scores of a frame once all its
+        # "<atom_feature>: <frame_idx> <score>" lines are read
+
+        atom_features = self._get_computed_atom_features()
+
+        # scores read of the frames not yielded yet
+        atom_feature_scores_dict = {}
+        for atom_feature in atom_features:
+            atom_feature_scores_dict[atom_feature] = []
+        num_frms = 0
+
+        for line in lines:
+            mo = self.SCORE_LINE_PATTERN.match(line)
+            if mo is None:
+                continue
+            scores = atom_feature_scores_dict.get(mo.group(1))
+            if scores is None:
+                continue
+            assert int(mo.group(2)) == num_frms + len(scores)
+            scores.append(float(mo.group(3)))
+
+            if all(atom_feature_scores_dict.values()):
+                feature_result = {}
+                for atom_feature in atom_features:
+                    scores_key = self.get_scores_key(atom_feature)
+                    feature_result[scores_key] = \
+                        [atom_feature_scores_dict[atom_feature].pop(0)]
+                num_frms += 1
+                yield feature_result
+
+        assert not any(atom_feature_scores_dict.values()), \
+            "Feature data possibly corrupt. Run cleanup script and try again."
+
+    def _iter_binary_feature_scores(self, output_file):
+        # read the binary record stream past its magic, and yield the scores
+        # of each frame record
+
+        header_len_size = np.dtype(np.uint32).itemsize
+        header_len_str = output_file.read(header_len_size)
+        assert len(header_len_str) == header_len_size, \
+            "Feature data possibly corrupt: {}".format(header_len_str)
+        header_len = int(np.frombuffer(header_len_str, dtype=np.uint32)[0])
+        feature_names = output_file.read(header_len).rstrip('\0').split('\n')
+
+        row_size = np.dtype(np.float64).itemsize * len(feature_names)
+        for row in iter(lambda: output_file.read(row_size), ''):
+            assert len(row) == row_size, \
+                "Feature data possibly corrupt: {}".format(row)
+            scores_mtx = np.frombuffer(row, dtype=np.float64)\
+                .reshape(1, len(feature_names))
+            yield self._get_feature_scores_from_mtx(scores_mtx, feature_names)
+
+    def _get_feature_scores_from_mtx(self, scores_mtx, feature_names):
+        # pick the atom features out of the columns of a frames x features
+        # matrix, and return the scores in a dictionary format.
+
+        assert scores_mtx.shape[0] != 0
+
+        feature_result = {}
+        for atom_feature in self._get_computed_atom_features():
+            assert atom_feature in feature_names, \
+                "Feature data possibly corrupt. Missing {}.".format(atom_feature)
+            scores_key = self.get_scores_key(atom_feature)
+            feature_result[scores_key] = \
+                scores_mtx[:, feature_names.index(atom_feature)].tolist()
+
+        return feature_result
+
 
 class VmafFeatureExtractor(FeatureExtractor):
 
@@ -100,21 +568,37 @@ class VmafFeatureExtractor(FeatureExtractor):
     DERIVED_ATOM_FEATURES = ['vif_scale0', 'vif_scale1', 'vif_scale2', 'vif_scale3',
                              'vif2', 'adm2',]
 
+    # motion is computed on the reference only
+    REF_ATOM_FEATURES = ['motion']
+
+    # with frame sampling, feature/vmaf seeks from one sampled frame to the
+    # next, reading only the reference frame preceding it for its motion
+    _computes_sampled_frames = True
+
     VMAF_FEATURE = config.ROOT + "/feature/vmaf"
 
     ADM_CONSTANT = 1000
 
-    def _run_and_generate_log_file(self, asset):
-        # routine to call the command-line executable and generate feature
-        # scores in the log file.
+    def _get_exec_cmd(self, asset):
+        # routine to return the command line that runs the executable and
+        # prints the feature scores to stdout.
 
-        log_file_path = self._get_log_file_path(asset)
+        # with frame sampling, feature/vmaf only computes the sampled frames
+        frame_idxs = None
+        if self._frame_sampling is not None:
+            frame_idxs = self._get_sampled_frame_idxs(
+                self._get_max_num_frms(asset))
+
+        return self._get_frames_exec_cmd(
+            asset, frame_idxs, self._get_frames_file_path(asset))
+
+    def _get_frames_exec_cmd(self, asset, frame_idxs, frames_file_path):
+        # command line that only computes the frames of frame_idxs (relative
+        # to the asset's start frames), listed in frames_file_path, or all
+        # frames if frame_idxs is None
 
-        # run VMAF command line to extract features, APPEND (>>) result (since
-        # _prepare_generate_log_file method has already created the file and
-        # written something in advance).
         quality_width, quality_height = asset.quality_width_height
-        vmaf_feature_cmd = "{vmaf} all {yuv_type} {ref_path} {dis_path} {w} {h} >> {log_file_path}" \
+        vmaf_feature_cmd = "{vmaf} all {yuv_type} {ref_path} {dis_path} {w} {h} --binary" \
         .format(
             vmaf=self.VMAF_FEATURE,
             yuv_type=asset.yuv_type,
@@ -122,13 +606,275 @@ class VmafFeatureExtractor(FeatureExtractor):
             dis_path=asset.dis_workfile_path,
             w=quality_width,
             h=quality_height,
-            log_file_path=log_file_path,
-        )
-
-        if self.logger:
-            self.logger.info(vmaf_feature_cmd)
-
-        subprocess.call(vmaf_feature_cmd, shell=True)
+        ) + self._get_frame_range_opts(asset)
+
+        if frame_idxs is not None:
+            with open(frames_file_path, 'wt') as frames_file:
+                for frame_idx in frame_idxs:
+                    frames_file.write("{}\n".format(frame_idx))
+            vmaf_feature_cmd += " --frames {}".format(frames_file_path)
+
+        if self._num_threads > 0:
+            vmaf_feature_cmd += " --threads {}".format(self._num_threads)
+
+        if self._skip_ref_features:
+            vmaf_feature_cmd += " --skip-ref-features"
+
+        return vmaf_feature_cmd
+
+    def _get_frames_file_path(self, asset):
+        return self._get_log_file_path(asset) + '.frames'
+
+    def _get_segment_file_path(self, asset, segment_idx):
+        # prefix of the files of a segment in the workdir, see _get_segments
+        return self._get_log_file_path(asset) + '.segment{}'.format(segment_idx)
+
+    @staticmethod
+    def _get_max_num_frms(asset):
+        # number of frames of the shorter of ref and dis, as processed: an
+        # upper bound of the frames feature/vmaf reads
+        num_frms_list = []
+        for path, width_height, start_end_frame in [
+            (asset.ref_path, asset.ref_width_height, asset.ref_start_end_frame),
+            (asset.dis_path, asset.dis_width_height, asset.dis_start_end_frame)]:
+            if start_end_frame is not None:
+                start_frame, end_frame = start_end_frame
+                num_frms_list.append(end_frame - start_frame + 1)
+            else:
+                width, height = width_height
+                num_frms_list.append(os.path.getsize(path) //
+                                     YuvReader.get_num_bytes_per_frm(
+                                         width, height, asset.yuv_type))
+        return min(num_frms_list)
+
+    def _clean_up_workdir(self, asset, remove_log):
+        # override Executor._clean_up_workdir(asset, remove_log)
+        if self.delete_workdir:
+            file_paths = [self._get_frames_file_path(asset)]
+            for segment_idx in range(self._num_segments):
+                segment_file_path = \
+                    self._get_segment_file_path(asset, segment_idx)
+                file_paths += [segment_file_path + '.frames',
+                               segment_file_path + '.out']
+            for file_path in file_paths:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+        super(VmafFeatureExtractor, self)._clean_up_workdir(asset, remove_log)
+
+    @property
+    def _use_lib(self):
+        # with optional_dict={'use_lib': True}, compute the features in
+        # process through feature/libvmaf.so instead of running feature/vmaf
+        return self.optional_dict is not None \
+               and self.optional_dict.get('use_lib', False)
+
+    @property
+    def _num_threads(self):
+        # with optional_dict={'num_threads': n}, feature/vmaf computes n
+        # frames at the same time, on as many threads besides the one
+        # reading and writing frames, with the same scores (libvmaf.so, with
+        # use_lib, computes each frame on the thread pushing it)
+        if self.optional_dict is None:
+            return 0
+        num_threads = self.optional_dict.get('num_threads', 0)
+        assert isinstance(num_threads, int) and num_threads >= 0, \
+            "Number of threads must be a non-negative integer: {}".format(
+                num_threads)
+        return num_threads
+
+    @property
+    def _num_segments(self):
+        # with optional_dict={'num_segments': k}, split each asset into k
+        # segments of consecutive frames, computed by as many feature/vmaf
+        # processes at the same time, and stitch their scores back together.
+        # Each process seeks to the first frame of its segment, priming
+        # motion with the reference frame preceding it, so the scores are
+        # the same as by a single process
+        if self.optional_dict is None:
+            return 1
+        num_segments = self.optional_dict.get('num_segments', 1)
+        assert isinstance(num_segments, int) and num_segments > 0, \
+            "Number of segments must be a positive integer: {}".format(
+                num_segments)
+        assert num_segments == 1 or not self._use_lib, \
+            "Segments are not supported with use_lib."
+        return num_segments
+
+    @property
+    def _use_fifo_workfiles(self):
+        # override Executor._use_fifo_workfiles: the segments seek in the
+        # workfiles, which cannot be FIFOs then
+        return self.fifo_mode and self._num_segments == 1
+
+    @property
+    def _capture_output(self):
+        # override FeatureExtractor._capture_output
+        if self._num_segments > 1 or self._use_lib:
+            return True
+        return super(VmafFeatureExtractor, self)._capture_output
+
+    def _get_segments(self, asset):
+        # split the frames to compute (all, or the sampled ones) into up to
+        # _num_segments lists of consecutive frame indexes, of about the same
+        # length
+        num_frms = self._get_max_num_frms(asset)
+        if self._frame_sampling is None:
+            frame_idxs = range(num_frms)
+        else:
+            frame_idxs = self._get_sampled_frame_idxs(num_frms)
+        num_segments = max(min(self._num_segments, len(frame_idxs)), 1)
+        return [frame_idxs[len(frame_idxs) * segment_idx // num_segments:
+                           len(frame_idxs) * (segment_idx + 1) // num_segments]
+                for segment_idx in range(num_segments)]
+
+    def _iter_segment_feature_results(self, asset):
+        # start a feature/vmaf process on each segment, all at once, and
+        # yield the feature scores of each segment in order, as soon as its
+        # process is done, in the format of {scores_key: scores}
+
+        segments = self._get_segments(asset)
+
+        processes = []
+        try:
+            for segment_idx, frame_idxs in enumerate(segments):
+                segment_file_path = \
+                    self._get_segment_file_path(asset, segment_idx)
+                cmd = self._get_frames_exec_cmd(
+                    asset, frame_idxs, segment_file_path + '.frames')
+
+                if self.logger:
+                    self.logger.info(cmd)
+
+                # without a shell in between, so that terminating the process
+                # stops feature/vmaf
+                with open(segment_file_path + '.out', 'wb') as output_file:
+                    processes.append(subprocess.Popen(shlex.split(cmd),
+                                                      stdout=output_file))
+
+            for segment_idx, (frame_idxs, p) in \
+                    enumerate(zip(segments, processes)):
+                p.wait()
+                if p.returncode != 0:
+                    raise RuntimeError(
+                        "{type} failed on segment {idx} of asset {asset} "
+                        "with exit code {code}.".format(
+                            type=self.TYPE, idx=segment_idx,
+                            asset=str(asset), code=p.returncode))
+
+                segment_file_path = \
+                    self._get_segment_file_path(asset, segment_idx)
+                with open(segment_file_path + '.out', 'rb') as output_file:
+                    feature_result = self._parse_feature_scores(
+                        output_file.read())
+
+                # only the last segment may end early, at the end of the
+                # shorter of ref and dis; a shorter one would shift the frames
+                # of the ones after it
+                num_frms = len(feature_result.values()[0])
+                assert num_frms == len(frame_idxs) \
+                       or segment_idx == len(segments) - 1, \
+                    "Segment {idx} of asset {asset} has {num_frms} frames " \
+                    "instead of {expected}.".format(
+                        idx=segment_idx, asset=str(asset),
+                        num_frms=num_frms, expected=len(frame_idxs))
+
+                yield feature_result
+        finally:
+            # if stopped early
+            for p in processes:
+                if p.poll() is None:
+                    p.terminate()
+                    p.wait()
+
+    def _run_segments_and_capture_output(self, asset):
+        # counterpart of _run_and_capture_output(asset) with segments: the
+        # scores of the segments, concatenated in the format of
+        # {scores_key: scores}
+        feature_result = collections.defaultdict(list)
+        for segment_feature_result in self._iter_segment_feature_results(asset):
+            for scores_key, scores in segment_feature_result.items():
+                feature_result[scores_key] += scores
+        return dict(feature_result)
+
+    def _iter_segment_feature_scores(self, asset):
+        # counterpart of _run_and_iter_output(asset) with segments
+        for feature_result in self._iter_segment_feature_results(asset):
+            num_frms = len(feature_result.values()[0])
+            for frame_idx in range(num_frms):
+                yield dict(map(lambda (scores_key, scores):
+                               (scores_key, scores[frame_idx:frame_idx + 1]),
+                               feature_result.items()))
+
+    def _run_and_capture_output(self, asset):
+        # override FeatureExtractor._run_and_capture_output(asset)
+        if self._num_segments > 1:
+            return self._run_segments_and_capture_output(asset)
+        if not self._use_lib:
+            return super(VmafFeatureExtractor, self)._run_and_capture_output(asset)
+
+        rows = list(self._iter_lib_rows(asset))
+        assert len(rows) != 0
+        return self._get_feature_scores_from_mtx(
+            np.vstack(rows), VmafFeatureLib.get_feature_names())
+
+    def _run_and_iter_output(self, asset):
+        # override FeatureExtractor._run_and_iter_output(asset)
+        if self._num_segments > 1:
+            return self._iter_segment_feature_scores(asset)
+        if not self._use_lib:
+            return super(VmafFeatureExtractor, self)._run_and_iter_output(asset)
+        return self._iter_lib_feature_scores(asset)
+
+    def _iter_lib_feature_scores(self, asset):
+        feature_names = VmafFeatureLib.get_feature_names()
+        num_frms = 0
+        for row in self._iter_lib_rows(asset):
+            num_frms += 1
+            yield self._get_feature_scores_from_mtx(
+                row.reshape(1, len(feature_names)), feature_names)
+        assert num_frms != 0
+
+    def _iter_lib_rows(self, asset):
+        # feed the Y planes of the workfiles frame by frame to libvmaf.so, and
+        # yield the scores of each frame; stop at the end of the shorter one,
+        # like feature/vmaf does. With frame sampling, only the sampled frames
+        # are computed (the workfiles, which may be FIFOs, are still read
+        # through), and the reference frame preceding each of them is pushed
+        # for its motion
+        quality_w, quality_h = asset.quality_width_height
+        ref_start_end_frame, dis_start_end_frame = \
+            self._get_workfile_start_end_frames(asset)
+        ref_start_frame, ref_end_frame = ref_start_end_frame or (None, None)
+        dis_start_frame, dis_end_frame = dis_start_end_frame or (None, None)
+        with YuvReader(filepath=asset.ref_workfile_path, width=quality_w,
+                       height=quality_h, yuv_type=asset.yuv_type,
+                       start_frame=ref_start_frame,
+                       end_frame=ref_end_frame) as ref_yuv_reader, \
+             YuvReader(filepath=asset.dis_workfile_path, width=quality_w,
+                       height=quality_h, yuv_type=asset.yuv_type,
+                       start_frame=dis_start_frame,
+                       end_frame=dis_end_frame) as dis_yuv_reader, \
+             VmafFeatureLib(quality_w, quality_h, asset.yuv_type) as lib:
+            if self._frame_sampling is None:
+                sampled_frame_idxs = count()
+            else:
+                sampled_frame_idxs = self._iter_sampled_frame_idxs()
+            sampled_frame_idx = next(sampled_frame_idxs)
+            for frame_idx, (ref_y, dis_y) in enumerate(
+                    izip(ref_yuv_reader.iter_y(), dis_yuv_reader.iter_y())):
+                if frame_idx == sampled_frame_idx:
+                    yield lib.push_frame(ref_y, dis_y)
+                    sampled_frame_idx = next(sampled_frame_idxs)
+                elif frame_idx + 1 == sampled_frame_idx:
+                    lib.push_prev_frame(ref_y)
+
+    def _read_result_from_output(self, asset, output):
+        # override FeatureExtractor._read_result_from_output(asset, output)
+        if not self._use_lib and self._num_segments == 1:
+            return super(VmafFeatureExtractor, self)._read_result_from_output(asset, output)
+
+        # output is already the scores in a dictionary format
+        return Result(asset, self.executor_id, dict(output))
 
     @classmethod
     def _post_process_result(cls, result):
@@ -222,16 +968,12 @@ class PsnrFeatureExtractor(FeatureExtractor):
 
     PSNR = config.ROOT + "/feature/psnr"
 
-    def _run_and_generate_log_file(self, asset):
-        # routine to call the command-line executable and generate quality
-        # scores in the log file.
-
-        log_file_path = self._get_log_file_path(asset)
+    def _get_exec_cmd(self, asset):
+        # routine to return the command line that runs the executable and
+        # prints the feature scores to stdout.
 
-        # run VMAF command line to extract features, 'APPEND' result (since
-        # super method already does something
         quality_width, quality_height = asset.quality_width_height
-        psnr_cmd = "{psnr} {yuv_type} {ref_path} {dis_path} {w} {h} >> {log_file_path}" \
+        psnr_cmd = "{psnr} {yuv_type} {ref_path} {dis_path} {w} {h} --binary" \
         .format(
             psnr=self.PSNR,
             yuv_type=asset.yuv_type,
@@ -239,13 +981,9 @@ class PsnrFeatureExtractor(FeatureExtractor):
             dis_path=asset.dis_workfile_path,
             w=quality_width,
             h=quality_height,
-            log_file_path=log_file_path,
-        )
-
-        if self.logger:
-            self.logger.info(psnr_cmd)
+        ) + self._get_frame_range_opts(asset)
 
-        subprocess.call(psnr_cmd, shell=True)
+        return psnr_cmd
 
 class MomentFeatureExtractor(FeatureExtractor):
 
@@ -258,6 +996,8 @@ class MomentFeatureExtractor(FeatureExtractor):
 
     DERIVED_ATOM_FEATURES = ['refvar', 'disvar', ]
 
+    REF_ATOM_FEATURES = ['ref1st', 'ref2nd', ]
+
     MOMENT = config.ROOT + "/feature/moment"
 
     def _run_and_generate_log_file(self, asset):
@@ -265,42 +1005,69 @@ class MomentFeatureExtractor(FeatureExtractor):
         # scores in the log file.
 
         quality_w, quality_h = asset.quality_width_height
-
+        ref_start_end_frame, dis_start_end_frame = \
+            self._get_workfile_start_end_frames(asset)
+        ref_start_frame, ref_end_frame = ref_start_end_frame or (None, None)
+        dis_start_frame, dis_end_frame = dis_start_end_frame or (None, None)
+
+        # the ref workfile is not read if its moments are already known, but
+        # it still has to be opened to unblock the ffmpeg writing to it in
+        # fifo mode
         ref_scores_mtx = None
         with YuvReader(filepath=asset.ref_workfile_path, width=quality_w,
-                       height=quality_h, yuv_type=asset.yuv_type) as ref_yuv_reader:
-            scores_mtx_list = []
-            i = 0
-            for ref_yuv in ref_yuv_reader:
-                ref_y = ref_yuv[0]
-                firstm = ref_y.mean()
-                secondm = ref_y.var() + firstm**2
-                scores_mtx_list.append(np.hstack(([firstm], [secondm])))
-                i += 1
-            ref_scores_mtx = np.vstack(scores_mtx_list)
+                       height=quality_h, yuv_type=asset.yuv_type,
+                       start_frame=ref_start_frame,
+                       end_frame=ref_end_frame) as ref_yuv_reader:
+            if not self._skip_ref_features:
+                ref_scores_mtx = self._get_moments_mtx(ref_yuv_reader)
 
         dis_scores_mtx = None
         with YuvReader(filepath=asset.dis_workfile_path, width=quality_w,
-                       height=quality_h, yuv_type=asset.yuv_type) as dis_yuv_reader:
-            scores_mtx_list = []
-            i = 0
-            for dis_yuv in dis_yuv_reader:
-                dis_y = dis_yuv[0]
-                firstm = dis_y.mean()
-                secondm = dis_y.var() + firstm**2
-                scores_mtx_list.append(np.hstack(([firstm], [secondm])))
-                i += 1
-            dis_scores_mtx = np.vstack(scores_mtx_list)
+                       height=quality_h, yuv_type=asset.yuv_type,
+                       start_frame=dis_start_frame,
+                       end_frame=dis_end_frame) as dis_yuv_reader:
+            dis_scores_mtx = self._get_moments_mtx(dis_yuv_reader)
 
-        assert ref_scores_mtx is not None and dis_scores_mtx is not None
+        assert (ref_scores_mtx is not None or self._skip_ref_features) \
+               and dis_scores_mtx is not None
 
-        log_dict = {'ref_scores_mtx': ref_scores_mtx.tolist(),
+        log_dict = {'ref_scores_mtx': ref_scores_mtx.tolist()
+                                      if ref_scores_mtx is not None else None,
                     'dis_scores_mtx': dis_scores_mtx.tolist()}
 
         log_file_path = self._get_log_file_path(asset)
         with open(log_file_path, 'wt') as log_file:
             log_file.write(str(log_dict))
 
+    # number of frames whose moments are computed at once
+    MOMENT_BATCH_NUM_FRMS = 16
+
+    @classmethod
+    def _get_moments_mtx(cls, yuv_reader):
+        # return a matrix of one row [1st moment, 2nd moment] of the Y plane
+        # per frame. For a regular file, compute on batches of frames read
+        # through YuvReader's memory map; a workfile in fifo mode can only
+        # be streamed frame by frame.
+        if not os.path.isfile(yuv_reader.filepath):
+            scores_mtx_list = []
+            for y in yuv_reader.iter_y():
+                firstm = y.mean()
+                secondm = y.var() + firstm**2
+                scores_mtx_list.append(np.hstack(([firstm], [secondm])))
+            return np.vstack(scores_mtx_list)
+
+        num_frms = len(yuv_reader)
+        assert num_frms > 0
+        scores_mtx = np.empty((num_frms, 2))
+        for start in range(0, num_frms, cls.MOMENT_BATCH_NUM_FRMS):
+            count = min(cls.MOMENT_BATCH_NUM_FRMS, num_frms - start)
+            ys = yuv_reader.to_double(yuv_reader.read_frames(start, count))
+            ys = ys.reshape(count, -1)
+            firstms = ys.mean(axis=1)
+            scores_mtx[start:start + count, 0] = firstms
+            scores_mtx[start:start + count, 1] = ys.var(axis=1) + firstms**2
+        return scores_mtx
+
     def _get_feature_scores(self, asset):
         # routine to read the feature scores from the log file, and return
         # the scores in a dictionary format.
@@ -310,22 +1077,30 @@ class MomentFeatureExtractor(FeatureExtractor):
         with open(log_file_path, 'rt') as log_file:
             log_str = log_file.read()
             log_dict = ast.literal_eval(log_str)
-        ref_scores_mtx = np.array(log_dict['ref_scores_mtx'])
         dis_scores_mtx = np.array(log_dict['dis_scores_mtx'])
 
-        _, num_ref_features = ref_scores_mtx.shape
-        assert num_ref_features == 2 # ref1st, ref2nd
         _, num_dis_features = dis_scores_mtx.shape
         assert num_dis_features == 2 # dis1st, dis2nd
 
         feature_result = {}
-        feature_result[self.get_scores_key('ref1st')] = list(ref_scores_mtx[:, 0])
-        feature_result[self.get_scores_key('ref2nd')] = list(ref_scores_mtx[:, 1])
         feature_result[self.get_scores_key('dis1st')] = list(dis_scores_mtx[:, 0])
         feature_result[self.get_scores_key('dis2nd')] = list(dis_scores_mtx[:, 1])
 
+        # ref moments are None if skipped
+        if log_dict['ref_scores_mtx'] is not None:
+            ref_scores_mtx = np.array(log_dict['ref_scores_mtx'])
+            _, num_ref_features = ref_scores_mtx.shape
+            assert num_ref_features == 2 # ref1st, ref2nd
+            feature_result[self.get_scores_key('ref1st')] = list(ref_scores_mtx[:, 0])
+            feature_result[self.get_scores_key('ref2nd')] = list(ref_scores_mtx[:, 1])
+
         return feature_result
 
+    def _match_ref_feature_result(self, ref_feature_result, feature_result):
+        # override FeatureExtractor._match_ref_feature_result: ref moments are
+        # computed on all frames of ref, independently of dis
+        return ref_feature_result
+
     @classmethod
     def _post_process_result(cls, result):
         # override Executor._post_process_result(result)
@@ -362,16 +1137,12 @@ class SsimFeatureExtractor(FeatureExtractor):
 
     SSIM = config.ROOT + "/feature/ssim"
 
-    def _run_and_generate_log_file(self, asset):
-        # routine to call the command-line executable and generate quality
-        # scores in the log file.
-
-        log_file_path = self._get_log_file_path(asset)
+    def _get_exec_cmd(self, asset):
+        # routine to return the command line that runs the executable and
+        # prints the feature scores to stdout.
 
-        # run VMAF command line to extract features, 'APPEND' result (since
-        # super method already does something
         quality_width, quality_height = asset.quality_width_height
-        ssim_cmd = "{ssim} {yuv_type} {ref_path} {dis_path} {w} {h} >> {log_file_path}" \
+        ssim_cmd = "{ssim} {yuv_type} {ref_path} {dis_path} {w} {h} --binary" \
         .format(
             ssim=self.SSIM,
             yuv_type=asset.yuv_type,
@@ -379,13 +1150,9 @@ class SsimFeatureExtractor(FeatureExtractor):
             dis_path=asset.dis_workfile_path,
             w=quality_width,
             h=quality_height,
-            log_file_path=log_file_path,
-        )
+        ) + self._get_frame_range_opts(asset)
 
-        if self.logger:
-            self.logger.info(ssim_cmd)
-
-        subprocess.call(ssim_cmd, shell=True)
+        return ssim_cmd
 
 class MsSsimFeatureExtractor(FeatureExtractor):
 
@@ -402,16 +1169,12 @@ class MsSsimFeatureExtractor(FeatureExtractor):
 
     MS_SSIM = config.ROOT + "/feature/ms_ssim"
 
-    def _run_and_generate_log_file(self, asset):
-        # routine to call the command-line executable and generate quality
-        # scores in the log file.
-
-        log_file_path = self._get_log_file_path(asset)
+    def _get_exec_cmd(self, asset):
+        # routine to return the command line that runs the executable and
+        # prints the feature scores to stdout.
 
-        # run VMAF command line to extract features, 'APPEND' result (since
-        # super method already does something
         quality_width, quality_height = asset.quality_width_height
-        ms_ssim_cmd = "{ms_ssim} {yuv_type} {ref_path} {dis_path} {w} {h} >> {log_file_path}" \
+        ms_ssim_cmd = "{ms_ssim} {yuv_type} {ref_path} {dis_path} {w} {h} --binary" \
         .format(
             ms_ssim=self.MS_SSIM,
             yuv_type=asset.yuv_type,
@@ -419,11 +1182,225 @@ class MsSsimFeatureExtractor(FeatureExtractor):
             dis_path=asset.dis_workfile_path,
             w=quality_width,
             h=quality_height,
-            log_file_path=log_file_path,
-        )
+        ) + self._get_frame_range_opts(asset)
 
-        if self.logger:
-            self.logger.info(ms_ssim_cmd)
+        return ms_ssim_cmd
+
+class FusedFeatureExtractor(FeatureExtractor):
+    """
+    Composite FeatureExtractor that computes the features of several
+    FeatureExtractors in a single pass over each asset, by running
+    feature/fused, which reads every frame pair once and computes all the
+    requested features on the same buffers.
+
+    It produces for each asset one Result per component FeatureExtractor,
+    with the component's executor_id and the same scores as the component run
+    on its own. The components' Results are looked up in and saved to
+    result_store as usual, so they are shared with runs of the components
+    themselves, and only the components whose Results are missing get
+    computed.
+
+    The components are given by optional_dict={'fextractor_types': [...]}
+    (by default, all of FUSED_GROUPS); the rest of optional_dict is passed on
+    to them. After run(), fextractor_results holds for each asset the list of
+    the components' Results, in the order of fextractor_types, and results,
+    as for any Executor, one Result per asset, which holds the scores of all
+    the components. Example:
+        fextractor = FusedFeatureExtractor(
+            assets, None, optional_dict={
+                'fextractor_types': ['VMAF_feature', 'PSNR_feature']})
+        fextractor.run()
+        vmaf_feature_result, psnr_feature_result = \
+            fextractor.fextractor_results[0]
+    FeatureAssembler(..., fuse=True) runs its fusable types this way.
+    """
 
-        subprocess.call(ms_ssim_cmd, shell=True)
+    TYPE = "Fused_feature"
+    VERSION = "1.0"
+
+    # FeatureExtractor type -> feature group computed by feature/fused
+    FUSED_GROUPS = collections.OrderedDict([
+        ('VMAF_feature', 'all'),
+        ('PSNR_feature', 'psnr'),
+        ('SSIM_feature', 'ssim'),
+        ('MS_SSIM_feature', 'ms_ssim'),
+    ])
+
+    FUSED = config.ROOT + "/feature/fused"
+
+    def __init__(self,
+                 assets,
+                 logger,
+                 fifo_mode=True,
+                 delete_workdir=True,
+                 result_store=None,
+                 optional_dict=None,
+                 ):
+        super(FusedFeatureExtractor, self).__init__(
+            assets, logger, fifo_mode, delete_workdir, result_store,
+            optional_dict)
+
+        fextractor_types = self.FUSED_GROUPS.keys()
+        if optional_dict is not None and 'fextractor_types' in optional_dict:
+            fextractor_types = optional_dict['fextractor_types']
+        assert len(fextractor_types) != 0
+        for fextractor_type in fextractor_types:
+            assert fextractor_type in self.FUSED_GROUPS, \
+                "{} can not be fused.".format(fextractor_type)
+
+        self.fextractors = map(
+            lambda fextractor_type:
+                FeatureExtractor.find_subclass(fextractor_type)(
+                    assets, logger, fifo_mode, delete_workdir, result_store,
+                    optional_dict),
+            fextractor_types)
+
+        # components to be computed by the current run of feature/fused
+        self._fextractors_to_run = self.fextractors
+
+        self.fextractor_results = []
+
+    def run(self):
+        # override Executor.run()
+        self.fextractor_results = []
+        super(FusedFeatureExtractor, self).run()
+
+    def remove_results(self):
+        # override Executor.remove_results()
+        for fextractor in self.fextractors:
+            fextractor.remove_results()
+
+    def iter_frames(self, asset):
+        # override FeatureExtractor.iter_frames(asset): stream the scores of
+        # all components from one run of feature/fused, regardless of
+        # result_store; a frame holds the scores of all components
+        self._assert_an_asset(asset)
+        self._fextractors_to_run = self.fextractors
+        return self._generate_frames(asset)
+
+    def _get_frame_scores(self, asset, feature_result):
+        # override FeatureExtractor._get_frame_scores(asset, feature_result):
+        # post-process the scores of each component
+        frame_scores = {}
+        for fextractor in self.fextractors:
+            component_feature_result = {}
+            for atom_feature in fextractor.ATOM_FEATURES:
+                scores_key = fextractor.get_scores_key(atom_feature)
+                component_feature_result[scores_key] = feature_result[scores_key]
+            frame_scores.update(
+                fextractor._get_frame_scores(asset, component_feature_result))
+        return frame_scores
+
+    def _prefetch_results(self, assets):
+        # override Executor._prefetch_results(assets): prefetch the Results of
+        # each component; an asset counts as prefetched only if the Results
+        # of all components are in result_store
+        if self.result_store is None:
+            return [None for _ in assets]
+
+        results_per_asset = zip(*map(
+            lambda fextractor: fextractor._prefetch_results(assets),
+            self.fextractors))
+
+        return map(
+            lambda results: list(results)
+            if all(map(lambda result: result is not None, results)) else None,
+            results_per_asset)
+
+    def _load_result(self, asset):
+        # override Executor._load_result(asset): return the list of the
+        # components' Results, None for the ones not in result_store
+        if asset in self._prefetched_results:
+            return self._prefetched_results.pop(asset)
+        return map(lambda fextractor: fextractor._load_result(asset),
+                   self.fextractors)
+
+    def _run_on_asset(self, asset):
+        # override Executor._run_on_asset(asset): run feature/fused once for
+        # the components whose Results are missing, and split its output
+        # into one Result per component, appended to fextractor_results; the
+        # Result of asset holds the scores of all of them
+
+        self._assert_an_asset(asset)
+
+        results = self._load_result(asset)
+
+        self._fextractors_to_run = \
+            [fextractor for fextractor, result in zip(self.fextractors, results)
+             if result is None]
+
+        if not self._fextractors_to_run:
+            if self.logger:
+                self.logger.info('{id} result exists. Skip {id} run.'.
+                                 format(id=self.executor_id))
+        else:
+            if self.logger:
+                self.logger.info('{id} result does\'t exist. Perform {id} '
+                                 'calculation for {types}.'.format(
+                    id=self.executor_id, types=', '.join(map(
+                        lambda fextractor: fextractor.executor_id,
+                        self._fextractors_to_run))))
+
+            fused_result = self._generate_result(asset)
+
+            for idx, fextractor in enumerate(self.fextractors):
+                if results[idx] is not None:
+                    continue
+                result_dict = {}
+                for atom_feature in fextractor.ATOM_FEATURES:
+                    scores_key = fextractor.get_scores_key(atom_feature)
+                    result_dict[scores_key] = fused_result.result_dict[scores_key]
+                results[idx] = Result(asset, fextractor.executor_id, result_dict)
+
+                # save result
+                if self.result_store:
+                    self.result_store.save(results[idx])
+
+        results = map(
+            lambda (fextractor, result): fextractor._post_process_result(result),
+            zip(self.fextractors, results))
+        self.fextractor_results.append(results)
+
+        # the scores keys of the components do not overlap
+        result_dict = {}
+        for result in results:
+            result_dict.update(result.result_dict)
+        return Result(asset, self.executor_id, result_dict)
+
+    def _get_exec_cmd(self, asset):
+        # routine to return the command line that runs the executable and
+        # prints the feature scores to stdout.
+
+        quality_width, quality_height = asset.quality_width_height
+        fused_cmd = "{fused} {groups} {yuv_type} {ref_path} {dis_path} {w} {h} --binary" \
+        .format(
+            fused=self.FUSED,
+            groups=','.join(map(
+                lambda fextractor: self.FUSED_GROUPS[fextractor.TYPE],
+                self._fextractors_to_run)),
+            yuv_type=asset.yuv_type,
+            ref_path=asset.ref_workfile_path,
+            dis_path=asset.dis_workfile_path,
+            w=quality_width,
+            h=quality_height,
+        ) + self._get_frame_range_opts(asset)
+
+        return fused_cmd
+
+    def _parse_feature_scores(self, output):
+        # override FeatureExtractor._parse_feature_scores(output): feature/fused
+        # is always run with --binary
+        assert self.BINARY_OUTPUT_MAGIC in output, \
+            "Feature data possibly corrupt: {}".format(output[:1000])
+        return self._parse_binary_feature_scores(output)
+
+    def _get_feature_scores_from_mtx(self, scores_mtx, feature_names):
+        # override FeatureExtractor._get_feature_scores_from_mtx(scores_mtx,
+        # feature_names): pick the atom features of each component to run;
+        # the feature names of the components do not overlap
+        feature_result = {}
+        for fextractor in self._fextractors_to_run:
+            feature_result.update(fextractor._get_feature_scores_from_mtx(
+                scores_mtx, feature_names))
+        return feature_result
 
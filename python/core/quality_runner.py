@@ -1,7 +1,6 @@
 __copyright__ = "Copyright 2016, Netflix, Inc."
 __license__ = "Apache, Version 2.0"
 
-import sys
 import subprocess
 import re
 
@@ -11,7 +10,7 @@ import config
 from core.executor import Executor
 from core.result import Result
 from core.feature_assembler import FeatureAssembler
-from core.train_test_model import TrainTestModel
+from core.train_test_model import TrainTestModel, LibsvmnusvrTrainTestModel
 from core.feature_extractor import MomentFeatureExtractor
 
 
@@ -146,9 +145,6 @@ class VmafLegacyQualityRunner(QualityRunner):
                                      'VMAF_feature_ansnr_scores',
                                      'VMAF_feature_motion_scores']
 
-    sys.path.append(config.ROOT + "/libsvm/python")
-    import svmutil
-
     def _get_vmaf_feature_assembler_instance(self, asset):
         vmaf_fassembler = FeatureAssembler(
             feature_dict=self.FEATURE_ASSEMBLER_DICT,
@@ -172,45 +168,54 @@ class VmafLegacyQualityRunner(QualityRunner):
         vmaf_fassembler.run()
         feature_result = vmaf_fassembler.results[0]
 
-        # =====================================================================
-
-        # SVR predict
-        model = self.svmutil.svm_load_model(self.SVM_MODEL_FILE)
-
-        ordered_scaled_scores_list = []
-        for scores_key in self.SVM_MODEL_ORDERED_SCORES_KEYS:
-            scaled_scores = self._rescale(feature_result[scores_key],
-                                          self.FEATURE_RESCALE_DICT[scores_key])
-            ordered_scaled_scores_list.append(scaled_scores)
-
-        scores = []
-        for score_vector in zip(*ordered_scaled_scores_list):
-            vif, adm, ansnr, motion = score_vector
-            xs = [[vif, adm, ansnr, motion]]
-            score = self.svmutil.svm_predict([0], xs, model)[0][0]
-            score = self._post_correction(motion, score)
-            scores.append(score)
+        scores = self._predict_scores(feature_result, self.logger)
 
         result_dict = {}
         # add all feature result
         result_dict.update(feature_result.result_dict)
         # add quality score
-        result_dict[self.get_scores_key()] = scores
+        result_dict[self.get_scores_key()] = scores.tolist()
 
         return Result(asset, self.executor_id, result_dict)
 
-    def _post_correction(self, motion, score):
-        # post-SVM correction
-        if motion > 12.0:
-            val = motion
-            if val > 20.0:
-                val = 20
-            score *= ((val - 12) * 0.015 + 1)
-        if score > 100.0:
-            score = 100.0
-        elif score < 0.0:
-            score = 0.0
-        return score
+    @classmethod
+    def _load_model(cls, logger=None):
+        # SVM_MODEL_FILE is loaded once per process
+        return LibsvmnusvrTrainTestModel.from_raw_file_cached(
+            cls.SVM_MODEL_FILE,
+            {'feature_names': cls.SVM_MODEL_ORDERED_SCORES_KEYS,
+             'norm_type': 'none'},
+            logger)
+
+    @classmethod
+    def _predict_scores(cls, feature_result, logger=None):
+        """
+        SVR predict the per-frame scores of all frames at once, and apply
+        post-correction.
+        :param feature_result: Result (or dict) with per-frame scores of the
+        keys in SVM_MODEL_ORDERED_SCORES_KEYS
+        :param logger:
+        :return: array of per-frame scores
+        """
+        xs = {}
+        for scores_key in cls.SVM_MODEL_ORDERED_SCORES_KEYS:
+            xs[scores_key] = cls._rescale(feature_result[scores_key],
+                                          cls.FEATURE_RESCALE_DICT[scores_key])
+
+        model = cls._load_model(logger)
+        scores = model.predict(xs)
+
+        return cls._post_correction(xs['VMAF_feature_motion_scores'], scores)
+
+    @staticmethod
+    def _post_correction(motions, scores):
+        # post-SVM correction, on arrays of per-frame motions and scores
+        motions = np.asarray(motions, dtype=np.double)
+        scores = np.asarray(scores, dtype=np.double)
+        scores = np.where(motions > 12.0,
+                          scores * ((np.minimum(motions, 20.0) - 12) * 0.015 + 1),
+                          scores)
+        return np.clip(scores, 0.0, 100.0)
 
     @classmethod
     def _rescale(cls, vals, lower_upper_bound):
@@ -247,7 +252,81 @@ class VmafQualityRunner(QualityRunner):
 
     DEFAULT_FEATURE_DICT = {'VMAF_feature': ['vif', 'adm', 'motion', 'ansnr']}
 
+    # the FeatureExtractors evaluate the sampled frames, see
+    # _get_vmaf_feature_assembler_instance_for_assets
+    _supports_frame_sampling = True
+
+    def run(self):
+        """
+        With optional_dict={'batch_predict': True}, assemble the features of
+        all assets first, then predict the per-frame scores of all assets
+        with one TrainTestModel.predict_many() call, instead of one
+        TrainTestModel.predict() per asset in _run_on_asset.
+        :return:
+        """
+        if not self._batch_predict:
+            return super(VmafQualityRunner, self).run()
+
+        if self.logger:
+            self.logger.info(
+                "Assemble features of all assets and predict {type} scores "
+                "in one batch...".format(type=self.executor_id))
+
+        vmaf_fassembler = self._get_vmaf_feature_assembler_instance_for_assets(self.assets)
+        vmaf_fassembler.run()
+        feature_results = vmaf_fassembler.results
+
+        xs_list = map(TrainTestModel.get_perframe_xs_from_result, feature_results)
+
+        model = self._load_model()
+
+        ys_pred_list = model.predict_many(xs_list)
+
+        self.results = map(
+            lambda (asset, feature_result, ys_pred):
+                self._get_quality_result(asset, feature_result, model, ys_pred),
+            zip(self.assets, feature_results, ys_pred_list)
+        )
+
+    def iter_frames(self, asset):
+        """
+        Streaming counterpart of run() on one asset: yield the features and
+        the predicted score of each frame as soon as the FeatureExtractors
+        output it, e.g. to stop once a quality floor is violated:
+            for frame in runner.iter_frames(asset):
+                if frame[VmafQualityRunner.get_score_key()] < 40.0:
+                    break
+        Stopping the iteration stops the feature extraction (see
+        FeatureExtractor.iter_frames).
+        :param asset:
+        :return: generator of one dict per frame, in the format of
+        {score_key: score}
+        """
+        model = self._load_model()
+
+        vmaf_fassembler = self._get_vmaf_feature_assembler_instance(asset)
+        frames = vmaf_fassembler.iter_frames(asset)
+        try:
+            for frame in frames:
+                # xs of one frame
+                xs = {}
+                for score_key, score in frame.items():
+                    xs[score_key] = [score]
+                ys_pred = self.clip_score(model, model.predict(xs))
+                frame[self.get_score_key()] = ys_pred[0]
+                yield frame
+        finally:
+            frames.close()
+
+    @property
+    def _batch_predict(self):
+        return self.optional_dict is not None \
+               and self.optional_dict.get('batch_predict', False)
+
     def _get_vmaf_feature_assembler_instance(self, asset):
+        return self._get_vmaf_feature_assembler_instance_for_assets([asset])
+
+    def _get_vmaf_feature_assembler_instance_for_assets(self, assets):
 
         # load TrainTestModel only to retrieve its 'feature_dict' extra info
         model = self._load_model()
@@ -255,14 +334,38 @@ class VmafQualityRunner(QualityRunner):
         if feature_dict is None:
             feature_dict = self.DEFAULT_FEATURE_DICT
 
+        fextractor_optional_dict = {}
+        # share reference workfiles across assets, see RefWorkfileCache
+        if self._ref_workfile_cache is not None:
+            fextractor_optional_dict['ref_workfile_cache'] = \
+                self._ref_workfile_cache
+        # share reference features across assets, see RefFeatureCache
+        if self.optional_dict is not None \
+                and self.optional_dict.get('ref_feature_cache') is not None:
+            fextractor_optional_dict['ref_feature_cache'] = \
+                self.optional_dict['ref_feature_cache']
+        # evaluate the sampled frames only, see Executor
+        if self._frame_sampling is not None:
+            for key in ['frame_sampling', 'frame_sampling_type']:
+                if key in self.optional_dict:
+                    fextractor_optional_dict[key] = self.optional_dict[key]
+        # split each asset into segments, and compute the frames of each on
+        # threads, at the same time, see VmafFeatureExtractor
+        for key in ['num_segments', 'num_threads']:
+            if self.optional_dict is not None and key in self.optional_dict:
+                fextractor_optional_dict[key] = self.optional_dict[key]
+        if not fextractor_optional_dict:
+            fextractor_optional_dict = None
+
         vmaf_fassembler = FeatureAssembler(
             feature_dict=feature_dict,
             feature_option_dict=None,
-            assets=[asset],
+            assets=assets,
             logger=self.logger,
             fifo_mode=self.fifo_mode,
             delete_workdir=self.delete_workdir,
-            result_store=self.result_store
+            result_store=self.result_store,
+            optional_dict=fextractor_optional_dict,
         )
         return vmaf_fassembler
 
@@ -283,6 +386,10 @@ class VmafQualityRunner(QualityRunner):
 
         ys_pred = model.predict(xs)
 
+        return self._get_quality_result(asset, feature_result, model, ys_pred)
+
+    def _get_quality_result(self, asset, feature_result, model, ys_pred):
+
         # 'score_clip'
         ys_pred = self.clip_score(model, ys_pred)
 
@@ -353,7 +460,9 @@ class VmafQualityRunner(QualityRunner):
                 and self.optional_dict['model_filepath'] is not None
                 ) \
             else self.DEFAULT_MODEL_FILEPATH
-        model = TrainTestModel.from_file(model_filepath, self.logger)
+        # shared across assets and runs; the model file is only re-read if
+        # it changes
+        model = TrainTestModel.from_file_cached(model_filepath, self.logger)
         return model
 
     def _remove_result(self, asset):
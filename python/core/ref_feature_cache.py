@@ -0,0 +1,119 @@
+__copyright__ = "Copyright 2016, Netflix, Inc."
+__license__ = "Apache, Version 2.0"
+
+import os
+import hashlib
+
+import numpy as np
+
+import config
+from tools.misc import make_parent_dirs_if_nonexist
+
+
+class RefFeatureCache(object):
+    """
+    On-disk cache of the features that depend on the reference video only
+    (the REF_ATOM_FEATURES of a FeatureExtractor, e.g. motion of
+    VMAF_feature), so that they are computed once per reference and reused by
+    all the assets sharing it, e.g. the distorted videos of one content in a
+    dataset. Pass it to a FeatureExtractor by optional_dict={
+    'ref_feature_cache': RefFeatureCache()}.
+
+    An entry is keyed by executor_id and by the reference as processed: ref
+    path, size and mtime of the ref file (so that an entry is invalidated
+    when the file changes), ref and quality resolution, yuv_type,
+    resampling_type, scaler and ref frame range. It is stored in numpy's .npz
+    format, one float64 array per scores_key.
+    """
+
+    def __init__(self,
+                 logger=None,
+                 cache_dir=config.ROOT + "/workspace/ref_feature_cache"
+                 ):
+        self.logger = logger
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def get_ref_key(asset):
+        """
+        Identify the reference of asset as processed by a FeatureExtractor.
+        :param asset:
+        :return: string, same for all assets sharing the reference
+        """
+        ref_stat = os.stat(asset.ref_path)
+        return "{path}_{size}_{mtime}_{ref_wh}_{quality_wh}_{yuv_type}_" \
+               "{resampling_type}_{scaler}_{start_end}".format(
+            path=os.path.abspath(asset.ref_path),
+            size=ref_stat.st_size,
+            mtime=ref_stat.st_mtime,
+            ref_wh=asset.ref_width_height,
+            quality_wh=asset.quality_width_height,
+            yuv_type=asset.yuv_type,
+            resampling_type=asset.resampling_type,
+            scaler=asset.scaler,
+            start_end=asset.ref_start_end_frame,
+        )
+
+    def load(self, asset, executor_id):
+        """
+        :param asset:
+        :param executor_id:
+        :return: cached features of asset's reference, in the format of
+        {scores_key: scores}, or None if not cached
+        """
+        cache_file_path = self._get_cache_file_path(asset, executor_id)
+
+        if not os.path.isfile(cache_file_path):
+            return None
+
+        npz = np.load(cache_file_path)
+        try:
+            feature_result = {}
+            for scores_key in npz.files:
+                feature_result[scores_key] = npz[scores_key].tolist()
+        finally:
+            npz.close()
+
+        if self.logger:
+            self.logger.info("Reuse {id} reference features of {ref}.".format(
+                id=executor_id, ref=asset.ref_path))
+
+        return feature_result
+
+    def save(self, asset, executor_id, feature_result):
+        """
+        :param asset:
+        :param executor_id:
+        :param feature_result: features of asset's reference, in the format of
+        {scores_key: scores}
+        :return:
+        """
+        cache_file_path = self._get_cache_file_path(asset, executor_id)
+        make_parent_dirs_if_nonexist(cache_file_path)
+
+        arrays = {}
+        for scores_key in feature_result:
+            arrays[scores_key] = np.asarray(feature_result[scores_key],
+                                            dtype=np.float64)
+
+        # write to a temporary file first then rename, so that a concurrent
+        # reader never sees a partially written entry
+        tmp_file_path = "{path}.{pid}.tmp".format(path=cache_file_path,
+                                                  pid=os.getpid())
+        with open(tmp_file_path, "wb") as cache_file:
+            np.savez(cache_file, **arrays)
+        os.rename(tmp_file_path, cache_file_path)
+
+    def clean_up(self):
+        """
+        WARNING: REMOVE ENTIRE CACHE, USE WITH CAUTION!!!
+        :return:
+        """
+        import shutil
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def _get_cache_file_path(self, asset, executor_id):
+        return "{dir}/{executor_id}/{str}".format(
+            dir=self.cache_dir, executor_id=executor_id,
+            str=hashlib.sha1(self.get_ref_key(asset)).hexdigest())
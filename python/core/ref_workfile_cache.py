@@ -0,0 +1,262 @@
+__copyright__ = "Copyright 2016, Netflix, Inc."
+__license__ = "Apache, Version 2.0"
+
+import os
+import errno
+import fcntl
+import hashlib
+import uuid
+from contextlib import contextmanager
+
+import config
+from core.ref_feature_cache import RefFeatureCache
+
+
+class RefWorkfileCache(object):
+    """
+    Shared on-disk cache of reference workfiles, i.e. reference videos
+    converted to the quality resolution (see Executor._open_ref_workfile).
+    When several assets share a reference, e.g. the distorted videos of one
+    content encoded at different resolutions, the reference workfile is
+    produced once and then read by the executors of all of them, in the same
+    process or concurrent ones, instead of being produced per asset. Pass it
+    to an Executor by optional_dict={'ref_workfile_cache': RefWorkfileCache()}.
+
+    Only the references shared by at least two of the assets announced by
+    add_assets() are cached; the workfiles of one-off assets are produced as
+    usual (through a FIFO in fifo_mode). An entry is reference-counted by the
+    executors reading it (a holder file each, under a lock), and the least
+    recently used entries that are not held are evicted to keep the cache
+    within max_bytes.
+    """
+
+    LOCK_FILE_NAME = '.lock'
+
+    def __init__(self,
+                 logger=None,
+                 cache_dir=config.ROOT + "/workspace/ref_workfile_cache",
+                 max_bytes=8 * 1024 ** 3,
+                 ):
+        self.logger = logger
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        # ref key -> set of str(asset) of the assets using the reference
+        self._asset_strs_by_ref_key = {}
+
+    @staticmethod
+    def get_ref_key(asset):
+        # the reference workfile depends on the same properties of the
+        # reference as its features do
+        return RefFeatureCache.get_ref_key(asset)
+
+    def add_assets(self, assets):
+        """
+        Announce assets to be run, so that the references shared among them
+        are cached. Adding an asset more than once has no further effect.
+        :param assets:
+        :return:
+        """
+        for asset in assets:
+            if not os.path.exists(asset.ref_path):
+                continue
+            self._asset_strs_by_ref_key.setdefault(
+                self.get_ref_key(asset), set()).add(str(asset))
+
+    def is_shared(self, asset):
+        """
+        :param asset:
+        :return: whether asset's reference is shared by at least two of the
+        announced assets
+        """
+        if not os.path.exists(asset.ref_path):
+            return False
+        return len(self._asset_strs_by_ref_key.get(
+            self.get_ref_key(asset), ())) >= 2
+
+    def acquire(self, asset, generate_ref_workfile):
+        """
+        Get the cached reference workfile of asset, producing it first if not
+        cached, and hold it until release() is called with the returned
+        holder, so that it is not evicted while in use.
+        :param asset:
+        :param generate_ref_workfile: function writing asset's reference
+        workfile to the path passed in
+        :return: (path of the cached reference workfile, holder)
+        """
+        entry_path = self._get_entry_path(asset)
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+        # the per-entry lock makes concurrent executors needing the same
+        # reference wait for the one producing it
+        with self._lock(entry_path + self.LOCK_FILE_NAME):
+            produced = False
+            if not os.path.exists(entry_path):
+                tmp_path = "{path}.{pid}.tmp".format(path=entry_path,
+                                                     pid=os.getpid())
+                try:
+                    generate_ref_workfile(asset, tmp_path)
+                    os.rename(tmp_path, entry_path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                produced = True
+                if self.logger:
+                    self.logger.info("Cache reference workfile of {ref} at "
+                                     "{path}.".format(ref=asset.ref_path,
+                                                      path=entry_path))
+            elif self.logger:
+                self.logger.info("Reuse cached reference workfile of {ref} at "
+                                 "{path}.".format(ref=asset.ref_path,
+                                                  path=entry_path))
+
+            with self._lock(os.path.join(self.cache_dir, self.LOCK_FILE_NAME)):
+                holder = self._add_holder(entry_path)
+                # mark as recently used
+                os.utime(entry_path, None)
+                if produced:
+                    self._evict()
+
+        return entry_path, holder
+
+    def release(self, holder):
+        """
+        Stop holding a reference workfile returned by acquire(), which makes
+        it evictable.
+        :param holder:
+        :return:
+        """
+        with self._lock(os.path.join(self.cache_dir, self.LOCK_FILE_NAME)):
+            if os.path.exists(holder):
+                os.remove(holder)
+            self._evict()
+
+    def clean_up(self):
+        """
+        WARNING: REMOVE ENTIRE CACHE, USE WITH CAUTION!!!
+        :return:
+        """
+        import shutil
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def _get_entry_path(self, asset):
+        return "{dir}/{str}".format(
+            dir=self.cache_dir,
+            str=hashlib.sha1(self.get_ref_key(asset)).hexdigest())
+
+    @staticmethod
+    def _get_holders_dir(entry_path):
+        return entry_path + '.holders'
+
+    def _add_holder(self, entry_path):
+        holders_dir = self._get_holders_dir(entry_path)
+        if not os.path.isdir(holders_dir):
+            os.makedirs(holders_dir)
+        holder = "{dir}/{pid}_{uuid}".format(dir=holders_dir, pid=os.getpid(),
+                                             uuid=str(uuid.uuid4()))
+        open(holder, 'w').close()
+        return holder
+
+    def _is_held(self, entry_path):
+        # held if any holder process is alive; holders left behind by
+        # processes that died without releasing are discarded
+        holders_dir = self._get_holders_dir(entry_path)
+        if not os.path.isdir(holders_dir):
+            return False
+        held = False
+        for holder_name in os.listdir(holders_dir):
+            pid = int(holder_name.split('_')[0])
+            if self._is_process_alive(pid):
+                held = True
+            else:
+                os.remove(os.path.join(holders_dir, holder_name))
+        return held
+
+    @staticmethod
+    def _is_process_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except OSError as e:
+            return e.errno == errno.EPERM
+        return True
+
+    def _evict(self):
+        # remove least recently used entries not held until the cache fits
+        # within max_bytes (entries held may keep it above)
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if '.' in name or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if self._is_held(path):
+                continue
+            # if another executor holds the per-entry lock, it is in acquire(),
+            # about to hold the entry
+            with self._lock(path + self.LOCK_FILE_NAME, blocking=False) \
+                    as locked:
+                if not locked:
+                    continue
+                os.remove(path)
+                holders_dir = self._get_holders_dir(path)
+                if os.path.isdir(holders_dir):
+                    os.rmdir(holders_dir)
+                # executors waiting for the lock file removed lock a new one,
+                # see _lock
+                os.remove(path + self.LOCK_FILE_NAME)
+            total_bytes -= size
+            if self.logger:
+                self.logger.info("Evict cached reference workfile {path}.".
+                                 format(path=path))
+
+    @staticmethod
+    @contextmanager
+    def _lock(lock_file_path, blocking=True):
+        # yield whether the lock is taken, which it always is if blocking.
+        # The per-entry lock file is removed along with its entry by _evict(),
+        # possibly while others wait for it: the lock is retaken on the file
+        # at lock_file_path, if it is not the one locked.
+        while True:
+            lock_file = open(lock_file_path, 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if blocking
+                            else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError as e:
+                lock_file.close()
+                if not blocking and e.errno in (errno.EAGAIN, errno.EACCES):
+                    lock_file = None
+                    break
+                raise
+            try:
+                locked_stat = os.fstat(lock_file.fileno())
+                path_stat = os.stat(lock_file_path)
+                if (locked_stat.st_dev, locked_stat.st_ino) == \
+                        (path_stat.st_dev, path_stat.st_ino):
+                    break
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    lock_file.close()
+                    raise
+            # closing the file releases the lock
+            lock_file.close()
+
+        if lock_file is None:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
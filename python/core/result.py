@@ -60,6 +60,15 @@ class BasicResult(object):
         list_scores_key = self._get_ordered_list_scores_key()
         return map(lambda scores_key: scores_key[:-1], list_scores_key)
 
+    def get_perframe_score_dicts(self):
+        # e.g. [{'VMAF_score': 90.1, 'VMAF_vif_score': 0.98}, ...], one dict
+        # per frame
+        list_scores_key = self._get_ordered_list_scores_key()
+        list_score_key = self.get_ordered_list_score_key()
+        list_scores = map(lambda key: self.result_dict[key], list_scores_key)
+        return map(lambda scores: dict(zip(list_score_key, scores)),
+                   zip(*list_scores))
+
     def _get_perframe_score_str(self):
         list_scores_key = self._get_ordered_list_scores_key()
         list_score_key = self.get_ordered_list_score_key()
@@ -2,25 +2,224 @@ __copyright__ = "Copyright 2016, Netflix, Inc."
 __license__ = "Apache, Version 2.0"
 
 import os
+import sys
 import hashlib
+import sqlite3
+from collections import OrderedDict
+from contextlib import closing
+
+import numpy as np
 
 import config
+from core.asset import Asset
 from core.result import Result
-from tools.misc import make_parent_dirs_if_nonexist
+from tools.misc import make_parent_dirs_if_nonexist, \
+    get_dir_without_last_slash, get_file_name_with_extension
 
 
 class ResultStore(object):
     """
     Provide capability to save and load a Result.
     """
-    pass
+
+    def load_many(self, assets, executor_id):
+        """
+        Load results of a list of assets generated by the same executor.
+        Derived class should override it if the results can be fetched in a
+        more efficient way than one load() per asset.
+        :param assets:
+        :param executor_id:
+        :return: list of Results in the same order of assets, with None for
+        an asset whose result is not in the store.
+        """
+        return map(lambda asset: self.load(asset, executor_id), assets)
+
+    def save_many(self, results):
+        """
+        Save a list of results. Derived class should override it if the
+        results can be persisted in a more efficient way than one save() per
+        result.
+        :param results:
+        :return:
+        """
+        for result in results:
+            self.save(result)
 
 
 class SqliteResultStore(ResultStore):
     """
-    persist result by a SQLite engine that save/load result.
+    persist result by a SQLite engine that save/load result. All results live
+    in a single database file. Each result is a row in table 'result', indexed
+    by (executor_id, dataset, content_id, asset_hash), where asset_hash is
+    the SHA1 of str(asset), same as what FileSystemResultStore uses as file
+    name. Each per-unit score list of a result is a row in table 'scores',
+    packed as a binary blob of float64, so that no text parsing is involved
+    when loading.
     """
-    pass
+
+    SCORES_DTYPE = '<f8'
+
+    def __init__(self,
+                 logger=None,
+                 result_store_dir=config.ROOT +
+                                "/workspace/result_store_dir/sqlite_result_store"
+                 ):
+        self.logger = logger
+        self.result_store_dir = result_store_dir
+
+    @property
+    def db_path(self):
+        return "{dir}/result_store.db".format(dir=self.result_store_dir)
+
+    # max number of assets per query in load_many, to stay under SQLite's
+    # limit on number of host parameters in one statement
+    MAX_ASSETS_PER_QUERY = 500
+
+    def save(self, result):
+        self.save_many([result])
+
+    def save_many(self, results):
+        # all results are saved in one transaction
+        with closing(self._connect()) as conn:
+            with conn:
+                for result in results:
+                    self._insert_result(conn, result)
+
+    def load(self, asset, executor_id):
+        if not os.path.isfile(self.db_path):
+            return None
+
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT id, asset FROM result WHERE executor_id = ? AND "
+                "dataset = ? AND content_id = ? AND asset_hash = ?",
+                (executor_id, asset.dataset, str(asset.content_id),
+                 self._get_asset_hash(asset))).fetchone()
+            if row is None:
+                return None
+            result_id, asset_repr = row
+            result_dict = {}
+            for scores_key, scores in conn.execute(
+                    "SELECT scores_key, scores FROM scores WHERE result_id = ?",
+                    (result_id,)):
+                result_dict[scores_key] = self._unpack_scores(scores)
+
+        return Result(Asset.from_repr(asset_repr), executor_id, result_dict)
+
+    def load_many(self, assets, executor_id):
+        if not os.path.isfile(self.db_path):
+            return [None for _ in assets]
+
+        keys = map(lambda asset: (asset.dataset, str(asset.content_id),
+                                  self._get_asset_hash(asset)), assets)
+
+        asset_reprs = {}
+        result_dicts = {}
+        with closing(self._connect()) as conn:
+            for i in range(0, len(keys), self.MAX_ASSETS_PER_QUERY):
+                asset_hashes = list(set(map(
+                    lambda key: key[2], keys[i:i + self.MAX_ASSETS_PER_QUERY])))
+                rows = conn.execute(
+                    "SELECT result.dataset, result.content_id, "
+                    "result.asset_hash, result.asset, "
+                    "scores.scores_key, scores.scores "
+                    "FROM result JOIN scores ON scores.result_id = result.id "
+                    "WHERE result.executor_id = ? AND result.asset_hash IN "
+                    "({})".format(", ".join("?" * len(asset_hashes))),
+                    [executor_id] + asset_hashes)
+                for dataset, content_id, asset_hash, asset_repr, \
+                        scores_key, scores in rows:
+                    key = (dataset, content_id, asset_hash)
+                    asset_reprs[key] = asset_repr
+                    result_dicts.setdefault(key, {})[scores_key] = \
+                        self._unpack_scores(scores)
+
+        results = []
+        for key in keys:
+            if key in result_dicts:
+                results.append(Result(Asset.from_repr(asset_reprs[key]),
+                                      executor_id, result_dicts[key]))
+            else:
+                results.append(None)
+        return results
+
+    def delete(self, asset, executor_id):
+        if not os.path.isfile(self.db_path):
+            return
+        with closing(self._connect()) as conn:
+            with conn:
+                self._delete_result_row(conn, asset, executor_id)
+
+    def clean_up(self):
+        """
+        WARNING: RMOVE ENTIRE RESULT STORE, USE WITH CAUTION!!!
+        :return:
+        """
+        import shutil
+        if os.path.isdir(self.result_store_dir):
+            shutil.rmtree(self.result_store_dir)
+
+    def _connect(self):
+        # open a new connection per operation rather than holding one, so that
+        # the store can be pickled and shipped to parallel workers
+        make_parent_dirs_if_nonexist(self.db_path)
+        conn = sqlite3.connect(self.db_path, timeout=60.0)
+        conn.text_factory = str
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS result ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "executor_id TEXT NOT NULL, "
+            "dataset TEXT NOT NULL, "
+            "content_id TEXT NOT NULL, "
+            "asset_hash TEXT NOT NULL, "
+            "asset TEXT NOT NULL, "
+            "UNIQUE (executor_id, dataset, content_id, asset_hash))")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "result_id INTEGER NOT NULL "
+            "REFERENCES result (id) ON DELETE CASCADE, "
+            "scores_key TEXT NOT NULL, "
+            "scores BLOB NOT NULL, "
+            "PRIMARY KEY (result_id, scores_key))")
+        return conn
+
+    def _insert_result(self, conn, result):
+        asset = result.asset
+        self._delete_result_row(conn, asset, result.executor_id)
+        cursor = conn.execute(
+            "INSERT INTO result "
+            "(executor_id, dataset, content_id, asset_hash, asset) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (result.executor_id, asset.dataset, str(asset.content_id),
+             self._get_asset_hash(asset), repr(asset)))
+        result_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO scores (result_id, scores_key, scores) "
+            "VALUES (?, ?, ?)",
+            [(result_id, scores_key,
+              self._pack_scores(result.result_dict[scores_key]))
+             for scores_key in result._get_ordered_list_scores_key()])
+
+    def _delete_result_row(self, conn, asset, executor_id):
+        conn.execute(
+            "DELETE FROM result WHERE executor_id = ? AND dataset = ? AND "
+            "content_id = ? AND asset_hash = ?",
+            (executor_id, asset.dataset, str(asset.content_id),
+             self._get_asset_hash(asset)))
+
+    @staticmethod
+    def _get_asset_hash(asset):
+        return hashlib.sha1(str(asset)).hexdigest()
+
+    @classmethod
+    def _pack_scores(cls, scores):
+        return sqlite3.Binary(
+            np.asarray(scores, dtype=cls.SCORES_DTYPE).tostring())
+
+    @classmethod
+    def _unpack_scores(cls, blob):
+        return np.frombuffer(blob, dtype=cls.SCORES_DTYPE).tolist()
 
 
 class FileSystemResultStore(ResultStore):
@@ -29,9 +228,20 @@ class FileSystemResultStore(ResultStore):
     The directory has multiple subdirectories, each corresponding to an Executor
     (e.g. a VMAF feature extractor, or a NO19 feature extractor, or a
     VMAF quality runner, or a SSIM quality runner). Each subdirectory contains
-    multiple files, each file stores dataframe for an asset, and has file name
-    str(asset).
+    multiple files, each file stores result for an asset, and has file name
+    SHA1 of str(asset).
+
+    Results are saved in numpy's binary .npz format: one float64 array per
+    scores_key, plus the asset repr and executor_id as metadata. Files written
+    by earlier versions (text of a stringified dataframe dict) can still be
+    loaded; the format is told apart by the file's leading bytes.
     """
+
+    NPZ_MAGIC = 'PK\x03\x04' # .npz is a zip archive
+
+    ASSET_ENTRY = '__asset__'
+    EXECUTOR_ID_ENTRY = '__executor_id__'
+
     def __init__(self,
                  logger=None,
                  result_store_dir=config.ROOT +
@@ -43,22 +253,77 @@ class FileSystemResultStore(ResultStore):
     def save(self, result):
         result_file_path = self._get_result_file_path(result)
         make_parent_dirs_if_nonexist(result_file_path)
-        with open(result_file_path, "wt") as result_file:
-            result_file.write(str(result.to_dataframe().to_dict()))
+
+        arrays = {self.ASSET_ENTRY: np.array(repr(result.asset)),
+                  self.EXECUTOR_ID_ENTRY: np.array(result.executor_id)}
+        for scores_key in result._get_ordered_list_scores_key():
+            arrays[scores_key] = np.asarray(result.result_dict[scores_key],
+                                            dtype=np.float64)
+
+        # write to a temporary file first then rename, so that a concurrent
+        # reader never sees a partially written result
+        tmp_file_path = "{path}.{pid}.tmp".format(path=result_file_path,
+                                                  pid=os.getpid())
+        with open(tmp_file_path, "wb") as result_file:
+            np.savez(result_file, **arrays)
+        os.rename(tmp_file_path, result_file_path)
 
     def load(self, asset, executor_id):
-        import pandas as pd
-        import ast
         result_file_path = self._get_result_file_path2(asset, executor_id)
 
         if not os.path.isfile(result_file_path):
             return None
 
-        with open(result_file_path, "rt") as result_file:
-            df = pd.DataFrame.from_dict(ast.literal_eval(result_file.read()))
-            result = Result.from_dataframe(df)
+        with open(result_file_path, "rb") as result_file:
+            magic = result_file.read(len(self.NPZ_MAGIC))
+            result_file.seek(0)
+            if magic == self.NPZ_MAGIC:
+                result = self._load_npz(result_file)
+            else:
+                result = self._load_legacy_text(result_file)
         return result
 
+    def load_many(self, assets, executor_id):
+        # list each result subdirectory once, instead of probing the file of
+        # every asset; only files known to exist are opened
+        existing_file_names_dict = {}
+        results = []
+        for asset in assets:
+            result_file_path = self._get_result_file_path2(asset, executor_id)
+            result_dir = get_dir_without_last_slash(result_file_path)
+            if result_dir not in existing_file_names_dict:
+                existing_file_names_dict[result_dir] = \
+                    set(os.listdir(result_dir)) if os.path.isdir(result_dir) \
+                    else set()
+            if get_file_name_with_extension(result_file_path) \
+                    in existing_file_names_dict[result_dir]:
+                results.append(self.load(asset, executor_id))
+            else:
+                results.append(None)
+        return results
+
+    @classmethod
+    def _load_npz(cls, result_file):
+        npz = np.load(result_file)
+        try:
+            asset = Asset.from_repr(str(npz[cls.ASSET_ENTRY]))
+            executor_id = str(npz[cls.EXECUTOR_ID_ENTRY])
+            result_dict = {}
+            for scores_key in npz.files:
+                if scores_key in (cls.ASSET_ENTRY, cls.EXECUTOR_ID_ENTRY):
+                    continue
+                result_dict[scores_key] = npz[scores_key].tolist()
+        finally:
+            npz.close()
+        return Result(asset, executor_id, result_dict)
+
+    @staticmethod
+    def _load_legacy_text(result_file):
+        import pandas as pd
+        import ast
+        df = pd.DataFrame.from_dict(ast.literal_eval(result_file.read()))
+        return Result.from_dataframe(df)
+
     def delete(self, asset, executor_id):
         result_file_path = self._get_result_file_path2(asset, executor_id)
         if os.path.isfile(result_file_path):
@@ -96,3 +361,144 @@ class FileSystemResultStore(ResultStore):
             return "{dir}/{executor_id}/{str}".format(
                 dir=self.result_store_dir, executor_id=executor_id,
                 str=str(asset))
+
+
+class CachingResultStore(ResultStore):
+    """
+    Keep decoded Results in memory in front of any other ResultStore (the
+    backing store), such that repeated load of the same result within one
+    process (e.g. VMAF_feature result loaded by a VmafQualityRunner across
+    runs of cross validation) does not go to disk again. The cache is an LRU
+    bounded by max_bytes, an estimate of memory taken by the cached scores.
+    save is write-through; delete and clean_up invalidate the cache before
+    forwarding to the backing store.
+    """
+
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+    def __init__(self, backing_store, max_bytes=DEFAULT_MAX_BYTES, logger=None):
+        assert max_bytes >= 0
+        self.backing_store = backing_store
+        self.max_bytes = max_bytes
+        self.logger = logger
+
+        self._cache = OrderedDict() # key -> (result, nbytes)
+        self.current_bytes = 0
+
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_evictions = 0
+
+    def __getstate__(self):
+        # when shipped to a parallel worker, don't pickle the cached results
+        # along; each process warms up its own cache
+        state = self.__dict__.copy()
+        state['_cache'] = OrderedDict()
+        state['current_bytes'] = 0
+        return state
+
+    def save(self, result):
+        self.backing_store.save(result)
+        self._put(result)
+
+    def load(self, asset, executor_id):
+        result = self._get(self._get_key(asset, executor_id))
+        if result is not None:
+            return result
+
+        result = self.backing_store.load(asset, executor_id)
+        if result is not None:
+            self._put(result)
+        return result
+
+    def load_many(self, assets, executor_id):
+        results = []
+        missed_idxs = []
+        for idx, asset in enumerate(assets):
+            result = self._get(self._get_key(asset, executor_id))
+            results.append(result)
+            if result is None:
+                missed_idxs.append(idx)
+
+        if missed_idxs:
+            loaded_results = self.backing_store.load_many(
+                map(lambda idx: assets[idx], missed_idxs), executor_id)
+            for idx, result in zip(missed_idxs, loaded_results):
+                if result is not None:
+                    self._put(result)
+                results[idx] = result
+
+        return results
+
+    def save_many(self, results):
+        self.backing_store.save_many(results)
+        for result in results:
+            self._put(result)
+
+    def delete(self, asset, executor_id):
+        self._invalidate(self._get_key(asset, executor_id))
+        self.backing_store.delete(asset, executor_id)
+
+    def clean_up(self):
+        """
+        WARNING: RMOVE ENTIRE RESULT STORE, USE WITH CAUTION!!!
+        :return:
+        """
+        self._cache.clear()
+        self.current_bytes = 0
+        self.backing_store.clean_up()
+
+    def _get(self, key):
+        if key not in self._cache:
+            self.num_misses += 1
+            return None
+        # move to most recently used end
+        result, nbytes = self._cache.pop(key)
+        self._cache[key] = (result, nbytes)
+        self.num_hits += 1
+        return self._copy_result(result)
+
+    def _put(self, result):
+        key = self._get_key(result.asset, result.executor_id)
+        self._invalidate(key)
+
+        nbytes = self._get_result_nbytes(result)
+        if nbytes > self.max_bytes:
+            # never going to fit, don't flush the whole cache for it
+            return
+
+        self._cache[key] = (self._copy_result(result), nbytes)
+        self.current_bytes += nbytes
+
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted_nbytes) = self._cache.popitem(last=False)
+            self.current_bytes -= evicted_nbytes
+            self.num_evictions += 1
+
+    def _invalidate(self, key):
+        if key in self._cache:
+            _, nbytes = self._cache.pop(key)
+            self.current_bytes -= nbytes
+
+    @staticmethod
+    def _get_key(asset, executor_id):
+        return executor_id, asset.to_normalized_repr()
+
+    @staticmethod
+    def _copy_result(result):
+        # Executor._post_process_result adds derived scores into result_dict
+        # in place, so never hand out (or keep) the dict the caller holds
+        return Result(result.asset, result.executor_id,
+                      dict(result.result_dict))
+
+    @staticmethod
+    def _get_result_nbytes(result):
+        nbytes = sys.getsizeof(repr(result.asset))
+        float_nbytes = sys.getsizeof(0.0)
+        for scores_key, scores in result.result_dict.items():
+            nbytes += sys.getsizeof(scores_key) + sys.getsizeof(scores)
+            try:
+                nbytes += len(scores) * float_nbytes
+            except TypeError:
+                pass
+        return nbytes
@@ -4,6 +4,7 @@ __license__ = "Apache, Version 2.0"
 import os
 import sys
 import pickle
+import threading
 
 import scipy.stats
 import numpy as np
@@ -160,10 +161,75 @@ class TrainTestModel(TypeVersionEnabled):
 
         return train_test_model
 
+    # process-wide registry of models loaded by from_file_cached (and
+    # LibsvmnusvrTrainTestModel.from_raw_file_cached), mapping (path, how it
+    # was loaded) to ((mtime, size) of the model files, TrainTestModel)
+    _file_cache = {}
+    _file_cache_lock = threading.Lock()
+
+    @staticmethod
+    def _get_file_cache_stamp(filename):
+        # (mtime, size) of filename, and of its libsvm companion .model file
+        # if any, such that rewriting either of them invalidates the entry
+        stamp = ()
+        for path in [filename, filename + '.model']:
+            if os.path.exists(path):
+                st = os.stat(path)
+                stamp += (st.st_mtime, st.st_size)
+        return stamp
+
+    @classmethod
+    def _load_file_cached(cls, filename, load_key, load_func):
+        path = os.path.abspath(filename)
+        stamp = cls._get_file_cache_stamp(path)
+        with cls._file_cache_lock:
+            entry = TrainTestModel._file_cache.get((path, load_key))
+            if entry is not None and entry[0] == stamp:
+                return entry[1]
+
+        train_test_model = load_func()
+
+        with cls._file_cache_lock:
+            TrainTestModel._file_cache[(path, load_key)] = (stamp, train_test_model)
+        return train_test_model
+
+    @classmethod
+    def from_file_cached(cls, filename, logger):
+        """
+        Same as from_file, but each model file is loaded only once per
+        process: the loaded TrainTestModel is kept in a registry keyed by the
+        file's path, mtime and size, and the same instance is handed out as
+        long as the file is unchanged. The returned instance is shared, so
+        treat it as read-only (e.g. do not append_info() on it).
+        :param filename:
+        :param logger:
+        :return:
+        """
+        return cls._load_file_cached(
+            filename, None, lambda: TrainTestModel.from_file(filename, logger))
+
+    @classmethod
+    def invalidate_file_cache(cls, filename=None):
+        """
+        Drop the models loaded from filename (or all models if None) from the
+        registry of from_file_cached.
+        :param filename:
+        :return:
+        """
+        with cls._file_cache_lock:
+            if filename is None:
+                TrainTestModel._file_cache.clear()
+            else:
+                path = os.path.abspath(filename)
+                for key in TrainTestModel._file_cache.keys():
+                    if key[0] == path:
+                        del TrainTestModel._file_cache[key]
+
     @staticmethod
     def delete(filename):
         if os.path.exists(filename):
             os.remove(filename)
+        TrainTestModel.invalidate_file_cache(filename)
 
     @staticmethod
     def _predict(model, xs_2d):
@@ -174,16 +240,37 @@ class TrainTestModel(TypeVersionEnabled):
 
         self._assert_trained()
 
+        xs_2d = self._get_xs_2d(xs)
+
+        return self._predict_xs_2d(xs_2d)
+
+    def predict_many(self, xs_list):
+        """
+        Predict on multiple xs (e.g. the per-frame xs of many assets) at once:
+        they are concatenated into one matrix, which is normalized and
+        predicted in one go, and the predictions split back.
+        :param xs_list: list of xs, each in the format taken by predict()
+        :return: list of ys_label_pred, one per xs
+        """
+
+        self._assert_trained()
+
+        if len(xs_list) == 0:
+            return []
+
+        xs_2d_list = map(self._get_xs_2d, xs_list)
+        ys_label_pred = self._predict_xs_2d(np.vstack(xs_2d_list))
+
+        split_indices = np.cumsum(map(len, xs_2d_list))[:-1]
+        return np.split(ys_label_pred, split_indices)
+
+    def _get_xs_2d(self, xs):
+        # one column per feature, in the order of feature_names
         for name in self.feature_names:
             assert name in xs
+        return np.column_stack([xs[name] for name in self.feature_names])
 
-        xs_2d = None
-        for name in self.feature_names:
-            if xs_2d is None:
-                xs_2d = np.matrix(xs[name]).T
-            else:
-                xs_2d = np.hstack((xs_2d, np.matrix(xs[name]).T))
-        xs_2d = np.array(xs_2d)
+    def _predict_xs_2d(self, xs_2d):
 
         # normalize xs
         xs_2d = self.normalize_xs(xs_2d)
@@ -615,6 +702,7 @@ class LibsvmnusvrTrainTestModel(TrainTestModel):
 
         train_test_model = cls(param_dict={}, logger=logger)
 
+        train_test_model.model_type = cls.TYPE
         train_test_model.model_dict.update(additional_model_dict)
 
         model = cls.svmutil.svm_load_model(model_filename)
@@ -622,6 +710,22 @@ class LibsvmnusvrTrainTestModel(TrainTestModel):
 
         return train_test_model
 
+    @classmethod
+    def from_raw_file_cached(cls, model_filename, additional_model_dict, logger):
+        """
+        Same as from_raw_file, but loaded only once per process as long as
+        the file is unchanged, through the registry of
+        TrainTestModel.from_file_cached. The returned instance is shared, so
+        treat it as read-only.
+        :param model_filename:
+        :param additional_model_dict:
+        :param logger:
+        :return:
+        """
+        return cls._load_file_cached(
+            model_filename, ('raw', repr(sorted(additional_model_dict.items()))),
+            lambda: cls.from_raw_file(model_filename, additional_model_dict, logger))
+
     # override
     @staticmethod
     def delete(filename):
@@ -629,10 +733,26 @@ class LibsvmnusvrTrainTestModel(TrainTestModel):
             os.remove(filename)
         if os.path.exists(filename + '.model'):
             os.remove(filename + '.model')
+        TrainTestModel.invalidate_file_cache(filename)
+
+    # evaluate the SVR decision function of RBF and linear kernel models
+    # in NumPy over all samples at once, instead of svm_predict one sample
+    # at a time
+    USE_NUMPY_PREDICT = True
+
+    # bound on the size of the (samples x support vectors) kernel matrix of
+    # _predict_numpy, in number of elements
+    NUMPY_PREDICT_CHUNK_ELEMENTS = 1 << 22
 
     # override
     @classmethod
     def _predict(cls, model, xs_2d):
+        if cls.USE_NUMPY_PREDICT and cls._is_numpy_predictable(model):
+            return cls._predict_numpy(model, xs_2d)
+        return cls._predict_svmutil(model, xs_2d)
+
+    @classmethod
+    def _predict_svmutil(cls, model, xs_2d):
         f = list(xs_2d)
         for i, item in enumerate(f):
             f[i] = list(item)
@@ -640,6 +760,70 @@ class LibsvmnusvrTrainTestModel(TrainTestModel):
         ys_label_pred = np.array(score)
         return ys_label_pred
 
+    @classmethod
+    def _is_numpy_predictable(cls, model):
+        return model.get_svm_type() in [cls.svmutil.NU_SVR, cls.svmutil.EPSILON_SVR] \
+               and model.param.kernel_type in [cls.svmutil.RBF, cls.svmutil.LINEAR]
+
+    @staticmethod
+    def _get_svr_arrays(model):
+        """
+        Extract the support vectors (dense, one row per vector), their
+        coefficients and rho from an svm_model; done once per svm_model, the
+        arrays are kept on it.
+        """
+        svr_arrays = getattr(model, '_svr_arrays', None)
+        if svr_arrays is None:
+            # get_SV() gives sparse {index: value} dicts, 1-based and with
+            # the -1 terminator
+            sparse_svs = model.get_SV()
+            num_features = max([index for sparse_sv in sparse_svs
+                                for index in sparse_sv] + [0])
+            svs = np.zeros((len(sparse_svs), num_features))
+            for i, sparse_sv in enumerate(sparse_svs):
+                for index, value in sparse_sv.items():
+                    if index > 0:
+                        svs[i, index - 1] = value
+            sv_coefs = np.array([sv_coef[0] for sv_coef in model.get_sv_coef()],
+                                dtype=np.double)
+            rho = model.rho[0]
+            svr_arrays = (svs, sv_coefs, rho)
+            model._svr_arrays = svr_arrays
+        return svr_arrays
+
+    @classmethod
+    def _predict_numpy(cls, model, xs_2d):
+        """
+        Same as svm_predict on an RBF or linear kernel SVR model, i.e.
+        y = sum_i(sv_coef_i * K(sv_i, x)) - rho, for all rows x of xs_2d in a
+        few matrix operations.
+        """
+        svs, sv_coefs, rho = cls._get_svr_arrays(model)
+        xs_2d = np.array(xs_2d, dtype=np.double, ndmin=2)
+        num_samples, num_features = xs_2d.shape
+
+        # features absent from all support vectors are zeros in them
+        if svs.shape[1] < num_features:
+            svs = np.hstack((svs, np.zeros((svs.shape[0], num_features - svs.shape[1]))))
+        elif svs.shape[1] > num_features:
+            xs_2d = np.hstack((xs_2d, np.zeros((num_samples, svs.shape[1] - num_features))))
+
+        svs_sqnorms = (svs * svs).sum(axis=1)
+        ys_label_pred = np.empty(num_samples)
+        chunk_size = max(1, cls.NUMPY_PREDICT_CHUNK_ELEMENTS // max(len(svs), 1))
+        for start in range(0, num_samples, chunk_size):
+            xs_chunk = xs_2d[start:start + chunk_size]
+            kernels = np.dot(xs_chunk, svs.T)
+            if model.param.kernel_type == cls.svmutil.RBF:
+                # |x - sv|^2 = |x|^2 + |sv|^2 - 2 x.sv, clamped against
+                # rounding below zero
+                sqdists = (xs_chunk * xs_chunk).sum(axis=1)[:, np.newaxis] \
+                          + svs_sqnorms[np.newaxis, :] - 2.0 * kernels
+                np.maximum(sqdists, 0.0, out=sqdists)
+                kernels = np.exp(-model.param.gamma * sqdists)
+            ys_label_pred[start:start + chunk_size] = np.dot(kernels, sv_coefs) - rho
+        return ys_label_pred
+
     @classmethod
     def _train(cls, model_param, xys_2d):
         """
@@ -0,0 +1,123 @@
+__copyright__ = "Copyright 2016, Netflix, Inc."
+__license__ = "Apache, Version 2.0"
+
+import ctypes
+
+import numpy as np
+
+import config
+
+
+class VmafFeatureLib(object):
+    """
+    ctypes wrapper around the per-frame API of "vmaf all" exported by
+    feature/libvmaf.so (see feature/src/all.h). Build it with make under
+    feature/. Example:
+        with VmafFeatureLib(width, height, yuv_type) as lib:
+            for ref_y, dis_y in frames:
+                row = lib.push_frame(ref_y, dis_y)
+    where row holds one score per name in VmafFeatureLib.get_feature_names().
+    """
+
+    LIB_PATH = config.ROOT + "/feature/libvmaf.so"
+
+    # loaded once per process
+    _lib = None
+    _feature_names = None
+
+    @classmethod
+    def get_lib(cls):
+        if cls._lib is None:
+            lib = ctypes.CDLL(cls.LIB_PATH)
+            lib.vmaf_all_num_features.argtypes = []
+            lib.vmaf_all_num_features.restype = ctypes.c_int
+            lib.vmaf_all_feature_name.argtypes = [ctypes.c_int]
+            lib.vmaf_all_feature_name.restype = ctypes.c_char_p
+            lib.vmaf_all_open.argtypes = [ctypes.c_int, ctypes.c_int,
+                                          ctypes.c_char_p]
+            lib.vmaf_all_open.restype = ctypes.c_void_p
+            lib.vmaf_all_push_frame.argtypes = [
+                ctypes.c_void_p,
+                np.ctypeslib.ndpointer(dtype=np.float64, ndim=2, flags='C_CONTIGUOUS'),
+                np.ctypeslib.ndpointer(dtype=np.float64, ndim=2, flags='C_CONTIGUOUS'),
+                ctypes.c_int,
+                np.ctypeslib.ndpointer(dtype=np.float64, ndim=1, flags='C_CONTIGUOUS'),
+            ]
+            lib.vmaf_all_push_frame.restype = ctypes.c_int
+            lib.vmaf_all_push_prev_frame.argtypes = [
+                ctypes.c_void_p,
+                np.ctypeslib.ndpointer(dtype=np.float64, ndim=2, flags='C_CONTIGUOUS'),
+                ctypes.c_int,
+            ]
+            lib.vmaf_all_push_prev_frame.restype = ctypes.c_int
+            lib.vmaf_all_close.argtypes = [ctypes.c_void_p]
+            lib.vmaf_all_close.restype = None
+            cls._lib = lib
+        return cls._lib
+
+    @classmethod
+    def get_feature_names(cls):
+        if cls._feature_names is None:
+            lib = cls.get_lib()
+            cls._feature_names = [lib.vmaf_all_feature_name(i)
+                                  for i in range(lib.vmaf_all_num_features())]
+        return cls._feature_names
+
+    def __init__(self, width, height, yuv_type):
+        self.width = width
+        self.height = height
+        self.yuv_type = yuv_type
+        self._lib = self.get_lib()
+        self._num_features = len(self.get_feature_names())
+        self._ctx = self._lib.vmaf_all_open(width, height, yuv_type)
+        if not self._ctx:
+            raise RuntimeError(
+                "vmaf_all_open failed for {w}x{h} {yuv_type}.".format(
+                    w=width, h=height, yuv_type=yuv_type))
+
+    def close(self):
+        if self._ctx:
+            self._lib.vmaf_all_close(self._ctx)
+            self._ctx = None
+
+    # make VmafFeatureLib withable, e.g.:
+    # with VmafFeatureLib(...) as lib:
+    #     ...
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def push_frame(self, ref_y, dis_y):
+        """
+        Compute the features of the next frame.
+        :param ref_y: Y plane of the reference frame, as a height x width
+        array (in the scale of YuvReader, i.e. 10-bit divided by 4)
+        :param dis_y: Y plane of the distorted frame, same as ref_y
+        :return: array of scores, in the order of get_feature_names()
+        """
+        assert self._ctx, "VmafFeatureLib is already closed."
+        ref_y = np.ascontiguousarray(ref_y, dtype=np.float64)
+        dis_y = np.ascontiguousarray(dis_y, dtype=np.float64)
+        assert ref_y.shape == dis_y.shape == (self.height, self.width)
+        row = np.empty(self._num_features, dtype=np.float64)
+        ret = self._lib.vmaf_all_push_frame(
+            self._ctx, ref_y, dis_y, ref_y.strides[0], row)
+        if ret:
+            raise RuntimeError("vmaf_all_push_frame failed.")
+        return row
+
+    def push_prev_frame(self, ref_y):
+        """
+        Take a reference frame as the one preceding the next frame pushed, for
+        its motion, e.g. when skipping the frames in between.
+        :param ref_y: Y plane of the reference frame, same as in push_frame
+        :return:
+        """
+        assert self._ctx, "VmafFeatureLib is already closed."
+        ref_y = np.ascontiguousarray(ref_y, dtype=np.float64)
+        assert ref_y.shape == (self.height, self.width)
+        ret = self._lib.vmaf_all_push_prev_frame(
+            self._ctx, ref_y, ref_y.strides[0])
+        if ret:
+            raise RuntimeError("vmaf_all_push_prev_frame failed.")
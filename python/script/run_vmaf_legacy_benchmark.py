@@ -0,0 +1,73 @@
+__copyright__ = "Copyright 2016, Netflix, Inc."
+__license__ = "Apache, Version 2.0"
+
+import sys
+import time
+
+import numpy as np
+
+import config
+from core.quality_runner import VmafLegacyQualityRunner
+
+sys.path.append(config.ROOT + "/libsvm/python")
+import svmutil
+
+NUM_FRAMES = 10000
+
+
+def get_random_feature_result(num_frames):
+    # per-frame features spread over the ranges of FEATURE_RESCALE_DICT (and
+    # beyond, to exercise clipping and the motion correction)
+    rs = np.random.RandomState(0)
+    return {
+        'VMAF_feature_vif_scores': rs.uniform(0.0, 1.0, num_frames),
+        'VMAF_feature_adm_scores': rs.uniform(0.3, 1.0, num_frames),
+        'VMAF_feature_ansnr_scores': rs.uniform(5.0, 55.0, num_frames),
+        'VMAF_feature_motion_scores': rs.uniform(0.0, 25.0, num_frames),
+    }
+
+
+def predict_scores_per_frame(feature_result):
+    # scoring as done before VmafLegacyQualityRunner was vectorized: load the
+    # model, then svm_predict and post-correct one frame at a time
+    model = svmutil.svm_load_model(VmafLegacyQualityRunner.SVM_MODEL_FILE)
+
+    ordered_scaled_scores_list = []
+    for scores_key in VmafLegacyQualityRunner.SVM_MODEL_ORDERED_SCORES_KEYS:
+        ordered_scaled_scores_list.append(VmafLegacyQualityRunner._rescale(
+            feature_result[scores_key],
+            VmafLegacyQualityRunner.FEATURE_RESCALE_DICT[scores_key]))
+
+    scores = []
+    for vif, adm, ansnr, motion in zip(*ordered_scaled_scores_list):
+        score = svmutil.svm_predict([0], [[vif, adm, ansnr, motion]], model)[0][0]
+        if motion > 12.0:
+            score *= ((min(motion, 20.0) - 12) * 0.015 + 1)
+        scores.append(min(max(score, 0.0), 100.0))
+    return np.array(scores)
+
+
+if __name__ == '__main__':
+
+    feature_result = get_random_feature_result(NUM_FRAMES)
+
+    start = time.time()
+    scores_per_frame = predict_scores_per_frame(feature_result)
+    per_frame_sec = time.time() - start
+
+    # first call loads the model into the registry
+    start = time.time()
+    VmafLegacyQualityRunner._predict_scores(feature_result)
+    batch_cold_sec = time.time() - start
+
+    start = time.time()
+    scores_batch = VmafLegacyQualityRunner._predict_scores(feature_result)
+    batch_sec = time.time() - start
+
+    print "{n} frames, max abs score difference {diff:.3g}".format(
+        n=NUM_FRAMES, diff=np.abs(scores_batch - scores_per_frame).max())
+    for name, sec in [('per-frame svm_predict', per_frame_sec),
+                      ('batch (model loading)', batch_cold_sec),
+                      ('batch (model loaded)', batch_sec)]:
+        print "{name:24s}: {total:8.4f} sec total, {per_frame:8.3f} usec/frame".format(
+            name=name, total=sec, per_frame=sec / NUM_FRAMES * 1e6)
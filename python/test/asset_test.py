@@ -315,9 +315,39 @@ class AssetTest(unittest.TestCase):
                       ref_path="", dis_path="",
                       asset_dict={'fps':24, 'start_sec':2, 'end_sec': 3,
                                   'resampling_type':'bicubic'})
+        self.assertEquals(asset.resampling_type, 'bicubic')
+
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      ref_path="", dis_path="",
+                      asset_dict={'fps':24, 'start_sec':2, 'end_sec': 3,
+                                  'resampling_type':'gauss'})
         with self.assertRaises(AssertionError):
             print asset.resampling_type
 
+    def test_scaler(self):
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      ref_path="dir/refvideo.yuv", dis_path="dir/disvideo.yuv",
+                      asset_dict={'width':720, 'height':480,
+                                  'quality_width':1920, 'quality_height':1080})
+        self.assertEquals(asset.scaler, 'ffmpeg')
+
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      ref_path="dir/refvideo.yuv", dis_path="dir/disvideo.yuv",
+                      asset_dict={'width':720, 'height':480,
+                                  'quality_width':1920, 'quality_height':1080,
+                                  'resampling_type':'bicubic', 'scaler':'numpy'})
+        self.assertEquals(asset.scaler, 'numpy')
+        self.assertEquals(
+            str(asset),
+            "test_0_0_refvideo_720x480_vs_disvideo_720x480_q_1920x1080_bicubic_numpy"
+        )
+
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      ref_path="", dis_path="",
+                      asset_dict={'scaler':'opencv'})
+        with self.assertRaises(AssertionError):
+            print asset.scaler
+
     def test_use_path_as_workpath(self):
         asset = Asset(dataset="test", content_id=0, asset_id=0,
                       ref_path="dir/refvideo.yuv", dis_path="dir/disvideo.yuv",
@@ -19,7 +19,7 @@ class FeatureAssemblerTest(unittest.TestCase):
 
     def test_get_fextractor_subclasses(self):
         fextractor_subclasses = FeatureExtractor.get_subclasses_recursively()
-        self.assertEquals(len(fextractor_subclasses), 5)
+        self.assertEquals(len(fextractor_subclasses), 6)
         self.assertTrue(VmafFeatureExtractor in fextractor_subclasses)
         self.assertTrue(MomentFeatureExtractor in fextractor_subclasses)
 
@@ -110,6 +110,159 @@ class FeatureAssemblerTest(unittest.TestCase):
         with self.assertRaises(KeyError):
             results[0]['VMAF_feature_adm_score']
 
+    def test_feature_assembler_multiple_types_with_num_workers(self):
+        print 'test on feature assembler with multiple feature types and num_workers...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        asset_original = Asset(dataset="test", content_id=0, asset_id=1,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=ref_path,
+                      asset_dict={'width':576, 'height':324})
+
+        self.fassembler = FeatureAssembler(
+            feature_dict = {'VMAF_feature':['vif', 'motion'],
+                            'PSNR_feature':'all',
+                            'SSIM_feature':['ssim']},
+            feature_option_dict = None,
+            assets = [asset, asset_original],
+            logger=None,
+            fifo_mode=True,
+            delete_workdir=True,
+            result_store=None,
+            parallelize=True,
+            num_workers=2,
+        )
+
+        self.fassembler.run()
+
+        results = self.fassembler.results
+
+        self.assertAlmostEqual(results[0]['VMAF_feature_vif_score'], 0.44455808333333313, places=4)
+        self.assertAlmostEqual(results[0]['VMAF_feature_motion_score'], 3.5916076041666667, places=4)
+        self.assertAlmostEqual(results[0]['PSNR_feature_psnr_score'], 30.755063979166664, places=4)
+        self.assertAlmostEqual(results[0]['SSIM_feature_ssim_score'], 0.86325137500000004, places=4)
+
+        self.assertAlmostEqual(results[1]['VMAF_feature_vif_score'], 1.0, places=4)
+        self.assertAlmostEqual(results[1]['VMAF_feature_motion_score'], 3.5916076041666667, places=4)
+        self.assertAlmostEqual(results[1]['PSNR_feature_psnr_score'], 60.0, places=4)
+        self.assertAlmostEqual(results[1]['SSIM_feature_ssim_score'], 1.0, places=4)
+
+    def test_feature_assembler_multiple_types_on_same_asset_with_workfiles(self):
+        print 'test on feature assembler with multiple feature types running on the same asset with workfiles...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324,
+                                  'quality_width':288, 'quality_height':162,
+                                  'scaler':'numpy'})
+
+        feature_dict = {'VMAF_feature':['vif', 'motion'],
+                        'Moment_feature':['ref1st', 'dis1st']}
+
+        # the (type, asset) pairs run at the same time, each opening its own
+        # FIFO workfiles
+        self.fassembler = FeatureAssembler(
+            feature_dict=feature_dict,
+            feature_option_dict=None,
+            assets=[asset],
+            logger=None,
+            fifo_mode=True,
+            delete_workdir=True,
+            result_store=None,
+            parallelize=True,
+            num_workers=2,
+        )
+        self.fassembler.run()
+        results = self.fassembler.results
+
+        fassembler_serial = FeatureAssembler(
+            feature_dict=feature_dict,
+            feature_option_dict=None,
+            assets=[asset],
+            logger=None,
+            fifo_mode=True,
+            delete_workdir=True,
+            result_store=None,
+            parallelize=False,
+        )
+        fassembler_serial.run()
+        results_serial = fassembler_serial.results
+
+        for score_key in ['VMAF_feature_vif_score', 'VMAF_feature_motion_score',
+                          'Moment_feature_ref1st_score',
+                          'Moment_feature_dis1st_score']:
+            self.assertAlmostEqual(results[0][score_key],
+                                   results_serial[0][score_key], places=10)
+
+    def test_feature_assembler_fuse(self):
+        print 'test on feature assembler with fused feature types...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        asset_original = Asset(dataset="test", content_id=0, asset_id=1,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=ref_path,
+                      asset_dict={'width':576, 'height':324})
+
+        feature_dict = {'VMAF_feature':['vif', 'motion'],
+                        'PSNR_feature':'all',
+                        'SSIM_feature':['ssim'],
+                        'Moment_feature':['ref1st']}
+
+        # VMAF_feature, PSNR_feature and SSIM_feature are computed by one
+        # FusedFeatureExtractor, Moment_feature on its own
+        self.fassembler = FeatureAssembler(
+            feature_dict=feature_dict,
+            feature_option_dict=None,
+            assets=[asset, asset_original],
+            logger=None,
+            fifo_mode=True,
+            delete_workdir=True,
+            result_store=None,
+            parallelize=True,
+            num_workers=2,
+            fuse=True,
+        )
+        self.fassembler.run()
+        results = self.fassembler.results
+
+        self.assertEquals(self.fassembler.type2results_dict['PSNR_feature'][0].executor_id,
+                          'PSNR_feature_V1.0')
+
+        self.assertAlmostEqual(results[0]['VMAF_feature_vif_score'], 0.44455808333333313, places=4)
+        self.assertAlmostEqual(results[0]['VMAF_feature_motion_score'], 3.5916076041666667, places=4)
+        self.assertAlmostEqual(results[0]['PSNR_feature_psnr_score'], 30.755063979166664, places=4)
+        self.assertAlmostEqual(results[0]['SSIM_feature_ssim_score'], 0.86325137500000004, places=4)
+        self.assertAlmostEqual(results[0]['Moment_feature_ref1st_score'], 59.788567297525134, places=4)
+
+        self.assertAlmostEqual(results[1]['VMAF_feature_vif_score'], 1.0, places=4)
+        self.assertAlmostEqual(results[1]['PSNR_feature_psnr_score'], 60.0, places=4)
+        self.assertAlmostEqual(results[1]['SSIM_feature_ssim_score'], 1.0, places=4)
+
+        # the frames streamed are the per-frame scores of run()
+        frames = list(self.fassembler.iter_frames(asset))
+        self.assertEquals(len(frames), len(results[0]['PSNR_feature_psnr_scores']))
+        for score_key in ['VMAF_feature_vif_score', 'PSNR_feature_psnr_score',
+                          'SSIM_feature_ssim_score',
+                          'Moment_feature_ref1st_score']:
+            self.assertEquals(map(lambda frame: frame[score_key], frames),
+                              results[0][score_key + 's'])
 
 
 if __name__ == '__main__':
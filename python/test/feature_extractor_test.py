@@ -5,12 +5,18 @@ import os
 import unittest
 import re
 
+import numpy as np
+
 import config
 from core.feature_extractor import VmafFeatureExtractor, MomentFeatureExtractor, \
-    PsnrFeatureExtractor, SsimFeatureExtractor, MsSsimFeatureExtractor
+    PsnrFeatureExtractor, SsimFeatureExtractor, MsSsimFeatureExtractor, \
+    FusedFeatureExtractor
 from core.asset import Asset
-from core.executor import run_executors_in_parallel
+from core.vmaf_feature_lib import VmafFeatureLib
+from core.executor import run_executors_in_parallel, ExecutorsFailedError
 from core.result_store import FileSystemResultStore
+from core.ref_feature_cache import RefFeatureCache
+from core.ref_workfile_cache import RefWorkfileCache
 
 
 class FeatureExtractorTest(unittest.TestCase):
@@ -27,6 +33,45 @@ class FeatureExtractorTest(unittest.TestCase):
         fextractor = VmafFeatureExtractor([asset], None)
         self.assertEquals(fextractor.executor_id, "VMAF_feature_V0.2.1")
 
+    def test_executor_id_with_frame_sampling(self):
+        asset = Asset(dataset="test", content_id=0, asset_id=1,
+                      ref_path="dir/refvideo.yuv", dis_path="dir/disvideo.yuv",
+                      asset_dict={})
+        fextractor = VmafFeatureExtractor(
+            [asset], None, optional_dict={'frame_sampling': 4})
+        self.assertEquals(fextractor.executor_id, "VMAF_feature_V0.2.1_uniform4")
+        fextractor = VmafFeatureExtractor(
+            [asset], None, optional_dict={'frame_sampling': 4,
+                                          'frame_sampling_type': 'stratified'})
+        self.assertEquals(fextractor.executor_id, "VMAF_feature_V0.2.1_stratified4")
+        fextractor = VmafFeatureExtractor(
+            [asset], None, optional_dict={'frame_sampling': 1})
+        self.assertEquals(fextractor.executor_id, "VMAF_feature_V0.2.1")
+        fextractor = VmafFeatureExtractor(
+            [asset], None, optional_dict={'frame_sampling': 4,
+                                          'frame_sampling_type': 'random'})
+        with self.assertRaises(AssertionError):
+            fextractor.executor_id
+
+    def test_get_sampled_frame_idxs(self):
+        asset = Asset(dataset="test", content_id=0, asset_id=1,
+                      ref_path="dir/refvideo.yuv", dis_path="dir/disvideo.yuv",
+                      asset_dict={})
+        fextractor = VmafFeatureExtractor(
+            [asset], None, optional_dict={'frame_sampling': 4})
+        self.assertEquals(fextractor._get_sampled_frame_idxs(10), [0, 4, 8])
+
+        fextractor = VmafFeatureExtractor(
+            [asset], None, optional_dict={'frame_sampling': 4,
+                                          'frame_sampling_type': 'stratified'})
+        frame_idxs = fextractor._get_sampled_frame_idxs(40)
+        self.assertEquals(len(frame_idxs), 10)
+        for stratum, frame_idx in enumerate(frame_idxs):
+            self.assertTrue(stratum * 4 <= frame_idx < stratum * 4 + 4)
+        # the same frames are sampled every time, and out of fewer frames
+        self.assertEquals(fextractor._get_sampled_frame_idxs(40), frame_idxs)
+        self.assertEquals(fextractor._get_sampled_frame_idxs(20), frame_idxs[:5])
+
     def test_get_log_file_path(self):
         import hashlib
 
@@ -41,6 +86,104 @@ class FeatureExtractorTest(unittest.TestCase):
         h = hashlib.sha1("test_0_1_refvideo_720x480_2to2_vs_disvideo_720x480_2to2_q_720x480").hexdigest()
         self.assertTrue(re.match(r"^my_workdir_root/[a-zA-Z0-9-]+/VMAF_feature_V0.2.1_{}$".format(h), log_file_path))
 
+    def test_get_frame_range_opts(self):
+        print 'test on frame range options of feature executables...'
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      ref_path="dir/refvideo.yuv", dis_path="dir/disvideo.yuv",
+                      asset_dict={'width':720, 'height':480,
+                                  'ref_start_frame':2, 'ref_end_frame':11,
+                                  'dis_start_frame':3, 'dis_end_frame':7},
+                      workdir_root="my_workdir_root")
+        fextractor = VmafFeatureExtractor([asset], None)
+
+        asset.use_path_as_workpath = True
+        self.assertEquals(fextractor._get_frame_range_opts(asset),
+                          " --ref-start-frame 2 --dis-start-frame 3 --num-frames 5")
+        self.assertTrue(fextractor._get_exec_cmd(asset).endswith(
+            "720 480 --binary --ref-start-frame 2 --dis-start-frame 3 --num-frames 5"))
+
+        # workfiles generated by ffmpeg are already trimmed
+        asset.use_path_as_workpath = False
+        self.assertEquals(fextractor._get_frame_range_opts(asset), "")
+        self.assertEquals(fextractor._get_ffmpeg_frame_range_cmds(
+            asset.ref_start_end_frame, 720, 480, 'yuv420p'),
+            (" -skip_initial_bytes 1036800", " -vframes 10"))
+
+        asset2 = Asset(dataset="test", content_id=0, asset_id=1,
+                       ref_path="dir/refvideo.yuv", dis_path="dir/disvideo.yuv",
+                       asset_dict={'width':720, 'height':480},
+                       workdir_root="my_workdir_root")
+        asset2.use_path_as_workpath = True
+        self.assertEquals(fextractor._get_frame_range_opts(asset2), "")
+
+    def test_parse_feature_scores(self):
+        print 'test on parsing feature scores from output...'
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      ref_path="dir/refvideo.yuv", dis_path="dir/disvideo.yuv",
+                      asset_dict={'width':720, 'height':480,},
+                      workdir_root="my_workdir_root")
+        fextractor = PsnrFeatureExtractor([asset], None)
+        output = "PSNR_feature_V1.0\n\n" \
+                 "psnr: 0 30.755064\n" \
+                 "psnr_y: 0 1.0\n" \
+                 "psnr: 1 60.000000\n"
+        feature_result = fextractor._parse_feature_scores(output)
+        self.assertEquals(feature_result, {'PSNR_feature_psnr_scores': [30.755064, 60.0]})
+        with self.assertRaises(AssertionError):
+            fextractor._parse_feature_scores("psnr: 1 30.755064\n")
+        with self.assertRaises(AssertionError):
+            fextractor._parse_feature_scores("error: fopen ref_path failed.\n")
+
+    def test_parse_binary_feature_scores(self):
+        print 'test on parsing feature scores from binary output...'
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      ref_path="dir/refvideo.yuv", dis_path="dir/disvideo.yuv",
+                      asset_dict={'width':720, 'height':480,},
+                      workdir_root="my_workdir_root")
+        fextractor = SsimFeatureExtractor([asset], None)
+        header = "ssim\nssim_l\nssim_c\nssim_s".ljust(32, '\0')
+        output = "SSIM_feature_V1.0\n\n" + "VMAFBIN1" + \
+                 np.array([len(header)], dtype=np.uint32).tostring() + header + \
+                 np.array([[0.5, 0.6, 0.7, 0.8],
+                           [0.1, 0.2, 0.3, 0.4]]).tostring()
+        feature_result = fextractor._parse_feature_scores(output)
+        self.assertEquals(feature_result['SSIM_feature_ssim_scores'], [0.5, 0.1])
+        self.assertEquals(feature_result['SSIM_feature_ssim_s_scores'], [0.8, 0.4])
+        with self.assertRaises(AssertionError):
+            fextractor._parse_feature_scores(output + "error: compute_ssim failed.\n")
+
+    def test_iter_feature_scores(self):
+        print 'test on streaming feature scores from output...'
+        from StringIO import StringIO
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      ref_path="dir/refvideo.yuv", dis_path="dir/disvideo.yuv",
+                      asset_dict={'width':720, 'height':480,},
+                      workdir_root="my_workdir_root")
+        fextractor = PsnrFeatureExtractor([asset], None)
+        output = "psnr: 0 30.755064\n" \
+                 "psnr_y: 0 1.0\n" \
+                 "psnr: 1 60.000000\n"
+        self.assertEquals(list(fextractor._iter_feature_scores(StringIO(output))),
+                          [{'PSNR_feature_psnr_scores': [30.755064]},
+                           {'PSNR_feature_psnr_scores': [60.0]}])
+        with self.assertRaises(AssertionError):
+            list(fextractor._iter_feature_scores(StringIO("psnr: 1 30.755064\n")))
+        with self.assertRaises(AssertionError):
+            list(fextractor._iter_feature_scores(StringIO("error: fopen ref_path failed.\n")))
+
+        fextractor = SsimFeatureExtractor([asset], None)
+        header = "ssim\nssim_l\nssim_c\nssim_s".ljust(32, '\0')
+        output = "VMAFBIN1" + \
+                 np.array([len(header)], dtype=np.uint32).tostring() + header + \
+                 np.array([[0.5, 0.6, 0.7, 0.8],
+                           [0.1, 0.2, 0.3, 0.4]]).tostring()
+        feature_results = list(fextractor._iter_feature_scores(StringIO(output)))
+        self.assertEquals(len(feature_results), 2)
+        self.assertEquals(feature_results[0]['SSIM_feature_ssim_scores'], [0.5])
+        self.assertEquals(feature_results[1]['SSIM_feature_ssim_s_scores'], [0.4])
+        with self.assertRaises(AssertionError):
+            list(fextractor._iter_feature_scores(StringIO(output + "error: compute_ssim failed.\n")))
+
     def test_run_vamf_fextractor(self):
         print 'test on running VMAF feature extractor...'
         ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
@@ -165,6 +308,217 @@ class FeatureExtractorTest(unittest.TestCase):
         self.assertAlmostEqual(results[1]['VMAF_feature_vif_scale2_score'], 0.9999998649680067, places=4)
         self.assertAlmostEqual(results[1]['VMAF_feature_vif_scale3_score'], 0.9999998102499, places=4)
 
+    def test_run_vamf_fextractor_with_lib(self):
+        print 'test on running VMAF feature extractor with libvmaf.so...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        self.fextractor = VmafFeatureExtractor(
+            [asset],
+            None, fifo_mode=True,
+            result_store=None,
+            optional_dict={'use_lib': True}
+        )
+        self.fextractor.run()
+
+        results = self.fextractor.results
+
+        self.assertAlmostEqual(results[0]['VMAF_feature_vif_score'], 0.44455808333333313, places=4)
+        self.assertAlmostEqual(results[0]['VMAF_feature_motion_score'], 3.5916076041666667, places=4)
+        self.assertAlmostEqual(results[0]['VMAF_feature_adm2_score'], 0.9254334398006141, places=4)
+        self.assertAlmostEqual(results[0]['VMAF_feature_ansnr_score'], 22.533456770833329, places=4)
+        self.assertAlmostEqual(results[0]['VMAF_feature_vif_scale3_score'], 0.9207121810522212, places=4)
+
+    def test_iter_frames_vamf_fextractor(self):
+        print 'test on streaming frames of VMAF feature extractor...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        self.fextractor = VmafFeatureExtractor(
+            [asset],
+            None, fifo_mode=True,
+            result_store=None
+        )
+        frames = list(self.fextractor.iter_frames(asset))
+
+        self.fextractor.run()
+        results = self.fextractor.results
+
+        self.assertEquals(len(frames), len(results[0]['VMAF_feature_vif_scores']))
+        for atom_feature in ['vif', 'motion', 'adm2', 'vif_scale3']:
+            score_key = VmafFeatureExtractor.get_score_key(atom_feature)
+            scores_key = VmafFeatureExtractor.get_scores_key(atom_feature)
+            self.assertEquals(map(lambda frame: frame[score_key], frames),
+                              results[0][scores_key])
+
+        # stop after the first frames
+        frame_iter = self.fextractor.iter_frames(asset)
+        self.assertEquals(next(frame_iter), frames[0])
+        self.assertEquals(next(frame_iter), frames[1])
+        frame_iter.close()
+        self.assertFalse(os.path.exists(asset.workdir))
+
+    def test_run_vamf_fextractor_with_frame_sampling(self):
+        print 'test on running VMAF feature extractor on sampled frames...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        self.fextractor = VmafFeatureExtractor(
+            [asset],
+            None, fifo_mode=True,
+            result_store=None
+        )
+        self.fextractor.run()
+        results = self.fextractor.results
+
+        # the scores of a sampled frame, motion included, are the same as
+        # when all frames are computed
+        for optional_dict in [{'frame_sampling': 4},
+                              {'frame_sampling': 3,
+                               'frame_sampling_type': 'stratified',
+                               'use_lib': True}]:
+            self.fextractor = VmafFeatureExtractor(
+                [asset],
+                None, fifo_mode=True,
+                result_store=None,
+                optional_dict=optional_dict
+            )
+            self.fextractor.run()
+            sampled_results = self.fextractor.results
+
+            frame_idxs = self.fextractor._get_sampled_frame_idxs(48)
+            self.assertEquals(len(frame_idxs), 12 if optional_dict['frame_sampling'] == 4 else 16)
+            for atom_feature in ['vif', 'motion', 'adm2', 'ansnr', 'vif_scale3']:
+                scores_key = VmafFeatureExtractor.get_scores_key(atom_feature)
+                self.assertEquals(sampled_results[0][scores_key],
+                                  map(lambda frame_idx: results[0][scores_key][frame_idx],
+                                      frame_idxs))
+
+    def test_run_vamf_fextractor_with_segments(self):
+        print 'test on running VMAF feature extractor on segments at the same time...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324,
+                                  'quality_width':288, 'quality_height':162,
+                                  'scaler':'numpy'})
+
+        self.fextractor = VmafFeatureExtractor(
+            [asset],
+            None, fifo_mode=True,
+            result_store=None
+        )
+        self.fextractor.run()
+        results = self.fextractor.results
+
+        # segments stitched back together give the same scores, motion at
+        # the first frame of each segment included
+        self.fextractor = VmafFeatureExtractor(
+            [asset],
+            None, fifo_mode=True,
+            result_store=None,
+            optional_dict={'num_segments': 5}
+        )
+        segments = self.fextractor._get_segments(asset)
+        self.assertEquals(map(len, segments), [9, 10, 9, 10, 10])
+        self.assertEquals(sum(segments, []), range(48))
+        self.fextractor.run()
+        segment_results = self.fextractor.results
+
+        self.assertEquals(segment_results[0].executor_id, results[0].executor_id)
+        for atom_feature in VmafFeatureExtractor.ATOM_FEATURES + \
+                VmafFeatureExtractor.DERIVED_ATOM_FEATURES:
+            scores_key = VmafFeatureExtractor.get_scores_key(atom_feature)
+            self.assertEquals(segment_results[0][scores_key],
+                              results[0][scores_key])
+
+    def test_run_vamf_fextractor_with_threads(self):
+        print 'test on running VMAF feature extractor on threads...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        self.fextractor = VmafFeatureExtractor(
+            [asset],
+            None, fifo_mode=True,
+            result_store=None
+        )
+        self.fextractor.run()
+        results = self.fextractor.results
+
+        # frames computed on threads are written in order, with the same
+        # scores, motion included
+        for optional_dict in [{'num_threads': 3},
+                              {'num_threads': 2, 'frame_sampling': 5}]:
+            self.fextractor = VmafFeatureExtractor(
+                [asset],
+                None, fifo_mode=True,
+                result_store=None,
+                optional_dict=optional_dict
+            )
+            self.fextractor.run()
+            threaded_results = self.fextractor.results
+
+            frame_idxs = self.fextractor._get_sampled_frame_idxs(48) \
+                if 'frame_sampling' in optional_dict else range(48)
+            for atom_feature in VmafFeatureExtractor.ATOM_FEATURES + \
+                    VmafFeatureExtractor.DERIVED_ATOM_FEATURES:
+                scores_key = VmafFeatureExtractor.get_scores_key(atom_feature)
+                self.assertEquals(threaded_results[0][scores_key],
+                                  map(lambda frame_idx: results[0][scores_key][frame_idx],
+                                      frame_idxs))
+
+    def test_vmaf_feature_lib(self):
+        print 'test on pushing frames to libvmaf.so...'
+        feature_names = VmafFeatureLib.get_feature_names()
+        self.assertEquals(len(feature_names), 17)
+        self.assertEquals(feature_names[:3], ['adm', 'adm_num', 'adm_den'])
+
+        np.random.seed(0)
+        frm0 = np.random.randint(0, 256, (36, 64)).astype(np.double)
+        frm1 = np.roll(frm0, 1, axis=1)
+        with VmafFeatureLib(64, 36, 'yuv420p') as lib:
+            row0 = dict(zip(feature_names, lib.push_frame(frm0, frm0)))
+            row1 = dict(zip(feature_names, lib.push_frame(frm1, frm1)))
+            with self.assertRaises(AssertionError):
+                lib.push_frame(frm0[:-1], frm0[:-1])
+
+        self.assertAlmostEqual(row0['vif'], 1.0, places=4)
+        self.assertAlmostEqual(row0['adm'], 1.0, places=4)
+        self.assertAlmostEqual(row0['motion'], 0.0, places=4)
+        self.assertTrue(row1['motion'] > 0.0)
+
+        # skip frame 0, except for the motion of frame 1
+        with VmafFeatureLib(64, 36, 'yuv420p') as lib:
+            lib.push_prev_frame(frm0)
+            row1_skipped = dict(zip(feature_names, lib.push_frame(frm1, frm1)))
+        self.assertEquals(row1_skipped, row1)
+
+        with self.assertRaises(RuntimeError):
+            VmafFeatureLib(64, 36, 'yuv411p')
+
     def test_run_vmaf_fextractor_not_unique(self):
         ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
         dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
@@ -185,6 +539,26 @@ class FeatureExtractorTest(unittest.TestCase):
                 [asset, asset_original],
                 None, fifo_mode=True)
 
+    def test_run_psnr_fextractor_with_exec_error(self):
+        print 'test on running PSNR feature extractor on a missing file...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/nonexist_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        # the error output of the executable is passed on
+        with self.assertRaises(RuntimeError) as cm:
+            PsnrFeatureExtractor([asset], None, fifo_mode=True).run()
+        self.assertTrue('exit code 1' in str(cm.exception))
+        self.assertTrue('fopen dis_path' in str(cm.exception))
+
+        with self.assertRaises(RuntimeError) as cm:
+            list(PsnrFeatureExtractor([asset], None, fifo_mode=True).iter_frames(asset))
+        self.assertTrue('fopen dis_path' in str(cm.exception))
+
     def test_run_moment_fextractor(self):
         print 'test on running Moment feature extractor...'
         ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
@@ -252,6 +626,28 @@ class FeatureExtractorTest(unittest.TestCase):
         self.assertAlmostEqual(results[0]['PSNR_feature_psnr_score'], 30.755063979166664, places=4)
         self.assertAlmostEqual(results[1]['PSNR_feature_psnr_score'], 60.0, places=4)
 
+    def test_run_psnr_fextractor_without_capture_stdout(self):
+        print 'test on running PSNR feature extractor without capturing stdout...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        self.fextractor = PsnrFeatureExtractor(
+            [asset],
+            None, fifo_mode=True,
+            result_store=None,
+            optional_dict={'capture_stdout': False}
+        )
+        self.fextractor.run()
+
+        results = self.fextractor.results
+
+        self.assertAlmostEqual(results[0]['PSNR_feature_psnr_score'], 30.755063979166664, places=4)
+
     def test_run_ssim_fextractor(self):
         print 'test on running SSIM feature extractor...'
         ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
@@ -346,6 +742,189 @@ class FeatureExtractorTest(unittest.TestCase):
         self.assertAlmostEqual(results[1]['MS_SSIM_feature_ms_ssim_c_scale4_score'], 1., places=4)
         self.assertAlmostEqual(results[1]['MS_SSIM_feature_ms_ssim_s_scale4_score'], 1., places=4)
 
+    def test_run_fused_fextractor_with_result_store(self):
+        print 'test on running fused feature extractor with result store...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        asset_original = Asset(dataset="test", content_id=0, asset_id=1,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=ref_path,
+                      asset_dict={'width':576, 'height':324})
+
+        result_store = FileSystemResultStore(logger=None)
+
+        print '    running PSNR feature extractor alone...'
+        psnr_fextractor = PsnrFeatureExtractor(
+            [asset, asset_original],
+            None, fifo_mode=True,
+            result_store=result_store
+        )
+        psnr_fextractor.run()
+
+        print '    running fused feature extractor, reusing PSNR results...'
+        self.fextractor = FusedFeatureExtractor(
+            [asset, asset_original],
+            None, fifo_mode=True,
+            result_store=result_store,
+            optional_dict={'fextractor_types': ['VMAF_feature', 'PSNR_feature', 'SSIM_feature']}
+        )
+        self.fextractor.run()
+
+        results = self.fextractor.fextractor_results
+
+        self.assertEquals(map(lambda result: result.executor_id, results[0]),
+                          ['VMAF_feature_V0.2.1', 'PSNR_feature_V1.0', 'SSIM_feature_V1.0'])
+
+        vmaf_result, psnr_result, ssim_result = results[0]
+        self.assertAlmostEqual(vmaf_result['VMAF_feature_vif_score'], 0.44455808333333313, places=4)
+        self.assertAlmostEqual(vmaf_result['VMAF_feature_motion_score'], 3.5916076041666667, places=4)
+        self.assertAlmostEqual(vmaf_result['VMAF_feature_adm2_score'], 0.9254334398006141, places=4)
+        self.assertAlmostEqual(vmaf_result['VMAF_feature_ansnr_score'], 22.533456770833329, places=4)
+        self.assertAlmostEqual(psnr_result['PSNR_feature_psnr_score'], 30.755063979166664, places=4)
+        self.assertAlmostEqual(ssim_result['SSIM_feature_ssim_score'], 0.86325137500000004, places=4)
+
+        vmaf_result, psnr_result, ssim_result = results[1]
+        self.assertAlmostEqual(vmaf_result['VMAF_feature_vif_score'], 1.0, places=4)
+        self.assertAlmostEqual(vmaf_result['VMAF_feature_adm2_score'], 1.0, places=4)
+        self.assertAlmostEqual(psnr_result['PSNR_feature_psnr_score'], 60.0, places=4)
+        self.assertAlmostEqual(ssim_result['SSIM_feature_ssim_score'], 1.0, places=4)
+
+        fused_result = self.fextractor.results[1]
+        self.assertEquals(fused_result.executor_id, 'Fused_feature_V1.0')
+        self.assertAlmostEqual(fused_result['VMAF_feature_adm2_score'], 1.0, places=4)
+        self.assertAlmostEqual(fused_result['PSNR_feature_psnr_score'], 60.0, places=4)
+        self.assertAlmostEqual(fused_result['SSIM_feature_ssim_score'], 1.0, places=4)
+
+        print '    running SSIM feature extractor alone with stored results...'
+        ssim_fextractor = SsimFeatureExtractor(
+            [asset, asset_original],
+            None, fifo_mode=True,
+            result_store=result_store
+        )
+        ssim_fextractor.run()
+        self.assertEquals(ssim_fextractor.results[0]['SSIM_feature_ssim_scores'],
+                          results[0][2]['SSIM_feature_ssim_scores'])
+        self.assertEquals(ssim_fextractor.results[1]['SSIM_feature_ssim_scores'],
+                          results[1][2]['SSIM_feature_ssim_scores'])
+
+    def test_run_vamf_fextractor_with_ref_feature_cache(self):
+        print 'test on running VMAF feature extractor with ref feature cache...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        asset_original = Asset(dataset="test", content_id=0, asset_id=1,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=ref_path,
+                      asset_dict={'width':576, 'height':324})
+
+        ref_feature_cache = RefFeatureCache(
+            cache_dir=config.ROOT + "/workspace/ref_feature_cache_test")
+        ref_feature_cache.clean_up()
+
+        # motion of asset is computed and cached, then reused by asset_original
+        self.fextractor = VmafFeatureExtractor(
+            [asset, asset_original],
+            None, fifo_mode=True,
+            result_store=None,
+            optional_dict={'ref_feature_cache': ref_feature_cache}
+        )
+        self.fextractor.run()
+
+        results = self.fextractor.results
+
+        self.assertIsNotNone(ref_feature_cache.load(asset_original, self.fextractor.executor_id))
+
+        self.assertAlmostEqual(results[0]['VMAF_feature_vif_score'], 0.44455808333333313, places=4)
+        self.assertAlmostEqual(results[0]['VMAF_feature_motion_score'], 3.5916076041666667, places=4)
+        self.assertAlmostEqual(results[0]['VMAF_feature_adm2_score'], 0.9254334398006141, places=4)
+        self.assertAlmostEqual(results[0]['VMAF_feature_ansnr_score'], 22.533456770833329, places=4)
+
+        self.assertAlmostEqual(results[1]['VMAF_feature_vif_score'], 1.0, places=4)
+        self.assertAlmostEqual(results[1]['VMAF_feature_motion_score'], 3.5916076041666667, places=4)
+        self.assertAlmostEqual(results[1]['VMAF_feature_adm2_score'], 1.0, places=4)
+        self.assertAlmostEqual(results[1]['VMAF_feature_ansnr_score'], 30.030914145833322, places=4)
+
+        self.assertEquals(results[0]['VMAF_feature_motion_scores'],
+                          results[1]['VMAF_feature_motion_scores'])
+
+        ref_feature_cache.clean_up()
+
+    def test_ref_workfile_cache(self):
+        print 'test on sharing ref workfiles across assets...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324,
+                                  'quality_width':288, 'quality_height':162})
+
+        asset_original = Asset(dataset="test", content_id=0, asset_id=1,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=ref_path,
+                      asset_dict={'width':576, 'height':324,
+                                  'quality_width':288, 'quality_height':162})
+
+        asset_one_off = Asset(dataset="test", content_id=1, asset_id=2,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=dis_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324,
+                                  'quality_width':288, 'quality_height':162})
+
+        ref_workfile_cache = RefWorkfileCache(
+            cache_dir=config.ROOT + "/workspace/ref_workfile_cache_test",
+            max_bytes=len('ref workfile'))
+        ref_workfile_cache.clean_up()
+
+        ref_workfile_cache.add_assets([asset, asset_original, asset_one_off])
+        self.assertTrue(ref_workfile_cache.is_shared(asset))
+        self.assertTrue(ref_workfile_cache.is_shared(asset_original))
+        self.assertFalse(ref_workfile_cache.is_shared(asset_one_off))
+
+        generated_asset_ids = []
+        def generate_ref_workfile(asset, ref_workfile_path):
+            generated_asset_ids.append(asset.asset_id)
+            with open(ref_workfile_path, 'wb') as ref_workfile:
+                ref_workfile.write('ref workfile')
+
+        path, holder = ref_workfile_cache.acquire(asset, generate_ref_workfile)
+        path_original, holder_original = ref_workfile_cache.acquire(
+            asset_original, generate_ref_workfile)
+        self.assertEquals(path, path_original)
+        self.assertEquals(generated_asset_ids, [0])
+
+        path_one_off, holder_one_off = ref_workfile_cache.acquire(
+            asset_one_off, generate_ref_workfile)
+        self.assertEquals(generated_asset_ids, [0, 2])
+
+        # over max_bytes: the entry released is evicted, the held one is not
+        ref_workfile_cache.release(holder_one_off)
+        self.assertFalse(os.path.exists(path_one_off))
+        self.assertFalse(os.path.exists(path_one_off + RefWorkfileCache.LOCK_FILE_NAME))
+        self.assertTrue(os.path.exists(path))
+
+        ref_workfile_cache.release(holder)
+        ref_workfile_cache.release(holder_original)
+        self.assertTrue(os.path.exists(path))
+
+        ref_workfile_cache.clean_up()
+
 class ParallelFeatureExtractorTest(unittest.TestCase):
 
     def tearDown(self):
@@ -526,6 +1105,118 @@ class ParallelFeatureExtractorTest(unittest.TestCase):
         self.assertAlmostEqual(results[1]['Moment_feature_dis2nd_score'], 4696.668388042269, places=4)
         self.assertAlmostEqual(results[1]['Moment_feature_disvar_score'], 1121.519917231203, places=4)
 
+    def test_run_parallel_psnr_fextractor_with_num_workers(self):
+        print 'test on running PSNR feature extractor in parallel with num_workers...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        asset_original = Asset(dataset="test", content_id=0, asset_id=1,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=ref_path,
+                      asset_dict={'width':576, 'height':324})
+
+        asset_nonexist = Asset(dataset="test", content_id=0, asset_id=2,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=config.ROOT + "/resource/yuv/nonexist_576x324.yuv",
+                      asset_dict={'width':576, 'height':324})
+
+        self.fextractors, results = run_executors_in_parallel(
+            PsnrFeatureExtractor,
+            [asset, asset_original],
+            fifo_mode=True,
+            delete_workdir=True,
+            parallelize=True,
+            result_store=None,
+            num_workers=2,
+            chunksize=2,
+        )
+
+        self.assertAlmostEqual(results[0]['PSNR_feature_psnr_score'], 30.755063979166664, places=4)
+        self.assertAlmostEqual(results[1]['PSNR_feature_psnr_score'], 60.0, places=4)
+
+        with self.assertRaises(RuntimeError):
+            run_executors_in_parallel(
+                PsnrFeatureExtractor,
+                [asset, asset_nonexist],
+                fifo_mode=True,
+                delete_workdir=True,
+                parallelize=True,
+                result_store=None,
+                num_workers=2,
+            )
+
+    def test_run_parallel_psnr_fextractor_with_failure(self):
+        print 'test on running PSNR feature extractor in parallel with a failing asset...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        asset_nonexist = Asset(dataset="test", content_id=0, asset_id=1,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=config.ROOT + "/resource/yuv/nonexist_576x324.yuv",
+                      asset_dict={'width':576, 'height':324})
+
+        with self.assertRaises(ExecutorsFailedError) as cm:
+            run_executors_in_parallel(
+                PsnrFeatureExtractor,
+                [asset, asset_nonexist],
+                fifo_mode=True,
+                delete_workdir=True,
+                parallelize=True,
+                result_store=None,
+                num_workers=2,
+            )
+
+        self.assertEquals(len(cm.exception.failures), 1)
+        executor_class, failed_asset, error = cm.exception.failures[0]
+        self.assertEquals(executor_class, PsnrFeatureExtractor)
+        self.assertEquals(failed_asset, asset_nonexist)
+
+        self.fextractors, results = cm.exception.executors_results_list[0]
+        self.assertIsNone(self.fextractors[1])
+        self.assertIsNone(results[1])
+        self.fextractors = self.fextractors[:1]
+        self.assertAlmostEqual(results[0]['PSNR_feature_psnr_score'], 30.755063979166664, places=4)
+
+    def test_run_parallel_psnr_fextractor_with_repeated_asset(self):
+        print 'test on running PSNR feature extractor on a repeated asset...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        result_store = FileSystemResultStore(logger=None)
+
+        # the second run loads both results from result_store
+        for _ in range(2):
+            self.fextractors, results = run_executors_in_parallel(
+                PsnrFeatureExtractor,
+                [asset, asset],
+                fifo_mode=True,
+                delete_workdir=True,
+                parallelize=False,
+                result_store=result_store,
+            )
+
+            self.assertEquals(len(results), 2)
+            self.assertAlmostEqual(results[0]['PSNR_feature_psnr_score'], 30.755063979166664, places=4)
+            self.assertAlmostEqual(results[1]['PSNR_feature_psnr_score'], 30.755063979166664, places=4)
+
     def test_run_parallel_ssim_fextractor(self):
         print 'test on running SSIM feature extractor in parallel...'
         ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
@@ -4,12 +4,15 @@ __license__ = "Apache, Version 2.0"
 import os
 import unittest
 
+import numpy as np
+
 from core.asset import Asset
 from core.quality_runner import VmafLegacyQualityRunner, VmafQualityRunner, \
     PsnrQualityRunner
 from core.executor import run_executors_in_parallel
 import config
 from core.result_store import FileSystemResultStore
+from core.ref_feature_cache import RefFeatureCache
 
 
 class QualityRunnerTest(unittest.TestCase):
@@ -29,6 +32,24 @@ class QualityRunnerTest(unittest.TestCase):
         runner = VmafLegacyQualityRunner([asset], None)
         self.assertEquals(runner.executor_id, 'VMAF_legacy_V1.0')
 
+    def test_vmaf_legacy_post_correction(self):
+        print 'test on VMAF (legacy) post-correction...'
+        scores = VmafLegacyQualityRunner._post_correction(
+            [0.0, 13.0, 25.0, 5.0, 12.0], [50.0, 50.0, 90.0, -1.0, 101.0])
+        self.assertTrue(np.allclose(scores, [50.0, 50.75, 100.0, 0.0, 100.0]))
+
+    def test_vmaf_legacy_predict_scores(self):
+        print 'test on VMAF (legacy) batch prediction...'
+        feature_result = {'VMAF_feature_vif_scores': [0.44, 1.0],
+                          'VMAF_feature_adm_scores': [0.92, 1.0],
+                          'VMAF_feature_ansnr_scores': [22.9, 30.0],
+                          'VMAF_feature_motion_scores': [3.59, 3.59]}
+        scores = VmafLegacyQualityRunner._predict_scores(feature_result)
+        self.assertEquals(len(scores), 2)
+        self.assertTrue(0.0 <= scores[0] < scores[1] <= 100.0)
+        self.assertTrue(VmafLegacyQualityRunner._load_model() is
+                        VmafLegacyQualityRunner._load_model())
+
     def test_run_vamf_legacy_runner(self):
         print 'test on running VMAF (legacy) runner...'
         ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
@@ -218,6 +239,41 @@ class QualityRunnerTest(unittest.TestCase):
         self.assertAlmostEqual(results[1]['VMAF_feature_ansnr_score'], 30.030914145833322, places=4)
         self.assertAlmostEqual(results[1]['VMAF_score'], 100.0, places=4)
 
+    def test_run_vmaf_runner_with_batch_predict(self):
+        print 'test on running VMAF runner with batch prediction...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        asset_original = Asset(dataset="test", content_id=0, asset_id=1,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=ref_path,
+                      asset_dict={'width':576, 'height':324})
+
+        self.runner = VmafQualityRunner(
+            [asset, asset_original],
+            None, fifo_mode=True,
+            delete_workdir=True,
+            result_store=None,
+            optional_dict={'batch_predict': True},
+        )
+        self.runner.run()
+
+        results = self.runner.results
+
+        self.assertEquals(len(results), 2)
+        self.assertEquals(results[0].asset, asset)
+        self.assertEquals(results[1].asset, asset_original)
+        self.assertEquals(len(results[0]['VMAF_scores']), 48)
+        self.assertAlmostEqual(results[0]['VMAF_feature_motion_score'], 3.5916076041666667, places=4)
+        self.assertAlmostEqual(results[0]['VMAF_score'], 66.628190500372327, places=4)
+        self.assertAlmostEqual(results[1]['VMAF_score'], 99.799881593902896, places=4)
+
     def test_run_vmaf_runner(self):
         print 'test on running VMAF runner...'
         ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
@@ -266,6 +322,126 @@ class QualityRunnerTest(unittest.TestCase):
         with self.assertRaises(KeyError):
             self.assertAlmostEqual(results[1]['VMAF_feature_ansnr_score'], 1.0, places=4)
 
+    def test_iter_frames_vmaf_runner(self):
+        print 'test on streaming frames of VMAF runner...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        self.runner = VmafQualityRunner(
+            [asset],
+            None, fifo_mode=True,
+            delete_workdir=True,
+            result_store=None,
+        )
+        frames = list(self.runner.iter_frames(asset))
+
+        self.assertEquals(len(frames), 48)
+        self.assertAlmostEqual(np.mean(map(lambda frame: frame['VMAF_score'], frames)),
+                               66.628190500372327, places=4)
+        self.assertAlmostEqual(np.mean(map(lambda frame: frame['VMAF_feature_motion_score'], frames)),
+                               3.5916076041666667, places=4)
+
+        # stop at the first frame below a quality floor
+        num_frames = 0
+        for frame in self.runner.iter_frames(asset):
+            num_frames += 1
+            if frame['VMAF_score'] < 100.0:
+                break
+        self.assertEquals(num_frames, 1)
+
+    def test_run_vmaf_runner_with_frame_sampling(self):
+        print 'test on running VMAF runner on sampled frames...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        self.runner = VmafQualityRunner(
+            [asset],
+            None, fifo_mode=True,
+            delete_workdir=True,
+            result_store=None,
+        )
+        self.runner.run()
+        results = self.runner.results
+
+        self.runner = VmafQualityRunner(
+            [asset],
+            None, fifo_mode=True,
+            delete_workdir=True,
+            result_store=None,
+            optional_dict={'frame_sampling': 6}
+        )
+        self.runner.run()
+        sampled_results = self.runner.results
+
+        self.assertEquals(sampled_results[0].executor_id, 'VMAF_V0.3.1_uniform6')
+        for scores_key in ['VMAF_scores', 'VMAF_feature_motion_scores']:
+            self.assertEquals(len(sampled_results[0][scores_key]), 8)
+            for sampled_score, score in zip(sampled_results[0][scores_key],
+                                            results[0][scores_key][::6]):
+                self.assertAlmostEqual(sampled_score, score, places=8)
+
+    def test_run_vmaf_runner_with_ref_feature_cache(self):
+        print 'test on running VMAF runner with ref feature cache...'
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        dis_path = config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv"
+        asset = Asset(dataset="test", content_id=0, asset_id=0,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=dis_path,
+                      asset_dict={'width':576, 'height':324})
+
+        asset_original = Asset(dataset="test", content_id=0, asset_id=1,
+                      workdir_root=config.ROOT + "/workspace/workdir",
+                      ref_path=ref_path,
+                      dis_path=ref_path,
+                      asset_dict={'width':576, 'height':324})
+
+        self.runner = VmafQualityRunner(
+            [asset, asset_original],
+            None, fifo_mode=True,
+            delete_workdir=True,
+            result_store=None,
+        )
+        self.runner.run()
+        results = self.runner.results
+
+        ref_feature_cache = RefFeatureCache(
+            cache_dir=config.ROOT + "/workspace/ref_feature_cache_test")
+        ref_feature_cache.clean_up()
+
+        # the runner passes ref_feature_cache on to its VMAF feature
+        # extractor: motion of asset is computed and cached, then reused by
+        # asset_original
+        self.runner = VmafQualityRunner(
+            [asset, asset_original],
+            None, fifo_mode=True,
+            delete_workdir=True,
+            result_store=None,
+            optional_dict={'ref_feature_cache': ref_feature_cache}
+        )
+        self.runner.run()
+        cached_results = self.runner.results
+
+        self.assertIsNotNone(ref_feature_cache.load(asset_original, 'VMAF_feature_V0.2.1'))
+
+        for result, cached_result in zip(results, cached_results):
+            for scores_key in ['VMAF_scores', 'VMAF_feature_motion_scores']:
+                for cached_score, score in zip(cached_result[scores_key],
+                                               result[scores_key]):
+                    self.assertAlmostEqual(cached_score, score, places=8)
+
+        ref_feature_cache.clean_up()
+
     def test_run_vmaf_runner_checkerboard(self):
         print 'test on running VMAF runner on checkerboard pattern...'
         ref_path = config.ROOT + "/resource/yuv/checkerboard_1920_1080_10_3_0_0.yuv"
@@ -92,6 +92,86 @@ class YuvReaderTest(unittest.TestCase):
         self.assertAlmostEquals(np.mean(y_1stmoments), 61.332006624999984, places=4)
         self.assertAlmostEquals(np.mean(y_2ndmoments), 4798.659574041666, places=4)
 
+    def test_start_end_frame(self):
+        with YuvReader(
+                filepath=config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv",
+                width=576, height=324, yuv_type='yuv420p',
+                start_frame=1, end_frame=2) as yuv_reader:
+
+            self.assertEquals(yuv_reader.num_bytes_per_frm, 279936)
+            self.assertEquals(yuv_reader.file.tell(), 279936)
+
+            y_1stmoments = []
+            for y, u, v in yuv_reader:
+                y_1stmoments.append(y.mean())
+
+        self.assertEquals(len(y_1stmoments), 2)
+        self.assertAlmostEquals(y_1stmoments[0], 61.265260631001375, places=4)
+
+    def test_random_access(self):
+        with YuvReader(
+                filepath=config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv",
+                width=576, height=324, yuv_type='yuv420p') as yuv_reader:
+
+            self.assertEquals(len(yuv_reader), 48)
+
+            y, u, v = yuv_reader[1]
+            self.assertEquals(y.dtype, np.uint8)
+            self.assertEquals(y.shape, (324, 576))
+            self.assertEquals(u.shape, (162, 288))
+            self.assertEquals(y[0][0], 142)
+            self.assertEquals(u[0][0], 93)
+            self.assertEquals(v[0][0], 128)
+            self.assertFalse(y.flags.writeable)
+
+            ys, us, vs = yuv_reader[0:4:2]
+            self.assertEquals(ys.shape, (2, 324, 576))
+            self.assertEquals(vs.shape, (2, 162, 288))
+            self.assertEquals(ys[0][0][0], 87)
+            self.assertEquals(ys[1][0][0], yuv_reader[2][0][0][0])
+
+            ys = yuv_reader.read_frames(0, 2)
+            self.assertEquals(ys.shape, (2, 324, 576))
+            self.assertAlmostEquals(yuv_reader.to_double(ys[1]).mean(), 61.265260631001375, places=4)
+
+            with self.assertRaises(IndexError):
+                yuv_reader[48]
+            with self.assertRaises(AssertionError):
+                yuv_reader.read_frames(47, 2)
+
+    def test_iteration_with_mmap(self):
+
+        y_1stmoments = []
+
+        with YuvReader(
+                filepath=config.ROOT + "/resource/yuv/src01_hrc01_576x324.yuv",
+                width=576, height=324, yuv_type='yuv420p',
+                use_mmap=True) as yuv_reader:
+
+            for y, u, v in yuv_reader:
+                y_1stmoments.append(y.mean())
+
+        self.assertEquals(len(y_1stmoments), 48)
+        self.assertAlmostEquals(np.mean(y_1stmoments), 61.332006624999984, places=4)
+
+    def test_iter_y(self):
+        with YuvReader(
+                filepath=config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv",
+                width=576, height=324, yuv_type='yuv420p',
+                start_frame=1, end_frame=3) as yuv_reader:
+            ys = list(yuv_reader.iter_y())
+        with YuvReader(
+                filepath=config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv",
+                width=576, height=324, yuv_type='yuv420p',
+                start_frame=1, end_frame=3) as yuv_reader:
+            yuvs = list(yuv_reader)
+
+        self.assertEquals(len(ys), 3)
+        self.assertEquals(ys[0].shape, (324, 576))
+        self.assertEquals(ys[0][0][0], 142)
+        for y, yuv in zip(ys, yuvs):
+            self.assertTrue(np.array_equal(y, yuv[0]))
+
 class YuvReaderTest10le(unittest.TestCase):
 
     def test_yuv_reader(self):
@@ -167,3 +247,30 @@ class YuvReaderTest10le(unittest.TestCase):
         self.assertEquals(len(y_2ndmoments), 48)
         self.assertAlmostEquals(np.mean(y_1stmoments), 61.332006624999984, places=4)
         self.assertAlmostEquals(np.mean(y_2ndmoments), 4798.659574041666, places=4)
+
+    def test_random_access(self):
+        with YuvReader(
+            filepath=config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv422p10le.yuv",
+            width=576,
+            height=324,
+            yuv_type='yuv422p10le'
+        ) as yuv_reader:
+
+            y, u, v = yuv_reader[0]
+            self.assertEquals(y.dtype, np.uint16)
+            self.assertEquals(u.shape, (324, 288))
+            self.assertEquals(yuv_reader.to_double(u)[0][0], 92.25)
+
+            ys = yuv_reader.read_frames(1, 1)
+            self.assertEquals(ys.shape, (1, 324, 576))
+            self.assertEquals(yuv_reader.to_double(ys)[0][0][0], 142)
+
+    def test_iter_y(self):
+        with YuvReader(
+                filepath=config.ROOT +
+                        "/resource/yuv/src01_hrc01_576x324.yuv422p10le.yuv",
+                width=576, height=324, yuv_type='yuv422p10le') as yuv_reader:
+            y_1stmoments = [y.mean() for y in yuv_reader.iter_y()]
+
+        self.assertEquals(len(y_1stmoments), 48)
+        self.assertAlmostEquals(np.mean(y_1stmoments), 61.332006624999984, places=4)
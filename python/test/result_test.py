@@ -9,9 +9,11 @@ import numpy as np
 from core.asset import Asset
 import config
 from core.result import Result
-from core.result_store import FileSystemResultStore
+from core.result_store import FileSystemResultStore, SqliteResultStore, \
+    CachingResultStore
 from core.quality_runner import VmafLegacyQualityRunner
 from tools.stats import ListStats
+from tools.misc import make_parent_dirs_if_nonexist
 
 class ResultTest(unittest.TestCase):
 
@@ -151,6 +153,101 @@ class ResultStoreTest(unittest.TestCase):
 
         self.assertEquals(self.result, loaded_result)
 
+    def test_file_system_result_store_load_legacy_text(self):
+        print 'test on file system result store load legacy text format...'
+        self.result_store = FileSystemResultStore(logger=None)
+        asset = self.result.asset
+        executor_id = self.result.executor_id
+
+        # result file written in the pre-npz text format
+        result_file_path = self.result_store._get_result_file_path(self.result)
+        make_parent_dirs_if_nonexist(result_file_path)
+        with open(result_file_path, "wt") as result_file:
+            result_file.write(str(self.result.to_dataframe().to_dict()))
+
+        loaded_result = self.result_store.load(asset, executor_id)
+
+        self.assertEquals(self.result, loaded_result)
+
+    def test_sqlite_result_store_save_load_delete(self):
+        print 'test on sqlite result store save, load and delete...'
+        self.result_store = SqliteResultStore(logger=None)
+        asset = self.result.asset
+        executor_id = self.result.executor_id
+
+        self.result_store.save(self.result)
+
+        loaded_result = self.result_store.load(asset, executor_id)
+
+        self.assertEquals(self.result, loaded_result)
+        self.assertAlmostEquals(loaded_result['VMAF_legacy_score'],
+                                self.result['VMAF_legacy_score'], places=10)
+        self.assertIsNone(self.result_store.load(asset, 'VMAF_legacy_V0.0'))
+
+        # save again should overwrite instead of duplicate
+        self.result_store.save(self.result)
+        self.assertEquals(self.result,
+                          self.result_store.load(asset, executor_id))
+
+        self.result_store.delete(asset, executor_id)
+        self.assertIsNone(self.result_store.load(asset, executor_id))
+
+    def test_result_store_save_many_load_many(self):
+        print 'test on result store bulk save and load...'
+        asset = self.result.asset
+        executor_id = self.result.executor_id
+        missing_asset = Asset(dataset="test", content_id=0, asset_id=1,
+                              workdir_root=config.ROOT + "/workspace/workdir",
+                              ref_path=asset.ref_path,
+                              dis_path=asset.ref_path,
+                              asset_dict={'width':1920, 'height':1080})
+
+        for result_store in [FileSystemResultStore(logger=None),
+                             SqliteResultStore(logger=None),
+                             CachingResultStore(SqliteResultStore(logger=None))]:
+            self.result_store = result_store
+            self.result_store.save_many([self.result])
+
+            loaded_results = self.result_store.load_many(
+                [missing_asset, asset], executor_id)
+
+            self.assertEquals(len(loaded_results), 2)
+            self.assertIsNone(loaded_results[0])
+            self.assertEquals(self.result, loaded_results[1])
+
+            self.result_store.delete(asset, executor_id)
+            self.assertEquals(self.result_store.load_many([asset], executor_id),
+                              [None])
+
+    def test_caching_result_store(self):
+        print 'test on caching result store...'
+        self.result_store = CachingResultStore(FileSystemResultStore(logger=None))
+        asset = self.result.asset
+        executor_id = self.result.executor_id
+
+        self.result_store.save(self.result)
+
+        loaded_result = self.result_store.load(asset, executor_id)
+        self.assertEquals(self.result, loaded_result)
+        self.assertEquals(self.result_store.num_hits, 1)
+        self.assertEquals(self.result_store.num_misses, 0)
+
+        # must not be able to corrupt the cached result through a loaded one
+        loaded_result.result_dict['VMAF_legacy_scores'] = [0.0]
+        self.assertEquals(self.result, self.result_store.load(asset, executor_id))
+        self.assertEquals(self.result_store.num_hits, 2)
+
+        # backing store still has it after cache is emptied
+        self.result_store.max_bytes = 0
+        self.result_store.save(self.result)
+        self.assertEquals(self.result_store.current_bytes, 0)
+        self.assertEquals(self.result, self.result_store.load(asset, executor_id))
+        self.assertEquals(self.result_store.num_misses, 1)
+
+        self.result_store.delete(asset, executor_id)
+        self.assertIsNone(self.result_store.load(asset, executor_id))
+        self.assertEquals(self.result_store.num_misses, 2)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,71 @@
+__copyright__ = "Copyright 2016, Netflix, Inc."
+__license__ = "Apache, Version 2.0"
+
+import os
+import unittest
+
+import numpy as np
+
+import config
+from tools.reader import YuvReader
+from tools.scaler import YuvScaler, scale_yuv_file
+
+class YuvScalerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.output_yuv_path = config.ROOT + "/workspace/workdir/scaler_test.yuv"
+
+    def tearDown(self):
+        if os.path.exists(self.output_yuv_path):
+            os.remove(self.output_yuv_path)
+
+    def test_identity(self):
+        rs = np.random.RandomState(0)
+        y = rs.randint(0, 256, (324, 576)).astype(np.uint8)
+        u = rs.randint(0, 256, (162, 288)).astype(np.uint8)
+        v = rs.randint(0, 256, (162, 288)).astype(np.uint8)
+        for resampling_type in ['bilinear', 'bicubic', 'lanczos']:
+            yuv_scaler = YuvScaler(576, 324, 576, 324, 'yuv420p', resampling_type)
+            y_out, u_out, v_out = yuv_scaler.scale(y, u, v)
+            self.assertTrue(np.array_equal(y_out, y))
+            self.assertTrue(np.array_equal(u_out, u))
+            self.assertTrue(np.array_equal(v_out, v))
+
+    def test_scale_shape_and_type(self):
+        y = np.full((324, 576), 1000, dtype=np.uint16)
+        u = np.full((324, 288), 512, dtype=np.uint16)
+        v = np.full((324, 288), 0, dtype=np.uint16)
+        yuv_scaler = YuvScaler(576, 324, 1920, 1080, 'yuv422p10le', 'lanczos')
+        y_out, u_out, v_out = yuv_scaler.scale(y, u, v)
+        self.assertEquals(y_out.shape, (1080, 1920))
+        self.assertEquals(u_out.shape, (1080, 960))
+        self.assertEquals(v_out.shape, (1080, 960))
+        self.assertEquals(y_out.dtype, np.uint16)
+        # flat planes stay flat, despite the negative lobes of lanczos
+        self.assertEquals((y_out.min(), y_out.max()), (1000, 1000))
+        self.assertEquals((u_out.min(), u_out.max()), (512, 512))
+        self.assertEquals((v_out.min(), v_out.max()), (0, 0))
+
+    def test_downscale_bilinear(self):
+        # a ramp is resampled at the centers of the output pixels, i.e.
+        # between input pixels 2i and 2i + 1
+        y = np.tile(np.arange(0, 256, 2, dtype=np.uint8), (4, 1))
+        u = np.zeros((2, 64), dtype=np.uint8)
+        yuv_scaler = YuvScaler(128, 4, 64, 2, 'yuv420p', 'bilinear')
+        y_out, _, _ = yuv_scaler.scale(y, u, u)
+        self.assertEquals(list(y_out[0, 1:5]), [5, 9, 13, 17])
+        self.assertEquals(list(y_out[1, 1:5]), [5, 9, 13, 17])
+
+    def test_scale_yuv_file(self):
+        ref_path = config.ROOT + "/resource/yuv/src01_hrc00_576x324.yuv"
+        scale_yuv_file(ref_path, 576, 324, self.output_yuv_path, 288, 162,
+                       'yuv420p', 'bicubic', start_end_frame=(2, 5))
+        with YuvReader(filepath=self.output_yuv_path, width=288, height=162,
+                       yuv_type='yuv420p') as yuv_reader:
+            self.assertEquals(yuv_reader.num_frms, 4)
+            y, _, _ = yuv_reader.next_y_u_v()
+        with YuvReader(filepath=ref_path, width=576, height=324,
+                       yuv_type='yuv420p', start_frame=2) as yuv_reader:
+            y_ref, _, _ = yuv_reader.next_y_u_v()
+        self.assertAlmostEqual(y.mean(), y_ref.mean(), places=0)
+
@@ -114,6 +114,89 @@ class TrainTestModelTest(unittest.TestCase):
 
         model.delete(self.model_filename)
 
+    def test_from_file_cached(self):
+
+        print "test loading models through the process-wide registry..."
+
+        xys = TrainTestModel.get_xys_from_dataframe(self.feature_df.iloc[:-50])
+        xs = TrainTestModel.get_xs_from_dataframe(self.feature_df.iloc[-50:])
+        ys = TrainTestModel.get_ys_from_dataframe(self.feature_df.iloc[-50:])
+
+        model = LibsvmnusvrTrainTestModel({'norm_type':'normalize'}, None)
+        model.train(xys)
+        model.to_file(self.model_filename)
+
+        loaded_model = TrainTestModel.from_file_cached(self.model_filename, None)
+        self.assertTrue(isinstance(loaded_model, LibsvmnusvrTrainTestModel))
+        self.assertTrue(TrainTestModel.from_file_cached(self.model_filename, None) is loaded_model)
+
+        result = loaded_model.evaluate(xs, ys)
+        self.assertAlmostEquals(result['RMSE'], 0.30977055639849227, places=4)
+
+        # rewriting the .model file reloads
+        model.to_file(self.model_filename)
+        st = os.stat(self.model_filename + '.model')
+        os.utime(self.model_filename + '.model', (st.st_atime, st.st_mtime + 10))
+        reloaded_model = TrainTestModel.from_file_cached(self.model_filename, None)
+        self.assertFalse(reloaded_model is loaded_model)
+        self.assertTrue(TrainTestModel.from_file_cached(self.model_filename, None) is reloaded_model)
+
+        # explicit invalidation reloads
+        TrainTestModel.invalidate_file_cache(self.model_filename)
+        self.assertFalse(TrainTestModel.from_file_cached(self.model_filename, None) is reloaded_model)
+
+        model.delete(self.model_filename)
+        self.assertFalse((os.path.abspath(self.model_filename), None) in TrainTestModel._file_cache)
+
+    def test_predict_numpy_libsvmnusvr(self):
+
+        print "test libsvmnusvr predict in numpy against svm_predict..."
+
+        xys = TrainTestModel.get_xys_from_dataframe(self.feature_df.iloc[:-50])
+        xs = TrainTestModel.get_xs_from_dataframe(self.feature_df.iloc[-50:])
+
+        for kernel in ['rbf', 'linear']:
+            model = LibsvmnusvrTrainTestModel({'norm_type':'normalize',
+                                               'kernel':kernel,
+                                               'gamma':0.1}, None)
+            model.train(xys)
+
+            xs_2d = np.array([xs[name] for name in model.feature_names]).T
+            xs_2d = model.normalize_xs(xs_2d)
+            ys_svmutil = LibsvmnusvrTrainTestModel._predict_svmutil(model.model, xs_2d)
+            ys_numpy = LibsvmnusvrTrainTestModel._predict_numpy(model.model, xs_2d)
+            self.assertEquals(ys_numpy.shape, (50,))
+            self.assertTrue(np.allclose(ys_numpy, ys_svmutil, rtol=0, atol=1e-10))
+
+            # same in chunks of one sample
+            chunk_elements = LibsvmnusvrTrainTestModel.NUMPY_PREDICT_CHUNK_ELEMENTS
+            LibsvmnusvrTrainTestModel.NUMPY_PREDICT_CHUNK_ELEMENTS = 1
+            try:
+                ys_numpy2 = LibsvmnusvrTrainTestModel._predict_numpy(model.model, xs_2d)
+            finally:
+                LibsvmnusvrTrainTestModel.NUMPY_PREDICT_CHUNK_ELEMENTS = chunk_elements
+            self.assertTrue(np.allclose(ys_numpy2, ys_numpy, rtol=0, atol=1e-12))
+
+    def test_predict_many(self):
+
+        print "test predicting on multiple xs at once..."
+
+        xys = TrainTestModel.get_xys_from_dataframe(self.feature_df.iloc[:-50])
+
+        model = LibsvmnusvrTrainTestModel({'norm_type':'normalize'}, None)
+        model.train(xys)
+
+        xs_list = [TrainTestModel.get_xs_from_dataframe(self.feature_df.iloc[-50:-30]),
+                   TrainTestModel.get_xs_from_dataframe(self.feature_df.iloc[-30:-29]),
+                   TrainTestModel.get_xs_from_dataframe(self.feature_df.iloc[-29:])]
+        ys_pred_list = model.predict_many(xs_list)
+
+        self.assertEquals(map(len, ys_pred_list), [20, 1, 29])
+        for xs, ys_pred in zip(xs_list, ys_pred_list):
+            self.assertTrue(np.allclose(ys_pred, model.predict(xs), rtol=0, atol=1e-10))
+
+        self.assertEquals(model.predict_many([]), [])
+
     def test_train_predict_libsvmnusvr(self):
 
         print "test libsvmnusvr train and predict..."
@@ -2,10 +2,29 @@ __copyright__ = "Copyright 2016, Netflix, Inc."
 __license__ = "Apache, Version 2.0"
 
 import os
+import operator
 
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 
 class YuvReader(object):
+    """
+    Reads frames of a raw YUV file, either sequentially:
+        for y, u, v in yuv_reader:
+            ...
+    where planes are converted to double (10-bit scaled down to 8-bit range),
+    or by random access into a read-only memory map of the file:
+        y, u, v = yuv_reader[i]
+        ys, us, vs = yuv_reader[i:j]
+        ys = yuv_reader.read_frames(i, n)
+    which return zero-copy views of the raw pixels (uint8 or uint16), of
+    shape (height, width) per frame or (num_frames, height, width) per batch.
+    Frame indices are relative to start_frame. With use_mmap=True, sequential
+    reading also goes through the memory map instead of file reads. When only
+    the Y plane is needed, sequential reading can skip the U and V planes:
+        for y in yuv_reader.iter_y():
+            ...
+    """
 
     SUPPORTED_YUV_8BIT_TYPES = ['yuv420p',
                                 'yuv422p',
@@ -26,19 +45,38 @@ class YuvReader(object):
                                         'yuv444p10le': (1.0, 1.0),
                                         }
 
-    def __init__(self, filepath, width, height, yuv_type):
+    def __init__(self, filepath, width, height, yuv_type,
+                 start_frame=None, end_frame=None, use_mmap=False):
+        """
+        :param start_frame: first frame to read, None for the first frame of
+        the file; the file is seeked directly to it
+        :param end_frame: last frame to read (inclusive), None for the last
+        frame of the file
+        :param use_mmap: read sequentially through the memory map too
+        """
 
         self.filepath = filepath
         self.width = width
         self.height = height
         self.yuv_type = yuv_type
+        self.start_frame = start_frame if start_frame is not None else 0
+        self.end_frame = end_frame
+        self.use_mmap = use_mmap
 
         self._asserts()
 
+        self._mmap = None
+
         self.file = open(self.filepath, 'rb')
+        # no seek to the first frame: filepath may be a FIFO workfile
+        if self.start_frame > 0:
+            self.file.seek(self.start_frame * self.num_bytes_per_frm)
+        self._frm_idx = self.start_frame
 
     def close(self):
         self.file.close()
+        # views already handed out keep the map alive
+        self._mmap = None
 
     # make YuvReader withable, e.g.:
     # with YuvReader(...) as yuv_reader:
@@ -59,11 +97,126 @@ class YuvReader(object):
         except EOFError:
             raise StopIteration
 
+    def iter_y(self):
+        """
+        Iterate over the Y planes of the remaining frames, see next_y.
+        """
+        while True:
+            try:
+                yield self.next_y()
+            except EOFError:
+                return
+
+    # make YuvReader indexable, e.g.:
+    # y, u, v = yuv_reader[i]
+    # ys, us, vs = yuv_reader[i:j]
+    def __len__(self):
+        num_frms = self.num_frms
+        if self.end_frame is not None:
+            num_frms = min(num_frms, self.end_frame + 1)
+        return max(num_frms - self.start_frame, 0)
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            return self._get_frame_views(start, len(xrange(start, stop, step)), step)
+        idx = operator.index(key)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('Frame index out of range: {}'.format(key))
+        y, u, v = self._get_frame_views(idx, 1, 1)
+        return y[0], u[0], v[0]
+
+    def read_frames(self, start, count):
+        """
+        Read the Y planes of a batch of frames, without copying.
+        :param start: index of the first frame, relative to start_frame
+        :param count: number of frames
+        :return: read-only (count, height, width) view of the raw Y pixels
+        """
+        assert start >= 0 and count >= 0 and start + count <= len(self), \
+            'Frames [{}, {}) out of range [0, {}).'.format(start, start + count, len(self))
+        return self._get_frame_views(start, count, 1)[0]
+
+    def to_double(self, pix):
+        """
+        Convert raw pixels (e.g. from read_frames) to double the same way
+        sequential reading does, i.e. 10-bit pixels are divided by 4.
+        """
+        if self._is_10bitle():
+            return pix.astype(np.double) / 4.0
+        elif self._is_8bit():
+            return pix.astype(np.double)
+        else:
+            assert False
+
+    def _get_pix_type(self):
+        if self._is_10bitle():
+            return np.uint16
+        elif self._is_8bit():
+            return np.uint8
+        else:
+            assert False
+
+    def _get_frame_views(self, start, count, step):
+        # zero-copy (count, h, w) views of the Y, U and V planes of frames
+        # start, start + step, ... (relative to start_frame) into the memory
+        # map of the file, which is created on first use
+        y_width = self.width
+        y_height = self.height
+        uv_w_multiplier, uv_h_multiplier = self._get_uv_width_height_multiplier()
+        uv_width = int(y_width * uv_w_multiplier)
+        uv_height = int(y_height * uv_h_multiplier)
+        pix_type = self._get_pix_type()
+
+        if count == 0:
+            return np.empty((0, y_height, y_width), pix_type), \
+                   np.empty((0, uv_height, uv_width), pix_type), \
+                   np.empty((0, uv_height, uv_width), pix_type)
+
+        if self._mmap is None:
+            self._mmap = np.memmap(self.filepath, dtype=pix_type, mode='r')
+
+        y_size = y_width * y_height
+        uv_size = uv_width * uv_height
+        itemsize = np.dtype(pix_type).itemsize
+        frm_stride = (y_size + uv_size * 2) * itemsize * step
+        frm = self._mmap[(self.start_frame + start) * (y_size + uv_size * 2):]
+
+        y = as_strided(frm, shape=(count, y_height, y_width),
+                       strides=(frm_stride, y_width * itemsize, itemsize),
+                       writeable=False)
+        u = as_strided(frm[y_size:], shape=(count, uv_height, uv_width),
+                       strides=(frm_stride, uv_width * itemsize, itemsize),
+                       writeable=False)
+        v = as_strided(frm[y_size + uv_size:], shape=(count, uv_height, uv_width),
+                       strides=(frm_stride, uv_width * itemsize, itemsize),
+                       writeable=False)
+        return y, u, v
+
     @property
     def num_bytes(self):
         self._assert_file_exist()
         return os.path.getsize(self.filepath)
 
+    @classmethod
+    def get_num_bytes_per_frm(cls, width, height, yuv_type):
+        w_multiplier, h_multiplier = cls.UV_WIDTH_HEIGHT_MULTIPLIERS_DICT[yuv_type]
+        uv_width = int(width * w_multiplier)
+        uv_height = int(height * h_multiplier)
+        num_pixels = width * height + uv_width * uv_height * 2
+        if yuv_type in cls.SUPPORTED_YUV_10BIT_LE_TYPES:
+            return num_pixels * 2
+        elif yuv_type in cls.SUPPORTED_YUV_8BIT_TYPES:
+            return num_pixels
+        else:
+            assert False
+
+    @property
+    def num_bytes_per_frm(self):
+        self._assert_yuv_type()
+        return self.get_num_bytes_per_frm(self.width, self.height, self.yuv_type)
+
     @property
     def num_frms(self):
         w_multiplier, h_multiplier = self._get_uv_width_height_multiplier()
@@ -106,6 +259,12 @@ class YuvReader(object):
         # assert file size: if consists of integer number of frames
         num_frms = self.num_frms
 
+        # assert frame range
+        assert self.start_frame >= 0, \
+            'Start frame is negative: {}'.format(self.start_frame)
+        assert self.end_frame is None or self.end_frame >= self.start_frame, \
+            'End frame {} before start frame {}.'.format(self.end_frame, self.start_frame)
+
     def _is_8bit(self):
         return self.yuv_type in self.SUPPORTED_YUV_8BIT_TYPES
 
@@ -114,18 +273,22 @@ class YuvReader(object):
 
     def next_y_u_v(self):
 
+        if self.end_frame is not None and self._frm_idx > self.end_frame:
+            raise EOFError
+
+        if self.use_mmap:
+            if self._frm_idx - self.start_frame >= len(self):
+                raise EOFError
+            y, u, v = self[self._frm_idx - self.start_frame]
+            self._frm_idx += 1
+            return self.to_double(y), self.to_double(u), self.to_double(v)
+
         y_width = self.width
         y_height = self.height
         uv_w_multiplier, uv_h_multiplier = self._get_uv_width_height_multiplier()
         uv_width = int(y_width * uv_w_multiplier)
         uv_height = int(y_height * uv_h_multiplier)
-
-        if self._is_10bitle():
-            pix_type = np.uint16
-        elif self._is_8bit():
-            pix_type = np.uint8
-        else:
-            assert False
+        pix_type = self._get_pix_type()
 
         y = np.fromfile(self.file, pix_type, count=y_width*y_height)
         if y.size == 0:
@@ -137,17 +300,55 @@ class YuvReader(object):
         if v.size == 0:
             raise EOFError
 
+        self._frm_idx += 1
+
         y = y.reshape(y_height, y_width)
         u = u.reshape(uv_height, uv_width)
         v = v.reshape(uv_height, uv_width)
 
-        if self._is_10bitle():
-            return y.astype(np.double) / 4.0, \
-                   u.astype(np.double) / 4.0, \
-                   v.astype(np.double) / 4.0
-        elif self._is_8bit():
-            return y.astype(np.double), \
-                   u.astype(np.double), \
-                   v.astype(np.double)
-        else:
-            assert False
+        return self.to_double(y), self.to_double(u), self.to_double(v)
+
+    def next_y(self):
+        """
+        Like next_y_u_v, but return the Y plane only: the U and V planes are
+        seeked over instead of read or, if the file is a FIFO, read and
+        discarded without conversion.
+        """
+
+        if self.end_frame is not None and self._frm_idx > self.end_frame:
+            raise EOFError
+
+        if self.use_mmap:
+            if self._frm_idx - self.start_frame >= len(self):
+                raise EOFError
+            y = self._get_frame_views(self._frm_idx - self.start_frame, 1, 1)[0][0]
+            self._frm_idx += 1
+            return self.to_double(y)
+
+        y_width = self.width
+        y_height = self.height
+        pix_type = self._get_pix_type()
+
+        y = np.fromfile(self.file, pix_type, count=y_width*y_height)
+        if y.size == 0:
+            raise EOFError
+        self._skip_u_v()
+
+        self._frm_idx += 1
+
+        y = y.reshape(y_height, y_width)
+
+        return self.to_double(y)
+
+    def _skip_u_v(self):
+        uv_w_multiplier, uv_h_multiplier = self._get_uv_width_height_multiplier()
+        uv_width = int(self.width * uv_w_multiplier)
+        uv_height = int(self.height * uv_h_multiplier)
+        num_bytes = uv_width * uv_height * 2 * np.dtype(self._get_pix_type()).itemsize
+
+        # a regular file holds whole frames (see _asserts), so seeking past
+        # its end cannot hide a truncated frame
+        if os.path.isfile(self.filepath):
+            self.file.seek(num_bytes, os.SEEK_CUR)
+        elif len(self.file.read(num_bytes)) < num_bytes:
+            raise EOFError
@@ -0,0 +1,170 @@
+__copyright__ = "Copyright 2016, Netflix, Inc."
+__license__ = "Apache, Version 2.0"
+
+import errno
+
+import numpy as np
+import scipy.sparse
+
+from tools.reader import YuvReader
+
+
+def _bilinear(x):
+    x = np.abs(x)
+    return np.where(x < 1.0, 1.0 - x, 0.0)
+
+
+def _bicubic(x, a=-0.6):
+    # Keys' cubic convolution; a = -0.6 as swscale's default bicubic
+    # (B = 0, C = 0.6)
+    x = np.abs(x)
+    x2 = x * x
+    x3 = x2 * x
+    return np.where(x < 1.0, (a + 2.0) * x3 - (a + 3.0) * x2 + 1.0,
+                    np.where(x < 2.0, a * x3 - 5.0 * a * x2 + 8.0 * a * x - 4.0 * a,
+                             0.0))
+
+
+def _lanczos(x, a=3.0):
+    x = np.abs(x)
+    return np.where(x < a, np.sinc(x) * np.sinc(x / a), 0.0)
+
+
+class YuvScaler(object):
+    """
+    Rescales YUV frames in NumPy, as an in-process alternative to converting
+    through ffmpeg (see Executor._open_ref_workfile), e.g.:
+        yuv_scaler = YuvScaler(3840, 2160, 1920, 1080, 'yuv420p', 'bicubic')
+        y, u, v = yuv_scaler.scale(*yuv_reader[i])
+    Each plane is resampled separably, along columns then rows, by sparse
+    weight matrices computed once per geometry and reused across frames and
+    YuvScaler instances. As in swscale, sample positions are pixel-center
+    aligned, the kernel is widened by the scale factor when downscaling
+    (anti-aliasing), and edge pixels are replicated.
+
+    The output is close to, but not bit-exact with, ffmpeg's.
+    """
+
+    # resampling_type: (kernel function, kernel support in pixels)
+    RESAMPLING_KERNELS_DICT = {'bilinear': (_bilinear, 1.0),
+                               'bicubic': (_bicubic, 2.0),
+                               'lanczos': (_lanczos, 3.0),
+                               }
+
+    # (in_size, out_size, resampling_type) -> weight matrix
+    _weights_dict = {}
+
+    def __init__(self, width, height, out_width, out_height, yuv_type,
+                 resampling_type):
+        assert resampling_type in self.RESAMPLING_KERNELS_DICT, \
+            'Unsupported resampling type: {}'.format(resampling_type)
+        assert yuv_type in YuvReader.UV_WIDTH_HEIGHT_MULTIPLIERS_DICT, \
+            'Unsupported yuv type: {}'.format(yuv_type)
+
+        self.width = width
+        self.height = height
+        self.out_width = out_width
+        self.out_height = out_height
+        self.yuv_type = yuv_type
+        self.resampling_type = resampling_type
+
+        uv_w_multiplier, uv_h_multiplier = \
+            YuvReader.UV_WIDTH_HEIGHT_MULTIPLIERS_DICT[yuv_type]
+        self._y_weights = (
+            self._get_weights(height, out_height, resampling_type),
+            self._get_weights(width, out_width, resampling_type))
+        self._uv_weights = (
+            self._get_weights(int(height * uv_h_multiplier),
+                              int(out_height * uv_h_multiplier),
+                              resampling_type),
+            self._get_weights(int(width * uv_w_multiplier),
+                              int(out_width * uv_w_multiplier),
+                              resampling_type))
+
+        if yuv_type in YuvReader.SUPPORTED_YUV_8BIT_TYPES:
+            self._pix_type = np.uint8
+            self._max_value = 255
+        else:
+            self._pix_type = np.uint16
+            self._max_value = 1023
+
+    def scale(self, y, u, v):
+        """
+        :param y, u, v: raw planes of a frame (uint8 or uint16), e.g. from
+        YuvReader's indexing
+        :return: y, u, v rescaled, of the same pixel type
+        """
+        return self._scale_plane(y, self._y_weights), \
+               self._scale_plane(u, self._uv_weights), \
+               self._scale_plane(v, self._uv_weights)
+
+    def _scale_plane(self, plane, weights):
+        row_weights, col_weights = weights
+        # resample columns, (out_h, in_h) x (in_h, in_w), then rows,
+        # ((out_w, in_w) x (in_w, out_h)).T
+        out = row_weights.dot(plane.astype(np.float64))
+        out = col_weights.dot(out.T).T
+        return np.clip(np.around(out), 0, self._max_value).astype(self._pix_type)
+
+    @classmethod
+    def _get_weights(cls, in_size, out_size, resampling_type):
+        key = (in_size, out_size, resampling_type)
+        if key not in cls._weights_dict:
+            cls._weights_dict[key] = cls._compute_weights(*key)
+        return cls._weights_dict[key]
+
+    @classmethod
+    def _compute_weights(cls, in_size, out_size, resampling_type):
+        # sparse (out_size, in_size) matrix, whose row i holds the kernel
+        # weights of the input samples contributing to output sample i
+        kernel, support = cls.RESAMPLING_KERNELS_DICT[resampling_type]
+
+        scale = float(in_size) / out_size
+        filter_scale = max(scale, 1.0)
+        support *= filter_scale
+
+        centers = (np.arange(out_size) + 0.5) * scale - 0.5
+        num_taps = int(np.ceil(2 * support)) + 1
+        idxs = np.floor(centers - support).astype(int)[:, np.newaxis] + 1 \
+               + np.arange(num_taps)
+        weights = kernel((idxs - centers[:, np.newaxis]) / filter_scale)
+        weights /= weights.sum(axis=1)[:, np.newaxis]
+
+        rows = np.repeat(np.arange(out_size), num_taps)
+        cols = np.clip(idxs, 0, in_size - 1).ravel()
+
+        # duplicate (row, col) entries from edge replication are summed
+        return scipy.sparse.coo_matrix(
+            (weights.ravel(), (rows, cols)), shape=(out_size, in_size)).tocsr()
+
+
+def scale_yuv_file(src_path, width, height, dst_path, out_width, out_height,
+                   yuv_type, resampling_type, start_end_frame=None):
+    """
+    Rescale raw YUV file src_path into dst_path (which may be a FIFO) with
+    YuvScaler, frame by frame.
+    :param start_end_frame: frames (start, end inclusive) of src_path to
+    convert, None for all frames
+    :return:
+    """
+    start_frame, end_frame = start_end_frame \
+        if start_end_frame is not None else (None, None)
+    yuv_scaler = YuvScaler(width, height, out_width, out_height, yuv_type,
+                           resampling_type)
+
+    # open dst_path first: if src_path turns out to be invalid, a reader
+    # blocked opening the FIFO gets an end of file instead of waiting forever
+    try:
+        with open(dst_path, 'wb') as dst_file:
+            with YuvReader(filepath=src_path, width=width, height=height,
+                           yuv_type=yuv_type, start_frame=start_frame,
+                           end_frame=end_frame) as yuv_reader:
+                for i in range(len(yuv_reader)):
+                    # not ndarray.tofile(), whose IOError lacks the errno
+                    for plane in yuv_scaler.scale(*yuv_reader[i]):
+                        dst_file.write(plane.tobytes())
+    except IOError as e:
+        # the reader of a FIFO closed it before the end, e.g. it only needs
+        # as many frames as the other video has
+        if e.errno != errno.EPIPE:
+            raise